@@ -12,6 +12,9 @@ if not os.environ.get('RENDER'):
 # Configuração
 from config import Config
 from extensions import db, migrate, login_manager
+from logging_config import init_logging
+from services.cache_service import init_cache
+from services.events_service import init_events
 from models import (
     User, Plan, Subscription, Product, Order, OrderItem,
     CashMovement, CashSession, OrderStatus, RestaurantConfig, Neighborhood
@@ -21,6 +24,9 @@ from models import (
 app = Flask(__name__)
 app.config.from_object(Config)
 
+# Logging estruturado (JSON, por rota, amostrado e não bloqueante)
+init_logging(app)
+
 # Inicializa extensões
 db.init_app(app)
 migrate.init_app(app, db)
@@ -29,6 +35,11 @@ login_manager.login_view = 'auth.login'
 login_manager.login_message = 'Você precisa fazer login para acessar esta página.'
 login_manager.login_message_category = 'info'
 
+# Cache de resultados (local ou Redis, ver CACHE_BACKEND)
+init_cache(app)
+# Eventos de pedidos para o quadro ao vivo (local ou Redis, ver EVENTS_BACKEND)
+init_events(app)
+
 # User loader
 @login_manager.user_loader
 def load_user(user_id):
@@ -46,6 +57,7 @@ from routes.cardapio_routes import cardapio_bp
 from routes.produtos_routes import produtos_bp
 from routes.payments_routes import payments_bp
 from routes.blocked_routes import blocked_bp
+from routes.impressao_routes import impressao_bp
 # 🚀 CORREÇÃO AQUI: 'rotas' foi alterado para 'routes'
 from routes.webhooks_bp import webhooks_bp
 
@@ -61,6 +73,7 @@ app.register_blueprint(produtos_bp)
 app.register_blueprint(payments_bp, url_prefix='/payments')  # checkout
 app.register_blueprint(webhooks_bp, url_prefix='/webhooks')   # webhooks externos (Registro corrigido)
 app.register_blueprint(blocked_bp)
+app.register_blueprint(impressao_bp)
 
 # === Contexto Global ===
 @app.context_processor
@@ -77,7 +90,7 @@ def index():
 # Middleware para checagem de plano
 @app.before_request
 def check_plan_access():
-    protected_routes = ['dashboard', 'pedidos', 'caixa', 'reports', 'perfil', 'produtos']
+    protected_routes = ['dashboard', 'pedidos', 'caixa', 'reports', 'perfil', 'produtos', 'impressao']
     if request.endpoint and any(r in request.endpoint for r in ['static', 'auth', 'cardapio', 'planos', 'payments', 'webhooks', 'blocked']):
         return
     if request.endpoint and any(r in request.endpoint for r in protected_routes):
@@ -13,6 +13,73 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'voce-nunca-vai-adivinhar-isso'
     
+    # Cache do cardápio público (services/menu_service.py)
+    MENU_CACHE_TTL = int(os.environ.get('MENU_CACHE_TTL') or 300)
+    MENU_CACHE_MAX_ENTRIES = int(os.environ.get('MENU_CACHE_MAX_ENTRIES') or 500)
+    # Cache-Control do cardápio (segundos que um CDN/proxy pode servir sem revalidar)
+    MENU_HTTP_MAX_AGE = int(os.environ.get('MENU_HTTP_MAX_AGE') or 30)
+
+    # Índice de busca de produtos do PDV (services/product_search_service.py), reconstruído
+    # pela menu_revision; consultas de até PRODUCT_SEARCH_CACHE_PREFIX_LEN letras ficam em cache
+    PRODUCT_SEARCH_TTL = int(os.environ.get('PRODUCT_SEARCH_TTL') or 300)
+    PRODUCT_SEARCH_MAX_INDEXES = int(os.environ.get('PRODUCT_SEARCH_MAX_INDEXES') or 500)
+    PRODUCT_SEARCH_CACHE_PREFIX_LEN = int(os.environ.get('PRODUCT_SEARCH_CACHE_PREFIX_LEN') or 3)
+
+    # Sincronização do PDV offline (services/pos_sync_service.py): vendas e movimentos
+    # registrados sem internet são enviados em lotes de até POS_SYNC_MAX_BATCH itens
+    POS_SYNC_MAX_BATCH = int(os.environ.get('POS_SYNC_MAX_BATCH') or 100)
+
+    # Cache de resultados (services/cache_service.py): 'local' (LRU em memória, por processo)
+    # ou 'redis' (compartilhado entre os workers do gunicorn; requer o pacote redis).
+    CACHE_BACKEND = (os.environ.get('CACHE_BACKEND') or 'local').lower()
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL') or os.environ.get('REDIS_URL')
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES') or 1000)
+    # Rede de segurança do cache do dashboard; a invalidação normal é por evento
+    DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL') or 60)
+
+    # Quadro de pedidos ao vivo via SSE (services/events_service.py): 'local' entrega só
+    # dentro do processo; 'redis' (pub/sub) mantém vários workers/dynos consistentes.
+    EVENTS_BACKEND = (os.environ.get('EVENTS_BACKEND') or 'local').lower()
+    EVENTS_REDIS_URL = os.environ.get('EVENTS_REDIS_URL') or os.environ.get('REDIS_URL')
+    SSE_HEARTBEAT_SECONDS = int(os.environ.get('SSE_HEARTBEAT_SECONDS') or 15)
+    # Cada conexão é encerrada depois disso (o navegador reconecta sozinho) para liberar a thread
+    SSE_MAX_STREAM_SECONDS = int(os.environ.get('SSE_MAX_STREAM_SECONDS') or 300)
+    # Dimensionamento: no gthread (Procfile) cada quadro aberto ocupa uma thread do worker
+    # enquanto a conexão dura. Por processo, no máximo SSE_MAX_STREAMS conexões ficam
+    # abertas (padrão: metade de GUNICORN_THREADS), o resto das threads atende o cardápio
+    # e os demais POSTs. Acima do limite o quadro cai para consulta periódica: a resposta
+    # fecha na hora e o navegador reconecta (e recarrega a lista) a cada
+    # SSE_FALLBACK_RETRY_SECONDS. Para mais quadros ao vivo, aumente GUNICORN_THREADS
+    # (threads paradas custam pouco) ou WEB_CONCURRENCY com EVENTS_BACKEND=redis.
+    SSE_MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS') or max(1, int(os.environ.get('GUNICORN_THREADS') or 8) // 2))
+    SSE_FALLBACK_RETRY_SECONDS = int(os.environ.get('SSE_FALLBACK_RETRY_SECONDS') or 10)
+
+    # Recebimento de pedidos do cardápio (services/intake_service.py).
+    # Com ORDER_INTAKE_ASYNC o endpoint só grava a entrada e responde 202;
+    # os workers criam os pedidos em lotes de ORDER_INTAKE_BATCH_SIZE.
+    ORDER_INTAKE_ASYNC = (os.environ.get('ORDER_INTAKE_ASYNC') or '').lower() in ('1', 'true', 'yes')
+    ORDER_INTAKE_WORKERS = int(os.environ.get('ORDER_INTAKE_WORKERS') or 2)
+    ORDER_INTAKE_BATCH_SIZE = int(os.environ.get('ORDER_INTAKE_BATCH_SIZE') or 50)
+
+    # Fila de impressão de comandas (services/print_service.py). O agente local do
+    # restaurante reivindica até PRINT_JOB_BATCH_SIZE comandas ESC/POS por consulta;
+    # sem confirmação em PRINT_JOB_LEASE_SECONDS a comanda volta para a fila.
+    PRINT_JOB_BATCH_SIZE = int(os.environ.get('PRINT_JOB_BATCH_SIZE') or 20)
+    PRINT_JOB_LEASE_SECONDS = int(os.environ.get('PRINT_JOB_LEASE_SECONDS') or 120)
+    PRINT_JOB_MAX_ATTEMPTS = int(os.environ.get('PRINT_JOB_MAX_ATTEMPTS') or 5)
+    # Tabela de caracteres da impressora: 'cp860' (português) ou 'cp850' (multilíngue)
+    ESCPOS_CODEPAGE = (os.environ.get('ESCPOS_CODEPAGE') or 'cp860').lower()
+
+    # Logging (logging_config.py). Níveis por rota e amostragem usam o nome do endpoint:
+    #   LOG_ROUTE_LEVELS='cardapio.menu=WARNING,perfil.update_status=DEBUG'
+    #   LOG_SAMPLE_RATES='cardapio.menu=0.05'  (fração das requisições com logs INFO/DEBUG)
+    LOG_LEVEL = os.environ.get('LOG_LEVEL') or 'INFO'
+    LOG_FORMAT = os.environ.get('LOG_FORMAT') or ('json' if os.environ.get('RENDER') else 'text')
+    LOG_ROUTE_LEVELS = os.environ.get('LOG_ROUTE_LEVELS') or ''
+    LOG_SAMPLE_RATES = os.environ.get('LOG_SAMPLE_RATES') or 'cardapio.menu=0.05,cardapio.menu_data=0.05,static=0'
+    LOG_SLOW_REQUEST_MS = int(os.environ.get('LOG_SLOW_REQUEST_MS') or 1000)
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE') or 10000)
+
     # Configurações do Mercado Pago
     MP_ACCESS_TOKEN = os.environ.get('MP_ACCESS_TOKEN')
     MP_PUBLIC_KEY = os.environ.get('MP_PUBLIC_KEY')
@@ -0,0 +1,263 @@
+"""
+Teste de carga do fluxo público de pedidos:
+cardapio.menu -> cardapio.create_order -> cardapio.order_confirmation.
+
+Usado pelos comandos `flask loadtest_seed` e `flask loadtest` (run.py). Roda offline,
+contra um servidor local (gunicorn/flask run) com SQLite ou Postgres local.
+Os restaurantes de teste são identificados pelo domínio de e-mail LOADTEST_DOMAIN.
+"""
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.parse import urljoin
+from urllib.request import Request, urlopen
+from slugify import slugify
+from werkzeug.security import generate_password_hash
+from extensions import db
+from models import User, Restaurant, RestaurantConfig, Product, Neighborhood
+
+LOADTEST_DOMAIN = 'loadtest.local'
+STEPS = ['menu', 'create_order', 'order_status', 'confirmation']
+CATEGORIES = ['Lanches', 'Pizzas', 'Bebidas', 'Doces', 'Porções']
+
+# Aberto 24h todos os dias (abre e fecha no mesmo horário = dia inteiro)
+ALWAYS_OPEN = {
+    day: {'open': '00:00', 'close': '00:00'}
+    for day in ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+}
+
+
+def seed_restaurants(count, products=20, neighborhoods=5):
+    """
+    Cria (ou completa) `count` restaurantes de teste com produtos e bairros.
+    É idempotente: restaurantes já existentes são reaproveitados.
+    Retorna quantos restaurantes foram criados.
+    """
+    password_hash = generate_password_hash('loadtest')
+    existing = {
+        email for email, in db.session.query(User.email).filter(User.email.like(f'%@{LOADTEST_DOMAIN}'))
+    }
+
+    created = 0
+    for index in range(1, count + 1):
+        email = f'loadtest-{index}@{LOADTEST_DOMAIN}'
+        if email in existing:
+            continue
+
+        user = User(name=f'Carga {index}', email=email, phone='11999999999',
+                    whatsapp='11999999999', password_hash=password_hash)
+        db.session.add(user)
+        db.session.flush()
+
+        db.session.add(Restaurant(user_id=user.id, name=f'Restaurante Carga {index}'))
+        db.session.add(RestaurantConfig(user_id=user.id, business_hours=json.dumps(ALWAYS_OPEN),
+                                        manual_status_override='auto', address='Rua do Teste, 1'))
+        db.session.add_all([
+            Product(user_id=user.id, name=f'Produto {p}', description='Produto de teste de carga',
+                    price=round(random.uniform(5, 80), 2), category=CATEGORIES[p % len(CATEGORIES)])
+            for p in range(1, products + 1)
+        ])
+        db.session.add_all([
+            Neighborhood(user_id=user.id, name=f'Bairro {n}', delivery_fee=round(random.uniform(0, 12), 2))
+            for n in range(1, neighborhoods + 1)
+        ])
+        created += 1
+
+    db.session.commit()
+    return created
+
+
+def load_targets(limit=None):
+    """Lê do banco os restaurantes de teste (id, slug, produtos, bairros) para o gerador de carga."""
+    query = db.session.query(User.id, Restaurant.name).join(
+        Restaurant, Restaurant.user_id == User.id
+    ).filter(User.email.like(f'%@{LOADTEST_DOMAIN}')).order_by(User.id)
+    if limit:
+        query = query.limit(limit)
+    restaurants = query.all()
+    user_ids = [user_id for user_id, _ in restaurants]
+
+    products = defaultdict(list)
+    for user_id, product_id in db.session.query(Product.user_id, Product.id).filter(
+        Product.user_id.in_(user_ids), Product.is_active == True, Product.is_delivery == True
+    ):
+        products[user_id].append(product_id)
+
+    neighborhoods = defaultdict(list)
+    for user_id, neighborhood_id in db.session.query(Neighborhood.user_id, Neighborhood.id).filter(
+        Neighborhood.user_id.in_(user_ids)
+    ):
+        neighborhoods[user_id].append(neighborhood_id)
+
+    return [
+        {
+            'user_id': user_id,
+            'slug': f'{user_id}-{slugify(name)}',
+            'products': products[user_id],
+            'neighborhoods': neighborhoods[user_id],
+        }
+        for user_id, name in restaurants if products[user_id]
+    ]
+
+
+class LoadTestStats:
+    """Latências (ms) e erros por etapa, acumulados de forma thread-safe."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.counts = defaultdict(int)
+        self.errors = defaultdict(lambda: defaultdict(int))
+        self.flows = 0
+        self.dropped = 0
+
+    def record(self, step, elapsed_ms, error=None):
+        with self.lock:
+            self.latencies[step].append(elapsed_ms)
+            self.counts[step] += 1
+            if error is not None:
+                self.errors[step][error] += 1
+
+    def record_error(self, step, error):
+        """Falha sem requisição medida (ex.: tempo de espera esgotado): conta como erro, sem latência."""
+        with self.lock:
+            self.counts[step] += 1
+            self.errors[step][error] += 1
+
+    @staticmethod
+    def percentile(values, pct):
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        # Nearest-rank
+        return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+    def report(self, elapsed):
+        """Linhas do relatório: (etapa, requisições, erros, % erro, req/s, p50, p95, p99)."""
+        rows = []
+        for step in STEPS:
+            count = self.counts.get(step)
+            if not count:
+                continue
+            values = self.latencies.get(step, [])
+            errors = sum(self.errors[step].values())
+            rows.append((
+                step, count, errors, 100.0 * errors / count, count / elapsed,
+                self.percentile(values, 50), self.percentile(values, 95), self.percentile(values, 99),
+            ))
+        return rows
+
+
+def _request(base_url, path, payload=None, headers=None, timeout=10):
+    """Faz uma requisição e retorna (status, corpo). Erros HTTP também retornam o status."""
+    data = json.dumps(payload).encode() if payload is not None else None
+    request = Request(urljoin(base_url, path), data=data, headers={
+        'Content-Type': 'application/json', 'Accept-Encoding': 'identity', **(headers or {})
+    })
+    try:
+        with urlopen(request, timeout=timeout) as response:
+            return response.status, response.read()
+    except HTTPError as e:
+        return e.code, e.read()
+
+
+def _timed(stats, step, func, *args, parse_json=False, **kwargs):
+    """
+    Executa e mede a requisição da etapa. Com `parse_json`, o corpo volta decodificado
+    e uma resposta que não é JSON (ex.: página HTML de 502 do proxy) conta como erro.
+    """
+    started = time.perf_counter()
+    try:
+        status, body = func(*args, **kwargs)
+        error = None if status < 400 else f'HTTP {status}'
+        if parse_json and error is None:
+            body = json.loads(body or b'{}')
+    except (URLError, OSError) as e:
+        status, body, error = None, b'', type(e).__name__
+    except ValueError as e:
+        error = 'resposta não JSON' if parse_json else type(e).__name__
+        status, body = None, b''
+    stats.record(step, (time.perf_counter() - started) * 1000, error)
+    return status, body, error
+
+
+def run_flow(base_url, target, stats, timeout=10, poll_timeout=15):
+    """Um cliente: abre o cardápio, envia um pedido e abre a confirmação."""
+    _, _, error = _timed(stats, 'menu', _request, base_url, f"/cardapio/{target['slug']}", timeout=timeout)
+    if error:
+        return
+
+    chosen = random.sample(target['products'], min(len(target['products']), random.randint(1, 4)))
+    payload = {
+        'client_name': 'Cliente Carga',
+        'client_phone': '11988887777',
+        'client_address': 'Rua da Carga, 100',
+        'complement_note': '',
+        'neighborhood_id': str(random.choice(target['neighborhoods'])) if target['neighborhoods'] else None,
+        'payment_method': random.choice(['Pix', 'Dinheiro', 'Cartão']),
+        'change_for': None,
+        'order_items': [{'id': product_id, 'quantity': random.randint(1, 3), 'note': ''} for product_id in chosen],
+    }
+    status, result, error = _timed(
+        stats, 'create_order', _request, base_url, f"/cardapio/{target['user_id']}/create_order",
+        payload=payload, headers={'Idempotency-Key': uuid.uuid4().hex}, timeout=timeout, parse_json=True
+    )
+    if error:
+        return
+
+    # Recebimento assíncrono (ORDER_INTAKE_ASYNC): consulta até o pedido existir
+    deadline = time.monotonic() + poll_timeout
+    while status == 202 and result.get('pending'):
+        if time.monotonic() > deadline:
+            stats.record_error('order_status', 'timeout')
+            return
+        time.sleep(0.2)
+        status, result, error = _timed(
+            stats, 'order_status', _request, base_url, result['status_url'], timeout=timeout, parse_json=True
+        )
+        if error:
+            return
+
+    if not result.get('redirect_url'):
+        stats.record_error('confirmation', 'sem redirect_url')
+        return
+    _timed(stats, 'confirmation', _request, base_url, result['redirect_url'], timeout=timeout)
+
+
+def run_load(base_url, targets, rate, duration, concurrency, timeout=10):
+    """
+    Gera carga em malha aberta: inicia `rate` fluxos por segundo durante `duration`
+    segundos, com no máximo `concurrency` fluxos simultâneos. Fluxos que não
+    encontram worker livre (servidor saturado) são contados como descartados.
+    """
+    stats = LoadTestStats()
+    in_flight = threading.BoundedSemaphore(concurrency)
+    interval = 1.0 / rate
+
+    def flow(target):
+        try:
+            run_flow(base_url, target, stats, timeout=timeout)
+        finally:
+            in_flight.release()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='loadtest') as executor:
+        next_start = started
+        while next_start - started < duration:
+            delay = next_start - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            if in_flight.acquire(blocking=False):
+                stats.flows += 1
+                executor.submit(flow, random.choice(targets))
+            else:
+                stats.dropped += 1
+            next_start += interval
+
+    return stats, time.perf_counter() - started
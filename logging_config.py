@@ -0,0 +1,181 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from flask import g, request, has_request_context
+from flask.logging import default_handler
+
+# Atributos padrão do LogRecord; o resto (extra=...) vira campo no JSON
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+
+access_logger = logging.getLogger('access')
+
+
+def _parse_mapping(value, cast):
+    """'cardapio.menu=0.05,static=0' -> {'cardapio.menu': 0.05, 'static': 0.0}"""
+    mapping = {}
+    for entry in (value or '').split(','):
+        if '=' not in entry:
+            continue
+        key, raw = entry.split('=', 1)
+        try:
+            mapping[key.strip()] = cast(raw.strip())
+        except (ValueError, TypeError):
+            continue
+    return mapping
+
+
+def _level(name):
+    level = logging.getLevelName(name.upper())
+    if not isinstance(level, int):
+        raise ValueError(name)
+    return level
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Roda na thread da requisição (antes de enfileirar): anexa request_id/user_id/endpoint
+    e aplica o nível por rota e a amostragem decidida no before_request.
+    WARNING ou acima nunca é descartado pela amostragem.
+    """
+
+    def __init__(self, default_level, route_levels):
+        super().__init__()
+        self.default_level = default_level
+        self.route_levels = route_levels
+
+    def filter(self, record):
+        if not has_request_context():
+            return record.levelno >= self.default_level
+
+        record.request_id = g.get('request_id')
+        record.endpoint = request.endpoint
+        # Usa o usuário já carregado pelo Flask-Login (sem disparar consulta ao banco)
+        record.user_id = getattr(g.get('_login_user'), 'id', None)
+
+        if record.levelno < self.route_levels.get(request.endpoint, self.default_level):
+            return False
+        if record.levelno < logging.WARNING and not g.get('log_sampled', True):
+            return False
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and value is not None:
+                data[key] = value
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Enfileira sem bloquear o worker; a escrita em stdout/stderr acontece na thread
+    do QueueListener. Com a fila cheia o registro é descartado e contado.
+    """
+
+    def __init__(self, log_queue, formatter):
+        super().__init__(log_queue)
+        self.exc_formatter = formatter
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Copia o registro com mensagem e traceback já resolvidos; a formatação
+        # final (JSON/texto) fica para a thread do listener.
+        prepared = logging.makeLogRecord(record.__dict__)
+        prepared.msg = record.getMessage()
+        prepared.args = None
+        if record.exc_info:
+            prepared.exc_text = self.exc_formatter.formatException(record.exc_info)
+            prepared.exc_info = None
+        return prepared
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def init_logging(app):
+    """
+    Configura o logging da aplicação: tudo (logging.*, current_app.logger e o log de
+    acesso) passa por uma fila não bloqueante e sai em JSON (LOG_FORMAT=json) ou texto.
+    """
+    global _listener
+
+    config = app.config
+    formatter = JsonFormatter() if config['LOG_FORMAT'] == 'json' else logging.Formatter(
+        '%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s',
+        defaults={'request_id': '-'}
+    )
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+
+    queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=config['LOG_QUEUE_SIZE']), formatter)
+    default_level = _level(config['LOG_LEVEL'])
+    route_levels = _parse_mapping(config['LOG_ROUTE_LEVELS'], _level)
+    queue_handler.addFilter(RequestContextFilter(default_level, route_levels))
+
+    # Substitui os handlers criados pelos logging.basicConfig dos módulos e o handler padrão do Flask.
+    # O root fica no menor nível configurado; o filtro aplica o nível de cada rota.
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(min([default_level, *route_levels.values()]))
+    app.logger.removeHandler(default_handler)
+
+    if _listener is None:
+        _listener = QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+    sample_rates = _parse_mapping(config['LOG_SAMPLE_RATES'], float)
+    slow_request_ms = config['LOG_SLOW_REQUEST_MS']
+
+    @app.before_request
+    def start_request_log():
+        g.request_id = (request.headers.get('X-Request-ID') or uuid.uuid4().hex[:16])[:64]
+        g.request_started = time.perf_counter()
+        # Decisão única por requisição: ou todos os logs INFO/DEBUG dela saem, ou nenhum
+        rate = sample_rates.get(request.endpoint, 1.0)
+        g.log_sampled = rate >= 1.0 or random.random() < rate
+
+    @app.after_request
+    def finish_request_log(response):
+        started = g.get('request_started')
+        if started is None:
+            return response
+
+        latency_ms = round((time.perf_counter() - started) * 1000, 1)
+        if response.status_code >= 500:
+            level = logging.ERROR
+        elif latency_ms >= slow_request_ms:
+            level = logging.WARNING
+        else:
+            level = logging.INFO
+        access_logger.log(level, 'request', extra={
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'latency_ms': latency_ms,
+        })
+        response.headers['X-Request-ID'] = g.request_id
+        return response
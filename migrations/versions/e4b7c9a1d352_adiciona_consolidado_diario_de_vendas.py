@@ -0,0 +1,118 @@
+"""Adiciona tabela daily_sales_rollup
+
+Revision ID: e4b7c9a1d352
+Revises: d83a1f6e2c40
+Create Date: 2026-10-18 16:40:12.884210
+
+"""
+from collections import defaultdict
+from datetime import timezone
+from decimal import Decimal
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b7c9a1d352'
+down_revision = 'd83a1f6e2c40'
+branch_labels = None
+depends_on = None
+
+# Mesmo fuso padrão de services/business_hours
+DEFAULT_TIMEZONE = 'America/Sao_Paulo'
+BATCH_SIZE = 1000
+
+orders = sa.table(
+    'orders',
+    sa.column('user_id', sa.Integer), sa.column('status', sa.String),
+    sa.column('payment_method', sa.String), sa.column('total_price', sa.Numeric),
+    sa.column('delivery_fee', sa.Numeric), sa.column('created_at', sa.DateTime),
+    sa.column('completed_at', sa.DateTime), sa.column('canceled_at', sa.DateTime),
+)
+restaurant_config = sa.table('restaurant_configs', sa.column('user_id', sa.Integer), sa.column('timezone', sa.String))
+rollup = sa.table(
+    'daily_sales_rollup',
+    sa.column('user_id', sa.Integer), sa.column('day', sa.Date), sa.column('payment_method', sa.String),
+    sa.column('orders_count', sa.Integer), sa.column('revenue', sa.Numeric),
+    sa.column('delivery_fees', sa.Numeric), sa.column('cancelled_count', sa.Integer),
+    sa.column('cancelled_amount', sa.Numeric),
+)
+
+
+def _timezone(name):
+    try:
+        return ZoneInfo(name or DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(DEFAULT_TIMEZONE)
+
+
+def _backfill():
+    """
+    Preenche o consolidado com o histórico (mesmo cálculo de
+    services/rollup_service.rebuild_rollup): concluídos pelo dia local de completed_at
+    (created_at nos antigos sem completed_at), cancelados pelo dia local de canceled_at.
+    """
+    bind = op.get_bind()
+    timezones = {owner: _timezone(name) for owner, name in bind.execute(sa.select(restaurant_config))}
+    default_tz = _timezone(None)
+
+    rows = bind.execute(sa.select(
+        orders.c.user_id, orders.c.status, orders.c.payment_method, orders.c.total_price,
+        orders.c.delivery_fee, orders.c.created_at, orders.c.completed_at, orders.c.canceled_at
+    ).where(sa.or_(
+        orders.c.status == 'COMPLETED',
+        sa.and_(orders.c.status == 'CANCELLED', orders.c.canceled_at.isnot(None))
+    )))
+    buckets = defaultdict(lambda: {
+        'orders_count': 0, 'revenue': Decimal(0), 'delivery_fees': Decimal(0),
+        'cancelled_count': 0, 'cancelled_amount': Decimal(0),
+    })
+    for owner, status, payment_method, total, fee, created_at, completed_at, canceled_at in rows:
+        moment = (completed_at or created_at) if status == 'COMPLETED' else canceled_at
+        if moment is None:
+            continue
+        tz = timezones.get(owner, default_tz)
+        day = moment.replace(tzinfo=timezone.utc).astimezone(tz).date()
+        values = buckets[(owner, day, payment_method or '')]
+        if status == 'COMPLETED':
+            values['orders_count'] += 1
+            values['revenue'] += Decimal(str(total or 0))
+            values['delivery_fees'] += Decimal(str(fee or 0))
+        else:
+            values['cancelled_count'] += 1
+            values['cancelled_amount'] += Decimal(str(total or 0))
+
+    batch = [
+        {'user_id': owner, 'day': day, 'payment_method': payment_method, **values}
+        for (owner, day, payment_method), values in buckets.items()
+    ]
+    for start in range(0, len(batch), BATCH_SIZE):
+        bind.execute(rollup.insert(), batch[start:start + BATCH_SIZE])
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('daily_sales_rollup',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('payment_method', sa.String(length=50), nullable=False),
+    sa.Column('orders_count', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('delivery_fees', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('cancelled_count', sa.Integer(), nullable=False),
+    sa.Column('cancelled_amount', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'day', 'payment_method', name='uq_daily_sales_rollup_user_day_method')
+    )
+    # ### end Alembic commands ###
+
+    _backfill()
+
+
+def downgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_table('daily_sales_rollup')
+    # ### end Alembic commands ###
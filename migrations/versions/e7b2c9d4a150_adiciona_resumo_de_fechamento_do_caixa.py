@@ -0,0 +1,122 @@
+"""Adiciona resumo de fechamento na sessão de caixa (esperado x contado, pedidos, ticket médio)
+
+Revision ID: e7b2c9d4a150
+Revises: c4f1a8e2d6b3
+Create Date: 2026-10-18 23:41:05.276194
+
+"""
+import json
+from collections import defaultdict
+from decimal import Decimal
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b2c9d4a150'
+down_revision = 'c4f1a8e2d6b3'
+branch_labels = None
+depends_on = None
+
+# Mesmo valor de services/cash_service (o filtro de tipos abaixo é NON_BALANCE_TYPES)
+CASH_PAYMENT_METHODS = ('dinheiro',)
+BATCH_SIZE = 1000
+
+
+def _backfill():
+    """
+    Congela o resumo das sessões já fechadas (mesmo cálculo de
+    services/cash_service.apply_close_snapshot), com uma consulta agregada para todas.
+    """
+    bind = op.get_bind()
+    totals = defaultdict(list)
+    rows = bind.execute(sa.text(
+        "SELECT cash_movements.session_id, cash_movements.type, COALESCE(orders.payment_method, ''), "
+        "COUNT(cash_movements.id), SUM(cash_movements.amount) "
+        "FROM cash_movements LEFT JOIN orders ON orders.id = cash_movements.order_id "
+        "WHERE cash_movements.session_id IS NOT NULL AND cash_movements.type NOT IN ('opening', 'closing') "
+        "GROUP BY cash_movements.session_id, cash_movements.type, COALESCE(orders.payment_method, '')"
+    ))
+    for session_id, movement_type, method, count, amount in rows:
+        totals[session_id].append((movement_type, method, count, amount))
+
+    sessions = bind.execute(sa.text(
+        "SELECT id, opening_amount, closing_amount FROM cash_sessions WHERE is_active = :active"
+    ), {'active': False}).all()
+    cash_sessions = sa.table(
+        'cash_sessions',
+        sa.column('id', sa.Integer), sa.column('expected_cash', sa.Numeric), sa.column('cash_difference', sa.Numeric),
+        sa.column('orders_count', sa.Integer), sa.column('average_ticket', sa.Numeric), sa.column('close_report', sa.Text),
+    )
+    update = cash_sessions.update().where(cash_sessions.c.id == sa.bindparam('session_id')).values(
+        expected_cash=sa.bindparam('expected_cash'), cash_difference=sa.bindparam('cash_difference'),
+        orders_count=sa.bindparam('orders_count'), average_ticket=sa.bindparam('average_ticket'),
+        close_report=sa.bindparam('close_report'),
+    )
+    batch = []
+    for session_id, opening_amount, closing_amount in sessions:
+        opening = Decimal(str(opening_amount or 0))
+        expected = balance = opening
+        sales, orders_count = Decimal(0), 0
+        types, methods = {}, {}
+        for movement_type, method, count, amount in totals.get(session_id, []):
+            amount = Decimal(str(amount or 0))
+            balance += amount
+            type_totals = types.setdefault(movement_type, {'count': 0, 'amount': Decimal(0)})
+            type_totals['count'] += count
+            type_totals['amount'] += amount
+            if movement_type == 'sale':
+                sales += amount
+                orders_count += count
+                methods[method] = {'count': count, 'amount': amount}
+                if method.lower() not in CASH_PAYMENT_METHODS:
+                    continue
+            expected += amount
+
+        batch.append({
+            'session_id': session_id,
+            'expected_cash': expected,
+            'cash_difference': Decimal(str(closing_amount or 0)) - expected,
+            'orders_count': orders_count,
+            'average_ticket': (sales / orders_count).quantize(Decimal('0.01')) if orders_count else Decimal(0),
+            'close_report': json.dumps({
+                'opening': float(opening),
+                'balance': float(balance),
+                'sales': float(sales),
+                'types': {key: {'count': value['count'], 'amount': float(value['amount'])} for key, value in types.items()},
+                'methods': {
+                    key: {'count': value['count'], 'amount': float(value['amount'])}
+                    for key, value in sorted(methods.items(), key=lambda item: -item[1]['amount'])
+                },
+            }),
+        })
+        if len(batch) >= BATCH_SIZE:
+            bind.execute(update, batch)
+            batch = []
+    if batch:
+        bind.execute(update, batch)
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('cash_sessions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('expected_cash', sa.Numeric(precision=12, scale=2), nullable=True))
+        batch_op.add_column(sa.Column('cash_difference', sa.Numeric(precision=12, scale=2), nullable=True))
+        batch_op.add_column(sa.Column('orders_count', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('average_ticket', sa.Numeric(precision=12, scale=2), nullable=True))
+        batch_op.add_column(sa.Column('close_report', sa.Text(), nullable=True))
+
+    # ### end Alembic commands ###
+    _backfill()
+
+
+def downgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('cash_sessions', schema=None) as batch_op:
+        batch_op.drop_column('close_report')
+        batch_op.drop_column('average_ticket')
+        batch_op.drop_column('orders_count')
+        batch_op.drop_column('cash_difference')
+        batch_op.drop_column('expected_cash')
+
+    # ### end Alembic commands ###
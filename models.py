@@ -5,6 +5,19 @@ from werkzeug.security import generate_password_hash, check_password_hash
 import enum
 from sqlalchemy import Numeric
 from sqlalchemy.orm import relationship
+import json
+
+def build_srcset(variants_json, fmt='webp'):
+    """
+    Monta o atributo `srcset` a partir do JSON de variantes gerado pelo
+    services/image_service.py. Retorna None se ainda não houver variantes.
+    """
+    try:
+        variants = json.loads(variants_json) if variants_json else {}
+    except (json.JSONDecodeError, TypeError):
+        return None
+    entries = [f"{v[fmt]} {v['width']}w" for v in variants.values() if v.get(fmt)]
+    return ', '.join(entries) or None
 
 # Enum para status de pedidos
 class OrderStatus(enum.Enum):
@@ -107,6 +120,8 @@ class RestaurantConfig(db.Model):
     email_notifications = db.Column(db.Boolean, default=False)
     sms_notifications = db.Column(db.Boolean, default=False)
     logo_url = db.Column(db.String(255), nullable=True)
+    # JSON com as variantes redimensionadas da logo (thumb/medium em webp/jpg)
+    logo_variants = db.Column(db.Text, nullable=True)
     address = db.Column(db.String(255), nullable=True)
     delivery_time_min = db.Column(db.Integer, default=30)
     delivery_time_max = db.Column(db.Integer, default=60)
@@ -116,10 +131,24 @@ class RestaurantConfig(db.Model):
     phone = db.Column(db.String(20), nullable=True)
     pix_key = db.Column(db.String(255), nullable=True)
     manual_status_override = db.Column(db.String(10), default='auto')
+    # Fuso horário do restaurante, usado para calcular o status de funcionamento
+    timezone = db.Column(db.String(50), nullable=False, default='America/Sao_Paulo', server_default='America/Sao_Paulo')
+    # Versão do cardápio público: incrementada a cada escrita que altera o cardápio
+    # (produtos, horários, status, bairros). Usada no cache e no ETag do cardápio.
+    menu_revision = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    menu_updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Impressora térmica (services/print_service.py): largura da bobina em mm (58/80)
+    # e hash SHA-256 do token do agente local de impressão (o token não é gravado)
+    printer_paper_width = db.Column(db.Integer, nullable=False, default=80, server_default='80')
+    print_agent_token_hash = db.Column(db.String(64), nullable=True, unique=True)
     
     # ADICIONADO: Relacionamento de volta para o usuário
     user = db.relationship('User', back_populates='config')
 
+    @property
+    def logo_srcset(self):
+        return build_srcset(self.logo_variants)
+
 class Permission(db.Model):
     __tablename__ = 'permission'
     id = db.Column(db.Integer, primary_key=True)
@@ -173,6 +202,9 @@ class Subscription(db.Model):
 # Modelo de Produto
 class Product(db.Model):
     __tablename__ = 'products'
+    __table_args__ = (
+        db.Index('ix_products_user_active', 'user_id', 'is_active'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     name = db.Column(db.String(100), nullable=False)
@@ -181,13 +213,32 @@ class Product(db.Model):
     is_active = db.Column(db.Boolean, default=True)
     category = db.Column(db.String(50), nullable=True)
     photo_url = db.Column(db.String(255), nullable=True)
+    # JSON com as variantes redimensionadas da foto (thumb/medium em webp/jpg)
+    photo_variants = db.Column(db.Text, nullable=True)
     is_delivery = db.Column(db.Boolean, default=True)
     is_balcao = db.Column(db.Boolean, default=True)
     order_items = db.relationship('OrderItem', backref='product', lazy=True)
 
+    @property
+    def photo_srcset(self):
+        return build_srcset(self.photo_variants)
+
+    @property
+    def photo_srcset_jpg(self):
+        return build_srcset(self.photo_variants, 'jpg')
+
 # Modelo de Pedido
 class Order(db.Model):
     __tablename__ = 'orders'
+    # Índices compostos para as consultas por restaurante + período (filtros em
+    # intervalos semiabertos de timestamp, ver services/business_hours.utc_day_range)
+    __table_args__ = (
+        db.Index('ix_orders_user_created', 'user_id', 'created_at'),
+        db.Index('ix_orders_user_status_completed', 'user_id', 'status', 'completed_at'),
+        db.Index('ix_orders_user_status_canceled', 'user_id', 'status', 'canceled_at'),
+        # Vendas do PDV registradas offline e sincronizadas depois (idempotência por cliente)
+        db.UniqueConstraint('user_id', 'client_uuid', name='uq_orders_user_client_uuid'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=True)
@@ -197,6 +248,8 @@ class Order(db.Model):
     total_price = db.Column(Numeric(10, 2), nullable=False)
     delivery_fee = db.Column(Numeric(10, 2), nullable=False, default=0.0)
     status = db.Column(db.Enum(OrderStatus), default=OrderStatus.PENDING)
+    # Incrementada a cada transição de status (services/order_state_service.py)
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     completed_at = db.Column(db.DateTime, nullable=True)
     canceled_at = db.Column(db.DateTime, nullable=True)
@@ -205,20 +258,95 @@ class Order(db.Model):
     notes = db.Column(db.Text, nullable=True)
     items = db.relationship('OrderItem', backref='order', lazy=True, cascade="all, delete-orphan")
     complement_note = db.Column(db.Text, nullable=True)
+    # Resumo dos itens gravado junto com eles (services/order_service.apply_order_summary),
+    # para que as listagens leiam só a tabela orders: quantidade total de itens, uma
+    # linha por item ("2x X Burguer (obs)") e a soma dos itens sem a taxa de entrega.
+    item_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    items_summary = db.Column(db.Text, nullable=True)
+    subtotal = db.Column(Numeric(10, 2), nullable=False, default=0, server_default='0')
+    # UUID gerado pelo PDV para vendas sincronizadas (services/pos_sync_service.py)
+    client_uuid = db.Column(db.String(36), nullable=True)
+
+    @property
+    def summary_lines(self):
+        return self.items_summary.splitlines() if self.items_summary else []
+
+# Modelo de Entrada de Pedido (recebimento idempotente do cardápio público)
+class OrderIntake(db.Model):
+    __tablename__ = 'order_intakes'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'idempotency_key', name='uq_order_intakes_user_key'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    idempotency_key = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    # pending -> done (order_id preenchido) ou failed (error preenchido)
+    status = db.Column(db.String(20), nullable=False, default='pending', index=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime, nullable=True)
+
+# Fila de impressão de comandas. O agente local de impressão de cada restaurante
+# reivindica os trabalhos pendentes em lotes e confirma cada um depois de imprimir.
+class PrintJob(db.Model):
+    __tablename__ = 'print_jobs'
+    __table_args__ = (
+        db.Index('ix_print_jobs_user_status', 'user_id', 'status', 'id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False, index=True)
+    # pending -> printing (reivindicado pelo agente) -> done, ou failed após PRINT_JOB_MAX_ATTEMPTS
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    printed_at = db.Column(db.DateTime, nullable=True)
 
 # Modelo de Item do Pedido
 class OrderItem(db.Model):
     __tablename__ = 'order_items'
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False, index=True)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
     price_at_order = db.Column(Numeric(10, 2), nullable=False)
     notes = db.Column(db.Text, nullable=True)
     
+# Consolidado diário de vendas (por restaurante, dia e forma de pagamento).
+# Mantido de forma incremental em services/rollup_service.py quando um pedido é
+# concluído/cancelado; pode ser reconstruído com `flask rebuild_sales_rollup`.
+class DailySalesRollup(db.Model):
+    __tablename__ = 'daily_sales_rollup'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'day', 'payment_method', name='uq_daily_sales_rollup_user_day_method'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    # '' quando o pedido não tem forma de pagamento (mantém a chave única sem NULL)
+    payment_method = db.Column(db.String(50), nullable=False, default='')
+    orders_count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(Numeric(12, 2), nullable=False, default=0)
+    delivery_fees = db.Column(Numeric(12, 2), nullable=False, default=0)
+    cancelled_count = db.Column(db.Integer, nullable=False, default=0)
+    cancelled_amount = db.Column(Numeric(12, 2), nullable=False, default=0)
+
 # Modelo de Movimentação de Caixa
 class CashMovement(db.Model):
     __tablename__ = 'cash_movements'
+    __table_args__ = (
+        db.Index('ix_cash_movements_user_session', 'user_id', 'session_id'),
+        db.Index('ix_cash_movements_user_created', 'user_id', 'created_at'),
+        db.Index('ix_cash_movements_order', 'order_id'),
+        # No máximo um movimento de venda por pedido
+        db.Index('ux_cash_movements_sale_order', 'order_id', unique=True,
+                 sqlite_where=db.text("type = 'sale'"), postgresql_where=db.text("type = 'sale'")),
+        db.UniqueConstraint('user_id', 'client_uuid', name='uq_cash_movements_user_client_uuid'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     type = db.Column(db.String(20), nullable=False)
@@ -227,6 +355,8 @@ class CashMovement(db.Model):
     order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     session_id = db.Column(db.Integer, db.ForeignKey('cash_sessions.id'), nullable=True)
+    # UUID gerado pelo PDV para movimentos sincronizados (services/pos_sync_service.py)
+    client_uuid = db.Column(db.String(36), nullable=True)
     
 # Modelo de Sessão de Caixa
 class CashSession(db.Model):
@@ -239,6 +369,43 @@ class CashSession(db.Model):
     closed_at = db.Column(db.DateTime, nullable=True)
     is_active = db.Column(db.Boolean, default=True)
     movements = db.relationship('CashMovement', backref='session', lazy=True)
+    # Totais correntes da sessão, atualizados a cada movimento (services/cash_service.py).
+    # balance = abertura + movimentos; saídas (despesas/sangrias) somadas em módulo.
+    # Conferidos/recalculados com `flask reconcile_cash_sessions`.
+    balance = db.Column(Numeric(12, 2), nullable=False, default=0, server_default='0')
+    total_sales = db.Column(Numeric(12, 2), nullable=False, default=0, server_default='0')
+    total_expenses = db.Column(Numeric(12, 2), nullable=False, default=0, server_default='0')
+    total_deposits = db.Column(Numeric(12, 2), nullable=False, default=0, server_default='0')
+    total_withdrawals = db.Column(Numeric(12, 2), nullable=False, default=0, server_default='0')
+    method_totals = db.relationship('CashSessionMethodTotal', backref='session', lazy=True)
+    # Resumo congelado no fechamento (services/cash_service.apply_close_snapshot): dinheiro
+    # esperado na gaveta x contado, pedidos, ticket médio e, em close_report (JSON), os
+    # totais por tipo de movimento e por forma de pagamento. Nulo em sessões abertas.
+    expected_cash = db.Column(Numeric(12, 2), nullable=True)
+    cash_difference = db.Column(Numeric(12, 2), nullable=True)
+    orders_count = db.Column(db.Integer, nullable=True)
+    average_ticket = db.Column(Numeric(12, 2), nullable=True)
+    close_report = db.Column(db.Text, nullable=True)
+
+    @property
+    def report(self):
+        try:
+            return json.loads(self.close_report) if self.close_report else {}
+        except (json.JSONDecodeError, TypeError):
+            return {}
+
+# Vendas da sessão de caixa por forma de pagamento (mantido junto com os totais da sessão)
+class CashSessionMethodTotal(db.Model):
+    __tablename__ = 'cash_session_method_totals'
+    __table_args__ = (
+        db.UniqueConstraint('session_id', 'payment_method', name='uq_cash_session_method_totals_session_method'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.Integer, db.ForeignKey('cash_sessions.id'), nullable=False)
+    # '' quando o pedido não tem forma de pagamento (mantém a chave única sem NULL)
+    payment_method = db.Column(db.String(50), nullable=False, default='')
+    sales_count = db.Column(db.Integer, nullable=False, default=0)
+    sales_amount = db.Column(Numeric(12, 2), nullable=False, default=0)
 
 # Modelo de Bairro para Entrega
 class Neighborhood(db.Model):
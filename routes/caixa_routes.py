@@ -2,26 +2,41 @@
 #
 # Importa módulos e classes necessários
 import os
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
 from flask_login import login_required, current_user
-from models import db, CashSession, CashMovement, Order, Product, OrderItem, OrderStatus, Customer
+from werkzeug.http import is_resource_modified
+from models import db, CashSession, CashMovement, Order, OrderItem, OrderStatus, Customer, PrintJob
 from datetime import datetime, timedelta
-from sqlalchemy import func, extract
-from sqlalchemy import case
+from sqlalchemy import func, case
 from collections import defaultdict
 from sqlalchemy.orm import joinedload
 from decimal import Decimal
+from services.order_service import resolve_order_items, insert_order_items, apply_order_summary
+from services.rollup_service import record_order
+from services.business_hours import restaurant_timezone, local_today, utc_day_range, local_date, local_datetime
+from services.pagination_service import keyset_paginate, page_size_from
+from services.events_service import notify_order, ORDER_CREATED, ORDER_DELETED
+from services.cash_service import record_movement, get_method_totals, close_session
+from services.order_edit_service import edit_counter_order
+from services.pos_sync_service import product_snapshot, sync_pos_batch, SyncError
+from services.menu_service import get_menu_version
+from services.product_search_service import search_products as search_indexed_products, SCOPE_ALL, SCOPE_BALCAO
 
 
 # Define o Blueprint para as rotas do caixa
 caixa_bp = Blueprint('caixa', __name__, url_prefix='/caixa')
 
+# Movimentações do dia por página na tela do caixa
+MOVEMENTS_PAGE_SIZE = 20
+# Fechamentos de caixa listados no histórico
+CLOSED_SESSIONS_LIMIT = 100
+
 @caixa_bp.route('/')
 @login_required
 def index():
     """
-    Rota principal para exibir o status do caixa, movimentos diários e a lista de produtos
-    para o "Novo Pedido Manual" quando o caixa estiver aberto.
+    Rota principal para exibir o status do caixa e os movimentos do dia. Os produtos do
+    "Novo Pedido Manual" vêm de /caixa/buscar_produtos (services/product_search_service.py).
     """
     # Verificar se há sessão ativa
     active_session = CashSession.query.filter(
@@ -29,56 +44,56 @@ def index():
         CashSession.is_active == True
     ).first()
     
-    # Movimentações do dia
-    today = datetime.now().date()
-    movements = CashMovement.query.filter(
+    # Movimentações do dia (dia local do restaurante, como intervalo semiaberto em UTC)
+    tz = restaurant_timezone(current_user)
+    today = local_today(tz)
+    day_start, day_end = utc_day_range(today, today, tz)
+    day_filters = [
         CashMovement.user_id == current_user.id,
-        func.date(CashMovement.created_at) == today
-    ).order_by(CashMovement.created_at.desc()).all()
-    
-    total_sales = sum(m.amount for m in movements if m.type == 'sale')
-
-    # Otimizado: Uso de Gerador de Expressão. Mantém abs() para somar gastos como positivos.
-    total_expenses = sum(abs(m.amount) for m in movements if m.type in ['expense', 'withdrawal'])
+        CashMovement.created_at >= day_start,
+        CashMovement.created_at < day_end
+    ]
 
-    # CORRIGIDO E OTIMIZADO: Remoção do erro de sintaxe e uso do Gerador de Expressão.
-    total_deposits = sum(m.amount for m in movements if m.type == 'deposit')
+    # Totais do dia em uma única consulta agregada (despesas e retiradas somadas em módulo)
+    total_sales, total_expenses, total_deposits = db.session.query(
+        func.sum(case((CashMovement.type == 'sale', CashMovement.amount), else_=0)),
+        func.sum(case((CashMovement.type.in_(('expense', 'withdrawal')), func.abs(CashMovement.amount)), else_=0)),
+        func.sum(case((CashMovement.type == 'deposit', CashMovement.amount), else_=0))
+    ).filter(*day_filters).one()
+
+    # Lista paginada por cursor, só com as colunas exibidas (sem objetos ORM)
+    page = keyset_paginate(
+        db.session.query(
+            CashMovement.id, CashMovement.type, CashMovement.description,
+            CashMovement.amount, CashMovement.created_at
+        ).filter(*day_filters),
+        CashMovement.created_at, CashMovement.id,
+        cursor=request.args.get('cursor'),
+        page_size=page_size_from(request.args.get('per_page'), default=MOVEMENTS_PAGE_SIZE)
+    )
 
-    current_balance = 0.0
-    if active_session:
-        opening_amount = active_session.opening_amount
-        balance_change = db.session.query(func.sum(CashMovement.amount)).filter(
-            CashMovement.session_id == active_session.id,
-            CashMovement.type != 'opening'
-        ).scalar() or 0.0
-        
-        # CORREÇÃO: Ocorre TypeError ao somar Decimal (opening_amount) e float (balance_change=0.0).
-        # Convertemos explicitamente opening_amount (Decimal) e balance_change (Decimal ou float)
-        # para float para garantir o tipo homogêneo na soma, resolvendo o erro.
-        current_balance = float(opening_amount) + float(balance_change)
-    
-    products = Product.query.filter(
-        Product.user_id == current_user.id,
-        Product.is_active == True,
-        Product.is_balcao == True
-    ).all()
+    # Saldo corrente mantido na própria sessão (services/cash_service.record_movement)
+    current_balance = float(active_session.balance) if active_session else 0.0
+    method_totals = get_method_totals(active_session.id) if active_session else []
     
     # Consulta de pedidos de balcão (sem cliente associado)
-    new_counter_orders = db.session.query(Order).options(joinedload(Order.items)).filter(
+    new_counter_orders = db.session.query(Order).filter(
         Order.user_id == current_user.id,
         Order.status == OrderStatus.COMPLETED,
-        func.date(Order.created_at) == today,
+        Order.created_at >= day_start,
+        Order.created_at < day_end,
         Order.customer_id.is_(None)
     ).order_by(Order.created_at.desc()).all()
     
     return render_template('caixa/index.html',
                             active_session=active_session,
-                            movements=movements,
-                            total_sales=total_sales,
-                            total_expenses=total_expenses,
-                            total_deposits=total_deposits,
+                            movements=page.items,
+                            page=page,
+                            total_sales=total_sales or 0,
+                            total_expenses=total_expenses or 0,
+                            total_deposits=total_deposits or 0,
                             current_balance=current_balance,
-                            products=products,
+                            method_totals=method_totals,
                             new_counter_orders=new_counter_orders)
 
 @caixa_bp.route('/abrir', methods=['POST'])
@@ -102,7 +117,8 @@ def open_cash():
     try:
         session = CashSession(
             user_id=current_user.id,
-            opening_amount=opening_amount
+            opening_amount=opening_amount,
+            balance=opening_amount
         )
         db.session.add(session)
         db.session.flush()
@@ -144,28 +160,35 @@ def close_cash():
         return redirect(url_for('caixa.index'))
     
     try:
-        active_session.closing_amount = closing_amount
-        active_session.closed_at = datetime.utcnow()
-        active_session.is_active = False
-        
-        movement = CashMovement(
-            user_id=current_user.id,
-            session_id=active_session.id,
-            type='closing',
-            description='Fechamento de caixa',
-            amount=closing_amount
-        )
-        db.session.add(movement)
-        
+        # Registra o fechamento e congela o resumo da sessão (esperado x contado, totais)
+        close_session(active_session, closing_amount)
         db.session.commit()
         
         flash('Caixa fechado com sucesso!', 'success')
+        return redirect(url_for('caixa.session_report', session_id=active_session.id))
     except Exception as e:
         db.session.rollback()
         flash(f'Erro ao fechar o caixa: {str(e)}', 'danger')
 
     return redirect(url_for('caixa.index'))
 
+@caixa_bp.route('/sessao/<int:session_id>')
+@login_required
+def session_report(session_id):
+    """Resumo de fechamento de uma sessão de caixa, lido do snapshot gravado no fechamento."""
+    cash_session = CashSession.query.filter(
+        CashSession.id == session_id,
+        CashSession.user_id == current_user.id
+    ).first_or_404()
+    tz = restaurant_timezone(current_user)
+    return render_template(
+        'caixa/session_report.html',
+        cash_session=cash_session,
+        report=cash_session.report,
+        opened_at=local_datetime(cash_session.opened_at, tz) if cash_session.opened_at else None,
+        closed_at=local_datetime(cash_session.closed_at, tz) if cash_session.closed_at else None
+    )
+
 @caixa_bp.route('/movimento', methods=['POST'])
 @login_required
 def add_movement():
@@ -209,6 +232,7 @@ def add_movement():
         )
         
         db.session.add(movement)
+        record_movement(movement)
         db.session.commit()
         
         flash('Movimentação registrada com sucesso!', 'success')
@@ -229,32 +253,54 @@ def history():
     end_date_str = request.args.get('end_date')
 
     query = CashMovement.query.filter_by(user_id=current_user.id)
+    tz = restaurant_timezone(current_user)
 
     if start_date_str and end_date_str:
         try:
-            start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
-            end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
-            query = query.filter(CashMovement.created_at >= start_date, CashMovement.created_at <= end_date + timedelta(days=1))
+            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+            end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
         except ValueError:
             flash('Formato de data inválido. Use AAAA-MM-DD.', 'danger')
             return redirect(url_for('caixa.history'))
     else:
-        today = datetime.now()
-        query = query.filter(
-            extract('year', CashMovement.created_at) == today.year,
-            extract('month', CashMovement.created_at) == today.month
-        )
+        # Mês corrente no fuso do restaurante
+        end_date = local_today(tz)
+        start_date = end_date.replace(day=1)
 
-    all_movements = query.order_by(CashMovement.created_at.desc()).all()
+    range_start, range_end = utc_day_range(start_date, end_date, tz)
+    query = query.filter(CashMovement.created_at >= range_start, CashMovement.created_at < range_end)
+
+    # Sessões fechadas no período, lidas do resumo gravado no fechamento
+    closed_sessions = CashSession.query.filter(
+        CashSession.user_id == current_user.id,
+        CashSession.is_active == False,
+        CashSession.closed_at >= range_start,
+        CashSession.closed_at < range_end
+    ).order_by(CashSession.closed_at.desc()).limit(CLOSED_SESSIONS_LIMIT).all()
+
+    # Totais do período em uma consulta agregada; a lista é paginada por cursor em (created_at, id)
+    total_movements, total_amount = query.with_entities(
+        func.count(CashMovement.id), func.sum(CashMovement.amount)
+    ).one()
+    page = keyset_paginate(
+        query, CashMovement.created_at, CashMovement.id,
+        cursor=request.args.get('cursor'),
+        page_size=page_size_from(request.args.get('per_page'))
+    )
     
     movements_by_date = defaultdict(list)
-    for movement in all_movements:
-        date = movement.created_at.date()
+    for movement in page.items:
+        date = local_date(movement.created_at, tz)
         movements_by_date[date].append(movement)
 
     return render_template(
         'caixa/history.html',
         movements_by_date=movements_by_date,
+        page=page,
+        summary={'movements': total_movements, 'amount': total_amount or 0},
+        closed_sessions=closed_sessions,
+        local_datetime=local_datetime,
+        tz=tz,
         start_date=start_date_str,
         end_date=end_date_str
     )
@@ -299,46 +345,28 @@ def finalize_counter_order():
             change_for=change_for, 
             total_price=Decimal('0.00'), # Inicializado como Decimal
             status=OrderStatus.COMPLETED,
+            completed_at=datetime.utcnow(),
             notes=notes
         )
 
         db.session.add(order)
         db.session.flush()
 
-        # 3. Inicializa o total como Decimal.
-        total_price = Decimal(0)
-        order_items_to_print = []
-
-        for item_data in items_data:
-            product_id = item_data.get('product_id') 
-            quantity = item_data.get('quantity')
-            item_notes = item_data.get('notes', '') 
-            
-            if not product_id or not quantity or quantity <= 0:
-                continue
-            
-            product = Product.query.get(product_id)
-            
-            if product:
-                item = OrderItem(
-                    order_id=order.id,
-                    product_id=product.id,
-                    quantity=quantity,
-                    price_at_order=product.price,
-                    notes=item_notes
-                )
-                db.session.add(item)
-                
-                # Cálculo feito com Decimal
-                total_price += product.price * quantity 
-
-                order_items_to_print.append({
-                    'name': product.name,
-                    'quantity': quantity,
-                    'price': product.price,
-                    'total': product.price * quantity,
-                    'notes': item_notes
-                })
+        # 3. Resolve todos os itens em uma única consulta (restrita ao restaurante)
+        #    e grava os OrderItems em um único INSERT em lote. O total é Decimal.
+        items, total_price = resolve_order_items(current_user.id, items_data, id_key='product_id', notes_key='notes')
+        insert_order_items(order.id, items)
+        apply_order_summary(order, items)
+
+        order_items_to_print = [
+            {
+                'name': item.product.name,
+                'quantity': item.quantity,
+                'price': item.product.price,
+                'total': item.total,
+                'notes': item.notes
+            } for item in items
+        ]
 
         order.total_price = total_price
         
@@ -359,6 +387,9 @@ def finalize_counter_order():
             order_id=order.id
         )
         db.session.add(cash_movement)
+        record_movement(cash_movement, payment_method=order.payment_method)
+        record_order(order)
+        notify_order(order, ORDER_CREATED)
         db.session.commit()
         
         receipt_html = render_template(
@@ -391,42 +422,60 @@ def finalize_counter_order():
         if "InvalidOperation" in str(type(e)):
              return jsonify({'success': False, 'message': 'Valor de pagamento inválido. Certifique-se de usar um formato numérico válido.'}), 400
              
-        print(f"Erro ao processar o pedido: {e}")
+        current_app.logger.error(f"Erro ao processar o pedido: {e}", exc_info=True)
         return jsonify({'success': False, 'message': 'Ocorreu um erro inesperado.'}), 500
 
 @caixa_bp.route('/buscar_produtos')
 @login_required
 def search_products():
     """
-    Busca produtos por nome para a funcionalidade de "Novo Pedido de Balcão".
+    Busca produtos por nome (sem diferenciar acentos) para o "Novo Pedido de Balcão",
+    a edição de pedidos e o novo pedido em pedidos/new.html (?escopo=todos inclui os
+    produtos que não são de balcão). Usa o índice em memória do restaurante.
     """
-    query = request.args.get('q', '').strip().lower()
+    query = request.args.get('q', '').strip()
     
     if not query:
         return jsonify([])
 
-    products = Product.query.filter(
-        Product.user_id == current_user.id,
-        Product.is_active == True,
-        Product.is_balcao == True,
-        func.lower(Product.name).like(f'%{query}%')
-    ).order_by(
-        case(
-            (func.lower(Product.name).startswith(query), 0),
-            else_=1
-        ),
-        Product.name
-    ).limit(10).all()
-
-    results = [
-        {
-            'id': product.id,
-            'name': product.name,
-            'price': float(product.price)
-        } for product in products
-    ]
-    
-    return jsonify(results)
+    scope = SCOPE_ALL if request.args.get('escopo') == SCOPE_ALL else SCOPE_BALCAO
+    limit = max(1, min(request.args.get('limite', 10, type=int) or 10, 200))
+    return jsonify(search_indexed_products(current_user.id, query, scope, limit))
+
+@caixa_bp.route('/produtos_snapshot')
+@login_required
+def products_snapshot():
+    """
+    Produtos e preços para o PDV guardar localmente e continuar vendendo sem internet.
+    O ETag é a menu_revision: enquanto o cardápio não mudar, a revalidação responde 304.
+    """
+    etag = f'pdv-{current_user.id}-{get_menu_version(current_user.id)}'
+    if not is_resource_modified(request.environ, etag=etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(product_snapshot(current_user.id))
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+@caixa_bp.route('/sincronizar', methods=['POST'])
+@login_required
+def sync_offline():
+    """
+    Recebe em lote as vendas de balcão e movimentos registrados pelo PDV sem internet
+    ({'orders': [...], 'movements': [...]}, cada item com client_uuid) e grava tudo em
+    uma transação. Reenvios do mesmo item voltam como 'duplicate'.
+    """
+    try:
+        results = sync_pos_batch(current_user.id, request.get_json(silent=True))
+    except SyncError as e:
+        return jsonify({'success': False, 'message': str(e)}), e.status_code
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Erro ao sincronizar o PDV: {e}", exc_info=True)
+        return jsonify({'success': False, 'message': 'Ocorreu um erro inesperado.'}), 500
+    return jsonify({'success': True, **results})
 
 @caixa_bp.route('/editar_pedido/<int:order_id>', methods=['GET', 'POST'])
 @login_required
@@ -446,62 +495,14 @@ def editar_pedido(order_id):
             if not order_data:
                 return jsonify({'success': False, 'message': 'Dados de pedido ausentes.'}), 400
 
-            new_notes = order_data.get('notes', '')
-            items_data = order_data.get('items', [])
-            
-            # Deleta os itens antigos
-            OrderItem.query.filter_by(order_id=order.id).delete()
-
-            new_total_price = 0
-            for item_data in items_data:
-                product_id = item_data.get('product_id')
-                quantity = item_data.get('quantity')
-                item_notes = item_data.get('notes', '')
-
-                if not product_id or quantity <= 0:
-                    continue
-                
-                product = Product.query.get(product_id)
-                if product:
-                    new_item = OrderItem(
-                        order_id=order.id,
-                        product_id=product.id,
-                        quantity=quantity,
-                        price_at_order=product.price,
-                        notes=item_notes
-                    )
-                    db.session.add(new_item)
-                    new_total_price += product.price * quantity
-
-            # Atualiza o pedido e o movimento de caixa
-            order.notes = new_notes
-            order.total_price = new_total_price
-            
-            cash_movement = CashMovement.query.filter_by(order_id=order.id).first()
-            if cash_movement:
-                cash_movement.amount = new_total_price
-            else:
-                active_session = CashSession.query.filter(
-                    CashSession.user_id == current_user.id,
-                    CashSession.is_active == True
-                ).first()
-                if active_session:
-                    new_movement = CashMovement(
-                        user_id=current_user.id,
-                        session_id=active_session.id,
-                        type='sale',
-                        description=f'Venda de Balcão (Editado) - Pedido #{order.id}',
-                        amount=new_total_price,
-                        order_id=order.id
-                    )
-                    db.session.add(new_movement)
-            
+            # Grava só a diferença dos itens; caixa e consolidado só se o total mudar
+            edit_counter_order(order, order_data.get('items', []), order_data.get('notes', ''))
             db.session.commit()
             return jsonify({'success': True, 'message': 'Pedido atualizado com sucesso.'})
 
         except Exception as e:
             db.session.rollback()
-            print(f"Erro ao editar pedido: {e}")
+            current_app.logger.error(f"Erro ao editar pedido: {e}", exc_info=True)
             return jsonify({'success': False, 'message': 'Ocorreu um erro inesperado.'}), 500
 
     # GET request - retorna os dados completos do pedido para o modal de edição
@@ -534,8 +535,13 @@ def excluir_pedido(order_id):
     try:
         order = Order.query.filter_by(id=order_id, user_id=current_user.id).first_or_404()
         
+        record_order(order, -1)
+        notify_order(order, ORDER_DELETED)
+        for movement in CashMovement.query.filter_by(order_id=order.id):
+            record_movement(movement, -1, order.payment_method)
         CashMovement.query.filter_by(order_id=order.id).delete()
         OrderItem.query.filter_by(order_id=order.id).delete()
+        PrintJob.query.filter_by(order_id=order.id).delete()
         
         db.session.delete(order)
         db.session.commit()
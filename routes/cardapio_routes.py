@@ -1,140 +1,135 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort
+import logging
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort, current_app
+from werkzeug.http import is_resource_modified
 from models import db, User, Product, Order, OrderItem, OrderStatus, RestaurantConfig, Neighborhood, Restaurant
-from datetime import datetime
+from datetime import datetime, timezone
 import json
 from sqlalchemy.orm import joinedload
 from decimal import Decimal
 from slugify import slugify # Importação necessária
+from services.menu_service import get_menu_snapshot, get_menu_version, get_menu_document, render_menu_page
+from services.intake_service import find_intake, submit_order
+from services.business_hours import WEEK_DAYS, restaurant_status as get_restaurant_status
 
 cardapio_bp = Blueprint('cardapio', __name__, url_prefix='/cardapio')
-
-def get_restaurant_status(opening_hours, manual_status):
-    """
-    Determina o status de funcionamento do restaurante (Aberto/Fechado/Indisponível).
-    """
-    
-    # 1. VERIFICAÇÃO DE STATUS MANUAL (PRIORIDADE MÁXIMA)
-    if manual_status == 'open':
-        return 'Aberto'
-    if manual_status == 'closed':
-        return 'Fechado'
-    
-    # 2. VERIFICAÇÃO DE HORÁRIO AUTOMÁTICO
-    if not opening_hours:
-        return 'Fechado' 
-
-    now = datetime.now()
-    day_of_week = now.strftime('%A').lower()
-    current_time = now.strftime('%H:%M')
-
-    if day_of_week not in opening_hours or not opening_hours[day_of_week]:
-        return 'Fechado'
-
-    day_config = opening_hours[day_of_week]
-
-    if not day_config.get('open'):
-        return 'Fechado'
-
-    open_time = day_config.get('open')
-    close_time = day_config.get('close')
-
-    if open_time and close_time:
-        if open_time <= current_time < close_time:
-            return 'Aberto'
-    
-    return 'Fechado'
-
+logger = logging.getLogger(__name__)
 
 @cardapio_bp.route('/<int:user_id>-<string:restaurant_slug>')
 def menu(user_id, restaurant_slug):
     """
     Exibe o cardápio público de um restaurante.
+    Responde a GETs condicionais (If-None-Match / If-Modified-Since) com 304.
     """
-    user = User.query.get_or_404(user_id)
-    
-    config = user.config or RestaurantConfig(user_id=user.id)
-    if not user.config:
-        db.session.add(config)
-        db.session.commit()
-
-    products = Product.query.filter_by(
-        user_id=user.id,
-        is_active=True,
-        is_delivery=True
-    ).all()
-    
-    products_by_category = {}
-    for product in products:
-        if product.category not in products_by_category:
-            products_by_category[product.category] = []
-        products_by_category[product.category].append(product)
-    
-    neighborhoods = Neighborhood.query.filter_by(user_id=user.id).all()
-    
-    opening_hours_json = config.business_hours
-    try:
-        opening_hours = json.loads(opening_hours_json) if opening_hours_json else {}
-    except (json.JSONDecodeError, TypeError):
-        opening_hours = {}
-
-    manual_status = config.manual_status_override
-    
-    # LOG DE DIAGNÓSTICO
-    print(f"*** DIAGNÓSTICO CARDÁPIO ***")
-    print(f"ID do Usuário: {user_id}")
-    print(f"Status Manual lido do DB (manual_status_override): '{manual_status}'")
-    print(f"Horários lidos (business_hours): {opening_hours}")
-    
-    restaurant_status = get_restaurant_status(opening_hours, manual_status)
-
-    # LOG DE DIAGNÓSTICO FINAL
-    print(f"Status Final Calculado (restaurant_status): '{restaurant_status}'")
-    print(f"*****************************")
-
-
-    today_day_name = datetime.now().strftime('%A').lower()
-    
-    day_names = {
-        'monday': 'Segunda-feira',
-        'tuesday': 'Terça-feira',
-        'wednesday': 'Quarta-feira',
-        'thursday': 'Quinta-feira',
-        'friday': 'Sexta-feira',
-        'saturday': 'Sábado',
-        'sunday': 'Domingo',
-    }
-    
-    if today_day_name in day_names:
-        day_names[today_day_name] = 'Hoje'
-
-    return render_template(
-        'cardapio/menu.html',
-        user=user,
-        products_by_category=products_by_category,
-        config=config,
-        neighborhoods=neighborhoods,
-        opening_hours=opening_hours,
-        restaurant_status=restaurant_status,
-        day_names=day_names
-    )
+    # Consulta barata da revisão; o restante do cardápio vem do cache
+    # (services/menu_service.py) enquanto a revisão não mudar.
+    snapshot = get_menu_snapshot(user_id, get_menu_version(user_id))
+    if snapshot is None:
+        abort(404)
+
+    manual_status = snapshot.manual_status
+
+    # Apenas o status de funcionamento é calculado a cada requisição,
+    # usando a agenda compilada no fuso do restaurante.
+    schedule = snapshot.schedule
+    restaurant_status = get_restaurant_status(schedule, manual_status)
+
+    # Diagnóstico do status (DEBUG; habilite com LOG_ROUTE_LEVELS='cardapio.menu=DEBUG')
+    logger.debug('menu.status', extra={
+        'restaurant_id': user_id,
+        'manual_status': manual_status,
+        'restaurant_status': restaurant_status,
+        'revision': snapshot.revision,
+    })
+
+    local_now = schedule.local_now()
+    today_day_name = WEEK_DAYS[local_now.weekday()]
+
+    # O HTML depende apenas de (revisão, status, dia), então o ETag é derivado deles.
+    etag = f"menu-{user_id}-{snapshot.revision}-{slugify(restaurant_status)}-{today_day_name}"
+    # Last-Modified: a última escrita no cardápio, a virada do dia ou a última abertura/fechamento.
+    changes = [local_now.replace(hour=0, minute=0, second=0, microsecond=0)]
+    if manual_status not in ('open', 'closed') and schedule.last_transition(local_now):
+        changes.append(schedule.last_transition(local_now))
+    last_modified = max(change.astimezone(timezone.utc).replace(tzinfo=None) for change in changes)
+    if snapshot.updated_at:
+        last_modified = max(last_modified, snapshot.updated_at)
+
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(render_menu_page(snapshot, restaurant_status, today_day_name))
+
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config.get('MENU_HTTP_MAX_AGE', 30)
+    return response
+
+@cardapio_bp.route('/api/v1/<int:user_id>/menu')
+def menu_data(user_id):
+    """
+    Versão JSON (somente leitura) do cardápio para renderização no cliente.
+    O ETag é o hash do conteúdo; com ?v=<hash> atual a resposta é imutável e pode
+    ficar em cache indefinidamente, sem o parâmetro o cliente sempre revalida.
+    """
+    snapshot = get_menu_snapshot(user_id, get_menu_version(user_id))
+    if snapshot is None:
+        abort(404)
+
+    restaurant_status = get_restaurant_status(snapshot.schedule, snapshot.manual_status)
+    document = get_menu_document(snapshot, restaurant_status)
+
+    if not is_resource_modified(request.environ, etag=document.etag):
+        response = current_app.response_class(status=304)
+    elif 'gzip' in request.accept_encodings:
+        response = current_app.response_class(document.gzipped, mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = current_app.response_class(document.body, mimetype='application/json')
+
+    response.set_etag(document.etag)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    if request.args.get('v') == document.etag:
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+def _intake_response(intake):
+    """Resposta do recebimento: 200 com o redirecionamento quando o pedido já existe, 202 enquanto pendente."""
+    if intake.status == 'done':
+        return jsonify({
+            'success': True,
+            'order_id': intake.order_id,
+            'redirect_url': url_for('cardapio.order_confirmation', order_id=intake.order_id)
+        }), 200
+    if intake.status == 'failed':
+        return jsonify({'success': False, 'message': 'Não foi possível registrar seu pedido. Por favor, tente novamente.'}), 422
+    return jsonify({
+        'success': True,
+        'pending': True,
+        'status_url': url_for('cardapio.order_intake_status', user_id=intake.user_id, idempotency_key=intake.idempotency_key)
+    }), 202
 
 @cardapio_bp.route('/<int:user_id>/create_order', methods=['POST'])
 def create_order(user_id):
     order_data = request.get_json()
 
-    print(f"Dados do pedido recebidos: {order_data}")
-    print(f"Forma de pagamento recebida: {order_data.get('payment_method')}")
-
     if not order_data:
         return jsonify({'success': False, 'message': 'Dados de pedido ausentes.'}), 400
 
+    # Chave gerada pelo navegador a cada pedido; reenvios (toque duplo, retry) devolvem o pedido original
+    idempotency_key = (request.headers.get('Idempotency-Key') or order_data.pop('idempotency_key', None) or '').strip()[:64]
+    existing = find_intake(user_id, idempotency_key)
+    if existing:
+        return _intake_response(existing)
+
     client_name = order_data.get('client_name')
     client_phone = order_data.get('client_phone')
     client_address = order_data.get('client_address')
-    order_notes = order_data.get('complement_note')
     payment_method = order_data.get('payment_method')
-    change_for_str = order_data.get('change_for') # Receber como string
-    neighborhood_id_str = order_data.get('neighborhood_id')
     order_items_data = order_data.get('order_items', [])
 
     if not all([client_name, client_phone, client_address, payment_method]):
@@ -143,95 +138,42 @@ def create_order(user_id):
     if not order_items_data:
         return jsonify({'success': False, 'message': 'Seu pedido não contém nenhum item.'}), 400
 
-    try:
-        # CONVERSÃO DE TIPOS CRÍTICAS PARA DECIMAL/FLOAT
-        total_price = Decimal(0)
-        delivery_fee = Decimal(0)
-        change_for = Decimal(change_for_str) if change_for_str and change_for_str.isdigit() else None
-        
-        # 1. Busca e calcula Taxa de Entrega
-        if neighborhood_id_str:
-            try:
-                neighborhood = Neighborhood.query.get(int(neighborhood_id_str))
-                if neighborhood:
-                    delivery_fee = Decimal(neighborhood.delivery_fee)
-            except (ValueError, TypeError):
-                # Se neighborhood_id for inválido, tenta pegar a taxa padrão do config
-                config = RestaurantConfig.query.filter_by(user_id=user_id).first()
-                if config and config.default_delivery_fee:
-                     delivery_fee = Decimal(config.default_delivery_fee)
-                else:
-                    print("⚠️ Aviso: neighborhood_id inválido e sem default_delivery_fee.")
-
-
-        new_order = Order(
-            user_id=user_id,
-            client_name=client_name,
-            client_phone=client_phone,
-            client_address=client_address,
-            notes=order_notes,
-            # Inicializa com 0.0, será atualizado após o loop
-            total_price=0.0, 
-            status=OrderStatus.PENDING,
-            payment_method=payment_method,
-            # Passa change_for como Decimal para o objeto
-            change_for=change_for if change_for and payment_method == 'Dinheiro' else None
-        )
-        db.session.add(new_order)
-        db.session.flush()
-
-        # 2. Loop para salvar OrderItems
-        for item_data in order_items_data:
-            try:
-                product_id = int(item_data.get('id'))
-                quantity = int(item_data.get('quantity'))
-                observation = item_data.get('note', '') # Garante que 'note' é a chave
-                
-                if quantity <= 0:
-                    continue
-
-                product = Product.query.get(product_id)
-
-                if product:
-                    # CORREÇÃO: Usa Decimal para o cálculo
-                    item_total = Decimal(product.price) * Decimal(quantity)
-                    total_price += item_total
-
-                    new_item = OrderItem(
-                        order_id=new_order.id,
-                        product_id=product.id,
-                        quantity=quantity,
-                        price_at_order=product.price,
-                        notes=observation
-                    )
-                    db.session.add(new_item)
-                
-            except (ValueError, TypeError) as e:
-                # Loga o item que falhou, mas continua o loop
-                print(f"⚠️ Erro ao processar item {item_data}: {e}")
-                continue
-
-        # 3. Cálculo Final e Troco
-        final_total = total_price + delivery_fee
-        new_order.total_price = float(final_total) # Salva como float no DB
-        new_order.delivery_fee = float(delivery_fee) # Salva como float no DB
-
-        if new_order.payment_method == 'Dinheiro' and new_order.change_for is not None:
-            # Troco a ser devolvido = Troco para - Total
-            troco_a_devolver = new_order.change_for - final_total
-            new_order.change_due = float(troco_a_devolver) # Salva como float no DB
-            print(f"Valor do troco a ser devolvido: {new_order.change_due}")
-        
-        db.session.commit()
-        
-        return jsonify({'success': True, 'redirect_url': url_for('cardapio.order_confirmation', order_id=new_order.id)}), 200
+    # Recusa pedidos com o restaurante fechado (agenda compilada em cache, sem reprocessar o JSON)
+    snapshot = get_menu_snapshot(user_id, get_menu_version(user_id))
+    if snapshot is None:
+        return jsonify({'success': False, 'message': 'Restaurante não encontrado.'}), 404
+    if get_restaurant_status(snapshot.schedule, snapshot.manual_status) != 'Aberto':
+        return jsonify({'success': False, 'message': 'O restaurante está fechado no momento e não está recebendo pedidos.'}), 400
 
+    try:
+        intake, created = submit_order(user_id, idempotency_key, order_data)
+        # Sem o payload completo (dados do cliente); só o necessário para rastrear o pedido
+        logger.info('order.received', extra={
+            'restaurant_id': user_id,
+            'intake_id': intake.id,
+            'order_id': intake.order_id,
+            'intake_status': intake.status,
+            'items': len(order_items_data),
+            'payment_method': payment_method,
+            'duplicate': not created,
+        })
+        return _intake_response(intake)
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         db.session.rollback()
-        # Loga o erro detalhado
-        print(f"🚨 ERRO FATAL ao criar pedido: {e}")
+        logger.error(f"Erro ao criar pedido do cardápio: {e}", exc_info=True)
         return jsonify({'success': False, 'message': f'Ocorreu um erro inesperado ao processar seu pedido. Por favor, tente novamente. Erro: {str(e)}'}), 500
 
+@cardapio_bp.route('/<int:user_id>/pedido/<string:idempotency_key>')
+def order_intake_status(user_id, idempotency_key):
+    """Consultado pelo cardápio enquanto o pedido aguarda na fila de recebimento."""
+    intake = find_intake(user_id, idempotency_key)
+    if intake is None:
+        return jsonify({'success': False, 'message': 'Pedido não encontrado.'}), 404
+    return _intake_response(intake)
+
 @cardapio_bp.route('/<int:order_id>/pix_payment')
 def pix_payment(order_id):
     order = Order.query.get_or_404(order_id)
@@ -286,7 +228,7 @@ def order_confirmation(order_id):
 
     except Exception as e:
         # Log do erro para debug
-        print(f"⚠️ ERRO em order_confirmation: {e}")
+        logger.error(f"Erro em order_confirmation: {e}", exc_info=True)
         # Aborta com um erro interno, para que o erro seja logado no Render
         abort(500, description=f"Erro ao carregar confirmação do pedido: {e}") 
         # Alternativamente, a mensagem simples que você já tem:
@@ -0,0 +1,120 @@
+from flask import Blueprint, request, redirect, url_for, flash, jsonify, Response, current_app
+from flask_login import login_required, current_user
+from sqlalchemy.orm import joinedload
+from models import db, Order, OrderItem, RestaurantConfig
+from services.business_hours import restaurant_timezone
+from services.escpos_service import render_comanda, PAPER_COLUMNS, DEFAULT_PAPER_WIDTH
+from services.print_service import (
+    config_for_token, rotate_agent_token, enqueue_comanda, claim_jobs, render_jobs, finish_job
+)
+
+# Impressão de comandas em impressoras térmicas (ESC/POS).
+# As rotas /agente/* são usadas pelo agente local de impressão e autenticadas pelo
+# token do restaurante (cabeçalho "Authorization: Bearer <token>"), não pela sessão.
+impressao_bp = Blueprint('impressao', __name__, url_prefix='/impressao')
+
+
+def _agent_config():
+    header = request.headers.get('Authorization', '')
+    token = header[7:].strip() if header.lower().startswith('bearer ') else None
+    return config_for_token(token)
+
+
+def _paper_width(config):
+    width = config.printer_paper_width if config else None
+    return width if width in PAPER_COLUMNS else DEFAULT_PAPER_WIDTH
+
+
+@impressao_bp.route('/agente/jobs', methods=['POST'])
+def agent_claim_jobs():
+    """
+    Entrega ao agente um lote de comandas pendentes (?limit=, até PRINT_JOB_BATCH_SIZE).
+    Cada comanda vem em ESC/POS (base64) e deve ser confirmada em /agente/jobs/<id>.
+    """
+    config = _agent_config()
+    if config is None:
+        return jsonify({'success': False, 'message': 'Token do agente inválido.'}), 401
+
+    max_batch = current_app.config['PRINT_JOB_BATCH_SIZE']
+    limit = max(1, min(request.args.get('limit', max_batch, type=int) or max_batch, max_batch))
+    jobs = claim_jobs(config.user_id, limit)
+    payload = render_jobs(config.user_id, jobs, config) if jobs else {'paper_width': _paper_width(config), 'jobs': []}
+    return jsonify({'success': True, **payload})
+
+
+@impressao_bp.route('/agente/jobs/<int:job_id>', methods=['POST'])
+def agent_finish_job(job_id):
+    """Confirmação do agente: {"printed": true} ou {"printed": false, "error": "..."}."""
+    config = _agent_config()
+    if config is None:
+        return jsonify({'success': False, 'message': 'Token do agente inválido.'}), 401
+
+    data = request.get_json(silent=True) or {}
+    updated = finish_job(config.user_id, job_id, bool(data.get('printed')), data.get('error'))
+    db.session.commit()
+    if not updated:
+        return jsonify({'success': False, 'message': 'Trabalho não está reivindicado por este agente.'}), 409
+    return jsonify({'success': True})
+
+
+@impressao_bp.route('/pedidos/<int:order_id>', methods=['POST'])
+@login_required
+def enqueue_order(order_id):
+    """Reimpressão: coloca a comanda do pedido na fila do agente."""
+    order = Order.query.filter_by(id=order_id, user_id=current_user.id).first_or_404()
+    job = enqueue_comanda(order)
+    db.session.commit()
+
+    wants_json = request.accept_mimetypes.best == 'application/json'
+    if job is None:
+        message = 'Nenhum agente de impressão configurado. Gere um token no perfil.'
+        if wants_json:
+            return jsonify({'success': False, 'message': message}), 409
+        flash(message, 'warning')
+    elif wants_json:
+        return jsonify({'success': True, 'job_id': job.id})
+    else:
+        flash(f'Comanda do Pedido #{order.id} enviada para a impressora.', 'success')
+    return redirect(request.referrer or url_for('pedidos.index'))
+
+
+@impressao_bp.route('/pedidos/<int:order_id>/escpos', methods=['GET'])
+@login_required
+def comanda_escpos(order_id):
+    """Bytes ESC/POS da comanda, para impressão direta (ex.: spooler RAW) sem o agente."""
+    order = Order.query.options(
+        joinedload(Order.items).joinedload(OrderItem.product)
+    ).filter(Order.id == order_id, Order.user_id == current_user.id).first_or_404()
+
+    config = current_user.config
+    width = request.args.get('width', type=int) or _paper_width(config)
+    restaurant = current_user.restaurants
+    data = render_comanda(
+        order, restaurant.name if restaurant else None, width=width,
+        tz=restaurant_timezone(current_user), codepage=current_app.config['ESCPOS_CODEPAGE']
+    )
+    return Response(data, mimetype='application/octet-stream', headers={
+        'Content-Disposition': f'attachment; filename=comanda-{order.id}.bin'
+    })
+
+
+@impressao_bp.route('/configurar', methods=['POST'])
+@login_required
+def configure():
+    """Largura da bobina e (opcionalmente) um novo token para o agente de impressão."""
+    config = current_user.config
+    if config is None:
+        config = RestaurantConfig(user_id=current_user.id)
+        db.session.add(config)
+
+    width = request.form.get('paper_width', type=int)
+    if width in PAPER_COLUMNS:
+        config.printer_paper_width = width
+
+    token = rotate_agent_token(config) if request.form.get('rotate_token') else None
+    db.session.commit()
+    if token:
+        flash(f'Novo token do agente de impressão (copie agora, ele não será exibido de novo): {token}', 'success')
+    else:
+        flash('Configuração da impressora salva.', 'success')
+    return redirect(url_for('perfil.index'))
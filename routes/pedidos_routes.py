@@ -1,12 +1,21 @@
 import os
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+import time
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, Response
 from flask_login import login_required, current_user
-from models import db, Order, OrderItem, Product, CashMovement, OrderStatus
+from models import db, Order, OrderItem, Product, OrderStatus
 from datetime import datetime
-from sqlalchemy import func
+from sqlalchemy import func, case, and_
 import json
 from sqlalchemy.orm import joinedload
 from decimal import Decimal 
+from services.order_service import resolve_order_items, insert_order_items, apply_order_summary
+from services.business_hours import restaurant_timezone, utc_day_range, local_date
+from services.pagination_service import keyset_paginate, page_size_from
+from services.events_service import get_broker, notify_order, ORDER_CREATED, acquire_stream_slot, stream_slot_releaser
+from services.order_state_service import (
+    transition_order, bulk_transition, OrderTransitionError, NEXT_STATUS,
+    APPLIED, CONFLICT, INVALID, NOT_FOUND
+)
 
 pedidos_bp = Blueprint('pedidos', __name__, url_prefix='/pedidos', 
 template_folder=os.path.join(os.path.dirname(__file__), '../templates/pedidos'))
@@ -26,14 +35,103 @@ def index():
         flash('Status de pedido inválido.', 'danger')
         return redirect(url_for('pedidos.index', status='PENDING'))
         
-    orders = Order.query.options(
-        joinedload(Order.items).joinedload(OrderItem.product)
-    ).filter(
+    # Só a tabela orders: os itens aparecem pelo resumo gravado no pedido
+    orders = Order.query.filter(
         Order.user_id == current_user.id,
         Order.status == OrderStatus[status]
     ).order_by(Order.created_at.desc()).all()
 
-    return render_template('pedidos/index.html', orders=orders, OrderStatus=OrderStatus, status=status)
+    # Só a lista (o quadro recarrega ela quando o stream reconecta)
+    if request.args.get('fragment'):
+        return render_template('pedidos/_order_list.html', orders=orders, OrderStatus=OrderStatus)
+
+    next_status = NEXT_STATUS.get(OrderStatus[status])
+    return render_template('pedidos/index.html', orders=orders, OrderStatus=OrderStatus, status=status,
+                           next_status=next_status)
+
+# Status exibidos no quadro de pedidos (pedidos.index)
+BOARD_STATUSES = (OrderStatus.PENDING, OrderStatus.PREPARING, OrderStatus.SENT)
+
+@pedidos_bp.route('/<int:order_id>/card')
+@login_required
+def order_card(order_id):
+    """
+    HTML do card de um pedido, usado pelo quadro ao vivo para atualizar só o pedido
+    que mudou. Retorna 204 se o pedido não está mais em um status do quadro.
+    """
+    order = Order.query.filter(
+        Order.id == order_id,
+        Order.user_id == current_user.id
+    ).first_or_404()
+
+    if order.status not in BOARD_STATUSES:
+        return '', 204
+    return render_template('pedidos/_order_card.html', order=order, OrderStatus=OrderStatus)
+
+@pedidos_bp.route('/stream')
+@login_required
+def stream():
+    """
+    Server-Sent Events com os eventos de pedidos do restaurante (criação e mudança de
+    status). A conexão não segura sessão de banco e é encerrada depois de
+    SSE_MAX_STREAM_SECONDS; o EventSource do navegador reconecta sozinho.
+    Cada conexão ocupa uma thread: acima de SSE_MAX_STREAMS por processo a resposta
+    fecha na hora com `retry` de SSE_FALLBACK_RETRY_SECONDS, e o quadro recarrega a
+    lista a cada reconexão (consulta periódica em vez de tempo real).
+    """
+    if not acquire_stream_slot():
+        retry_ms = current_app.config['SSE_FALLBACK_RETRY_SECONDS'] * 1000
+        return Response(f'retry: {retry_ms}\n\n', mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+        })
+
+    release_slot = stream_slot_releaser()
+    try:
+        user_id = current_user.id
+        heartbeat = current_app.config['SSE_HEARTBEAT_SECONDS']
+        max_seconds = current_app.config['SSE_MAX_STREAM_SECONDS']
+        subscription = get_broker().subscribe(user_id)
+    except Exception:
+        release_slot()
+        raise
+    db.session.remove()
+
+    def events():
+        deadline = time.monotonic() + max_seconds
+        yield 'retry: 3000\n\n'
+        while time.monotonic() < deadline:
+            data = subscription.get(timeout=heartbeat)
+            if data is None:
+                # Comentário SSE: mantém a conexão viva em proxies
+                yield ': ping\n\n'
+                continue
+            yield f"event: {data['type']}\ndata: {json.dumps(data)}\n\n"
+
+    response = Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+    response.call_on_close(subscription.close)
+    response.call_on_close(release_slot)
+    return response
+
+def _date_filters(column, start_date_str, end_date_str, tz):
+    """Filtros de período em intervalo semiaberto no fuso do restaurante (usam os índices compostos)."""
+    filters = [column.isnot(None)]
+    if start_date_str:
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+        filters.append(column >= utc_day_range(start_date, start_date, tz)[0])
+    if end_date_str:
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+        filters.append(column < utc_day_range(end_date, end_date, tz)[1])
+    return filters
+
+# Troco a devolver calculado no banco: só pagamentos em dinheiro com valor dado acima do total
+TROCO_A_DEVOLVER = case(
+    (and_(Order.payment_method == 'Dinheiro', Order.change_for > Order.total_price),
+     Order.change_for - Order.total_price),
+    else_=0
+)
 
 @pedidos_bp.route('/concluidos', methods=['GET'])
 @login_required
@@ -41,80 +139,73 @@ def concluidos():
     start_date_str = request.args.get('start_date')
     end_date_str = request.args.get('end_date')
 
-    query = Order.query.filter(
+    tz = restaurant_timezone(current_user)
+    filters = [
         Order.user_id == current_user.id,
-        Order.status == OrderStatus.COMPLETED
+        Order.status == OrderStatus.COMPLETED,
+        *_date_filters(Order.completed_at, start_date_str, end_date_str, tz)
+    ]
+
+    # Totais do período inteiro em uma consulta agregada (independe da página)
+    total_orders, total_amount, total_troco = db.session.query(
+        func.count(Order.id), func.sum(Order.total_price), func.sum(TROCO_A_DEVOLVER)
+    ).filter(*filters).one()
+
+    # Uma página por cursor em (completed_at, id); os itens vêm do resumo do pedido
+    page = keyset_paginate(
+        db.session.query(Order, TROCO_A_DEVOLVER.label('troco_a_devolver')).filter(*filters),
+        Order.completed_at, Order.id,
+        cursor=request.args.get('cursor'),
+        page_size=page_size_from(request.args.get('per_page'))
     )
-    
-    if start_date_str:
-        # Certifique-se de que datetime está importado do módulo 'datetime'
-        start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
-        # Certifique-se de que func está importado de 'sqlalchemy'
-        query = query.filter(func.date(Order.completed_at) >= start_date)
-    
-    if end_date_str:
-        end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
-        query = query.filter(func.date(Order.completed_at) <= end_date)
-    
-    completed_orders = query.order_by(Order.completed_at.desc()).all()
-    
+
     grouped_by_date = {}
-    for order in completed_orders:
-        
-        # 🚨 LÓGICA DE CÁLCULO DE TROCO ADICIONADA AQUI
-        order.troco_a_devolver = 0
-        if order.payment_method == 'Dinheiro' and order.change_for:
-            # O campo 'change_for' é o valor que o cliente deu
-            troco_calculado = order.change_for - order.total_price
-            if troco_calculado > 0:
-                # Anexa o troco a devolver como um novo atributo ao objeto Order
-                order.troco_a_devolver = troco_calculado
-        # 🚨 FIM DA LÓGICA DE CÁLCULO DE TROCO
-        
-        if order.completed_at:
-            date_key = order.completed_at.strftime('%d/%m/%Y')
-            if date_key not in grouped_by_date:
-                grouped_by_date[date_key] = []
-            grouped_by_date[date_key].append(order)
+    for order, troco_a_devolver in page.items:
+        order.troco_a_devolver = troco_a_devolver
+        date_key = local_date(order.completed_at, tz).strftime('%d/%m/%Y')
+        grouped_by_date.setdefault(date_key, []).append(order)
             
     return render_template('pedidos/concluded.html', 
         grouped_orders=grouped_by_date,
+        page=page,
+        summary={'orders': total_orders, 'amount': total_amount or 0, 'troco': total_troco or 0},
         start_date=start_date_str,
         end_date=end_date_str)
 
 @pedidos_bp.route('/cancelados', methods=['GET'])
 @login_required
 def cancelados():
-    # ... (código inalterado)
     start_date_str = request.args.get('start_date')
     end_date_str = request.args.get('end_date')
 
-    query = Order.query.filter(
+    tz = restaurant_timezone(current_user)
+    filters = [
         Order.user_id == current_user.id,
-        Order.status == OrderStatus.CANCELLED
+        Order.status == OrderStatus.CANCELLED,
+        *_date_filters(Order.canceled_at, start_date_str, end_date_str, tz)
+    ]
+
+    total_orders, total_amount = db.session.query(
+        func.count(Order.id), func.sum(Order.total_price)
+    ).filter(*filters).one()
+
+    page = keyset_paginate(
+        Order.query.filter(*filters),
+        Order.canceled_at, Order.id,
+        cursor=request.args.get('cursor'),
+        page_size=page_size_from(request.args.get('per_page'))
     )
-    
-    if start_date_str:
-        start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
-        query = query.filter(func.date(Order.canceled_at) >= start_date)
-    
-    if end_date_str:
-        end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
-        query = query.filter(func.date(Order.canceled_at) <= end_date)
 
-    cancelled_orders = query.order_by(Order.canceled_at.desc()).all()
-    
     grouped_by_date = {}
-    for order in cancelled_orders:
-        if order.canceled_at:
-            date_key = order.canceled_at.strftime('%d/%m/%Y')
-            if date_key not in grouped_by_date:
-                grouped_by_date[date_key] = []
-            grouped_by_date[date_key].append(order)
+    for order in page.items:
+        date_key = local_date(order.canceled_at, tz).strftime('%d/%m/%Y')
+        grouped_by_date.setdefault(date_key, []).append(order)
             
     return render_template(
         'pedidos/cancelados.html', 
         grouped_orders=grouped_by_date,
+        page=page,
+        summary={'orders': total_orders, 'amount': total_amount or 0},
         start_date=start_date_str,
         end_date=end_date_str
     )
@@ -122,19 +213,30 @@ def cancelados():
 @pedidos_bp.route('/<int:order_id>/cancelar', methods=['POST'])
 @login_required
 def cancel_order(order_id):
-    # ... (código inalterado)
     order = Order.query.filter(
         Order.id == order_id,
         Order.user_id == current_user.id
     ).first_or_404()
     
     cancel_reason = request.form.get('cancel_reason', 'Motivo não especificado.')
+    wants_json = request.accept_mimetypes.best == 'application/json'
 
-    order.status = OrderStatus.CANCELLED
-    order.canceled_at = datetime.utcnow()
+    # Transição condicional (services/order_state_service.py): consolidado, evento e
+    # dashboard são atualizados junto; um segundo clique recebe conflito em vez de recancelar.
+    try:
+        transition_order(order, OrderStatus.CANCELLED, expected_version=request.form.get('version', type=int))
+    except OrderTransitionError as e:
+        db.session.rollback()
+        if wants_json:
+            return jsonify({'success': False, 'message': str(e)}), 409
+        flash(str(e), 'danger')
+        return redirect(url_for('pedidos.index'))
     order.cancel_reason = cancel_reason
     db.session.commit()
 
+    if wants_json:
+        return jsonify({'success': True, 'status': order.status.name})
+
     flash(f'Pedido #{order.id} cancelado com sucesso.', 'success')
     return redirect(url_for('pedidos.cancelados'))
 
@@ -173,47 +275,17 @@ def new_order():
             db.session.add(order)
             db.session.flush() 
             
-            total_price = Decimal(0)
-            
-            # Adicione a taxa de entrega ao preço inicial, se for o caso.
-            # No seu caso, o total de R$ 10.00 é a taxa. Se você não está calculando a taxa na rota do Cardápio,
-            # ela deve ser adicionada aqui.
-            # total_price = total_price + Decimal('10.00') # Exemplo se 10.00 for a taxa fixa
-            
-            for item_data in items_data:
-                
-                # Garante que ID e Quantidade são inteiros (int)
-                try:
-                    product_id = int(item_data.get('id'))
-                    quantity = int(item_data.get('quantity'))
-                except (TypeError, ValueError):
-                    continue
-                    
-                # Usa 'note' para observação, conforme o log
-                observation = item_data.get('note', '') 
-                
-                if quantity <= 0:
-                    continue
-                
-                product = Product.query.get(product_id)
-                
-                if product:
-                    item = OrderItem(
-                        order_id=order.id,
-                        product_id=product.id,
-                        quantity=quantity,
-                        price_at_order=product.price,
-                        notes=observation
-                    )
-                    db.session.add(item)
-                    total_price += Decimal(product.price) * Decimal(quantity)
-                else:
-                    print(f"Produto não encontrado para ID: {product_id}. Item ignorado.") 
+            # Resolve todos os itens em uma única consulta (restrita ao restaurante)
+            # e grava os OrderItems em um único INSERT em lote.
+            items, total_price = resolve_order_items(current_user.id, items_data)
+            insert_order_items(order.id, items)
+            apply_order_summary(order, items)
             
             # Se o valor total de R$ 10.00 deve ser adicionado *após* a soma dos itens:
             # Assumindo que R$ 10.00 é a taxa de entrega:
             delivery_fee = Decimal('10.00') # Você deve buscar esse valor do DB ou do JSON
             order.total_price = total_price + delivery_fee
+            notify_order(order, ORDER_CREATED)
             
             db.session.commit()
             
@@ -222,7 +294,7 @@ def new_order():
             
         except Exception as e:
             db.session.rollback()
-            print(f"Erro ao criar pedido: {e}") 
+            current_app.logger.error(f"Erro ao criar pedido: {e}", exc_info=True)
             flash(f'Ocorreu um erro ao criar o pedido: {e}', 'danger')
             return jsonify({'success': False, 'message': str(e)}), 500
 
@@ -237,39 +309,68 @@ def new_order():
 @pedidos_bp.route('/<int:order_id>/status/next', methods=['POST'])
 @login_required
 def next_status(order_id):
-    # ... (código inalterado)
     order = Order.query.filter(
         Order.id == order_id,
         Order.user_id == current_user.id
     ).first_or_404()
+    wants_json = request.accept_mimetypes.best == 'application/json'
 
-    status_sequence = {
-        OrderStatus.PENDING: OrderStatus.PREPARING,
-        OrderStatus.PREPARING: OrderStatus.SENT,
-        OrderStatus.SENT: OrderStatus.COMPLETED
-    }
+    # A versão vista na tela evita que um clique atrasado avance o pedido duas vezes
+    try:
+        transition_order(order, expected_version=request.form.get('version', type=int))
+    except OrderTransitionError as e:
+        db.session.rollback()
+        if wants_json:
+            return jsonify({'success': False, 'message': str(e)}), 409
+        flash(str(e), 'danger')
+        return redirect(url_for('pedidos.index', status=order.status.name))
 
-    if order.status in status_sequence:
-        next_status = status_sequence[order.status]
-        order.status = next_status
-        
-        if next_status == OrderStatus.COMPLETED:
-            order.completed_at = datetime.utcnow()
-            cash_movement = CashMovement(
-                user_id=current_user.id,
-                type='sale',
-                description=f'Venda - Pedido #{order.id}',
-                amount=order.total_price,
-                order_id=order.id
-            )
-            db.session.add(cash_movement)
-        
+    db.session.commit()
+    if wants_json:
+        return jsonify({'success': True, 'status': order.status.name})
+    flash(f'Status do Pedido #{order.id} atualizado para {order.status.name.replace("_", " ").title()}', 'success')
+    return redirect(url_for('pedidos.index', status=order.status.name))
+
+# Limite de pedidos por requisição em lote
+BULK_STATUS_MAX_ORDERS = 100
+
+@pedidos_bp.route('/status/lote', methods=['POST'])
+@login_required
+def bulk_status():
+    """
+    Avança vários pedidos de uma vez. JSON: {"order_ids": [...], "status": "PREPARING"}
+    (sem "status", cada pedido vai para o próximo da sequência). Tudo em uma transação;
+    responde com os ids aplicados e os que foram recusados, por motivo.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        order_ids = [int(order_id) for order_id in data.get('order_ids') or []]
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Lista de pedidos inválida.'}), 400
+    if not order_ids:
+        return jsonify({'success': False, 'message': 'Nenhum pedido selecionado.'}), 400
+    if len(order_ids) > BULK_STATUS_MAX_ORDERS:
+        return jsonify({'success': False, 'message': f'Selecione no máximo {BULK_STATUS_MAX_ORDERS} pedidos.'}), 400
+
+    to_status = None
+    if data.get('status'):
+        try:
+            to_status = OrderStatus[str(data['status']).upper()]
+        except KeyError:
+            return jsonify({'success': False, 'message': 'Status inválido.'}), 400
+
+    try:
+        results = bulk_transition(current_user.id, order_ids, to_status)
         db.session.commit()
-        flash(f'Status do Pedido #{order.id} atualizado para {next_status.name.replace("_", " ").title()}', 'success')
-    else:
-        flash(f'O status do Pedido #{order.id} não pode ser avançado.', 'danger')
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Erro na atualização em lote de pedidos: {e}", exc_info=True)
+        return jsonify({'success': False, 'message': 'Ocorreu um erro inesperado.'}), 500
 
-    return redirect(url_for('pedidos.index', status=order.status.name))
+    summary = {outcome: [] for outcome in (APPLIED, CONFLICT, INVALID, NOT_FOUND)}
+    for order_id, outcome in sorted(results.items()):
+        summary[outcome].append(order_id)
+    return jsonify({'success': True, **summary})
 
 @pedidos_bp.route('/<int:order_id>')
 @login_required
@@ -1,12 +1,21 @@
 import os
 import json
+import logging
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from slugify import slugify # Adicionado: Necessário para criar URLs amigáveis
-from werkzeug.utils import secure_filename
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, abort
 from flask_login import login_required, current_user
 from models import db, User, Product, Neighborhood, RestaurantConfig, Restaurant
+from services.menu_service import invalidate_menu
+from services.business_hours import compile_schedule, DEFAULT_TIMEZONE
+from services.image_service import save_upload, process_upload_async
 
 perfil_bp = Blueprint('perfil', __name__, url_prefix='/perfil')
+logger = logging.getLogger(__name__)
+
+# Arquivo com extensão permitida mas que não abre como imagem (image_service.save_upload)
+INVALID_IMAGE_MESSAGE = 'Arquivo de imagem inválido. Envie uma foto PNG, JPG ou GIF.'
+
 
 def allowed_file(filename):
     """Verifica se a extensão do arquivo é permitida."""
@@ -105,19 +114,23 @@ def update_profile():
         current_user.whatsapp = request.form.get('whatsapp')
         config.address = request.form.get('address')
 
+        upload = None
         if 'logo' in request.files:
             file = request.files['logo']
             if file and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                upload_folder = os.path.join(current_app.root_path, 'static', 'uploads')
-                if not os.path.exists(upload_folder):
-                    os.makedirs(upload_folder)
-                
-                logo_path = os.path.join(upload_folder, f"{current_user.id}_{filename}")
-                file.save(logo_path)
-                config.logo_url = url_for('static', filename=f"uploads/{current_user.id}_{filename}")
-
+                try:
+                    upload = save_upload(file, current_user.id)
+                except ValueError:
+                    db.session.rollback()
+                    flash(INVALID_IMAGE_MESSAGE, 'danger')
+                    return redirect(url_for('perfil.index'))
+                config.logo_url = upload[0]
+                config.logo_variants = None
+
+        invalidate_menu(current_user.id)
         db.session.commit()
+        if upload:
+            process_upload_async(current_user.id, *upload, target='logo')
         flash('Perfil atualizado com sucesso!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -144,12 +157,29 @@ def update_hours():
         if not config:
             config = RestaurantConfig(user_id=current_user.id)
             db.session.add(config)
+
+        # O fuso horário pode vir junto no payload; não faz parte dos horários.
+        tz_name = hours_data.pop('timezone', None)
+        if tz_name:
+            try:
+                ZoneInfo(tz_name)
+            except (ZoneInfoNotFoundError, ValueError):
+                return jsonify({'success': False, 'message': 'Fuso horário inválido.'}), 400
+            config.timezone = tz_name
         
         # O frontend da rota 'update-hours' (que não está aqui) deve estar enviando um JSON
         # diferente do que a rota de perfil esperava (que usava request.form). 
         # Mantendo a lógica de processamento de JSON para a rota update-hours:
         config.business_hours = json.dumps(hours_data)
+
+        # Recompila a agenda (valida os horários e atualiza o cache do status)
+        try:
+            compile_schedule(current_user.id, config.business_hours, config.timezone or DEFAULT_TIMEZONE)
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({'success': False, 'message': f'Horários inválidos: {e}'}), 400
         
+        invalidate_menu(current_user.id)
         db.session.commit()
         return jsonify({'success': True, 'message': 'Horários de funcionamento atualizados com sucesso.'}), 200
 
@@ -176,23 +206,21 @@ def update_status():
             if new_status not in ['auto', 'open', 'closed']:
                 return jsonify({'success': False, 'message': 'Status de override inválido.'}), 400
 
-            # --- LOG DE DIAGNÓSTICO (RECEBIDO) ---
-            print(f"--- LOG STATUS (RECEBIDO) ---")
-            print(f"Status recebido do Frontend: '{new_status}'")
-            
             # 2. Busca ou cria RestaurantConfig
             config = current_user.config or RestaurantConfig(user_id=current_user.id)
             if not current_user.config:
                 db.session.add(config)
-                print(f"Aviso: Configuração criada na hora para o usuário {current_user.id}")
+                logger.warning(f"Configuração criada na hora para o usuário {current_user.id}")
 
             # 3. Atualiza e Salva
             config.manual_status_override = new_status if new_status != 'auto' else None
+            invalidate_menu(current_user.id)
             db.session.commit()
             
-            # --- LOG DE SUCESSO ---
-            print(f"Novo status no DB CONFIRMADO: '{config.manual_status_override}'")
-            print(f"------------------------------")
+            logger.info('status.updated', extra={
+                'requested_status': new_status,
+                'manual_status': config.manual_status_override,
+            })
             
             status_message = "Status Manual Desativado (Modo Automático)."
             if new_status == 'open':
@@ -204,11 +232,7 @@ def update_status():
 
         except Exception as e:
             db.session.rollback()
-            current_app.logger.error(f"ERRO AO ATUALIZAR STATUS MANUAL: {e}")
-            # --- LOG DE ERRO CRÍTICO ---
-            print(f"--- LOG STATUS (FALHA) ---")
-            print(f"ERRO CRÍTICO no DB: {str(e)}")
-            print(f"---------------------------")
+            current_app.logger.error(f"ERRO AO ATUALIZAR STATUS MANUAL: {e}", exc_info=True)
             return jsonify({'success': False, 'message': f'Erro interno ao salvar status: {str(e)}'}), 500
     else:
         return jsonify({'success': False, 'message': 'Requisição deve ser JSON.'}), 400
@@ -255,6 +279,7 @@ def add_neighborhood():
             )
 
             db.session.add(new_neighborhood)
+            invalidate_menu(current_user.id)
             db.session.commit()
             
             flash(f'Bairro "{name}" adicionado com sucesso!', 'success')
@@ -276,6 +301,7 @@ def delete_neighborhood(neighborhood_id):
     
     if neighborhood_to_delete:
         db.session.delete(neighborhood_to_delete)
+        invalidate_menu(current_user.id)
         db.session.commit()
         flash(f'Bairro "{neighborhood_to_delete.name}" removido.', 'success')
     else:
@@ -299,50 +325,37 @@ def add_product():
 
     try:
         price = float(price_str.strip().replace(',', '.'))
-        
-        if 'photo' in request.files:
-            file = request.files['photo']
-            
-            # LINHAS DE DEBBUG
-            print(f"Arquivo recebido: {file.filename}")
-            print(f"Nome do arquivo seguro: {secure_filename(file.filename)}")
-            
-            if file and allowed_file(file.filename):
-                upload_folder = os.path.join(current_app.root_path, 'static', 'uploads', str(current_user.id))
-                os.makedirs(upload_folder, exist_ok=True)
-                
-                filename = secure_filename(file.filename)
-                file_path = os.path.join(upload_folder, filename)
-                
-                # LINHAS DE DEBBUG
-                print(f"Caminho completo do arquivo: {file_path}")
-                
-                file.save(file_path)
-                
-                # LINHAS DE DEBBUG
-                if os.path.exists(file_path):
-                    print("SUCESSO: O arquivo foi salvo no caminho.")
-                else:
-                    print("ERRO: O arquivo NÃO foi salvo.")
-
-                photo_url = url_for('static', filename=f'uploads/{current_user.id}/{filename}')
-
-        product = Product(
-            user_id=current_user.id,
-            name=name,
-            description=description,
-            price=price,
-            category=category,
-            photo_url=photo_url,
-            is_active=True
-        )
-        db.session.add(product)
-        db.session.commit()
-        flash('Produto adicionado com sucesso!', 'success')
     except (ValueError, TypeError) as e:
-        # LINHA DE DEBBUG
-        print(f"ERRO NA CONVERSÃO DO PREÇO: {e}")
+        logger.warning(f"Preço inválido ao adicionar produto: {e}")
         flash('Preço do produto inválido. Use apenas números, com ponto ou vírgula para decimais.', 'danger')
+        return redirect(url_for('perfil.products'))
+
+    upload = None
+    if 'photo' in request.files:
+        file = request.files['photo']
+        if file and allowed_file(file.filename):
+            try:
+                upload = save_upload(file, current_user.id)
+            except ValueError:
+                flash(INVALID_IMAGE_MESSAGE, 'danger')
+                return redirect(url_for('perfil.products'))
+            photo_url = upload[0]
+
+    product = Product(
+        user_id=current_user.id,
+        name=name,
+        description=description,
+        price=price,
+        category=category,
+        photo_url=photo_url,
+        is_active=True
+    )
+    db.session.add(product)
+    invalidate_menu(current_user.id)
+    db.session.commit()
+    if upload:
+        process_upload_async(current_user.id, *upload)
+    flash('Produto adicionado com sucesso!', 'success')
     
     return redirect(url_for('perfil.products'))
 
@@ -356,29 +369,37 @@ def update_product(product_id):
         return redirect(url_for('perfil.products'))
 
     try:
-        product.name = request.form.get('name')
-        product.description = request.form.get('description', '')
         # CORREÇÃO: Substitui a vírgula por ponto antes de converter para float
-        product.price = float(request.form.get('price').replace(',', '.'))
-        product.category = request.form.get('category', '')
-        
-        # Lógica para atualizar a foto do produto
-        if 'photo' in request.files:
-            file = request.files['photo']
-            if file and allowed_file(file.filename):
-                upload_folder = os.path.join(current_app.root_path, 'static', 'uploads', str(current_user.id))
-                os.makedirs(upload_folder, exist_ok=True)
-                
-                filename = secure_filename(file.filename)
-                file_path = os.path.join(upload_folder, filename)
-                file.save(file_path)
-                product.photo_url = url_for('static', filename=f'uploads/{current_user.id}/{filename}')
-
-        db.session.commit()
-        flash(f'Produto "{product.name}" atualizado com sucesso!', 'success')
-    except (ValueError, TypeError):
-        db.session.rollback()
+        price = float(request.form.get('price').replace(',', '.'))
+    except (ValueError, TypeError, AttributeError):
         flash('Erro ao atualizar o produto. Verifique os dados.', 'danger')
+        return redirect(url_for('perfil.products'))
+
+    # Lógica para atualizar a foto do produto
+    upload = None
+    if 'photo' in request.files:
+        file = request.files['photo']
+        if file and allowed_file(file.filename):
+            try:
+                upload = save_upload(file, current_user.id)
+            except ValueError:
+                flash(INVALID_IMAGE_MESSAGE, 'danger')
+                return redirect(url_for('perfil.products'))
+
+    product.name = request.form.get('name')
+    product.description = request.form.get('description', '')
+    product.price = price
+    product.category = request.form.get('category', '')
+    if upload and product.photo_url != upload[0]:
+        product.photo_url = upload[0]
+        product.photo_variants = None
+
+    invalidate_menu(current_user.id)
+    db.session.commit()
+    if upload:
+        # Variantes (thumb/medium em WebP/JPEG) são geradas fora da requisição
+        process_upload_async(current_user.id, *upload)
+    flash(f'Produto "{product.name}" atualizado com sucesso!', 'success')
 
     return redirect(url_for('perfil.products'))
 
@@ -389,6 +410,7 @@ def excluir(product_id):
     product_to_delete = Product.query.filter_by(id=product_id, user_id=current_user.id).first_or_404()
 
     db.session.delete(product_to_delete)
+    invalidate_menu(current_user.id)
     db.session.commit()
 
     flash('Produto excluído com sucesso!', 'danger')
@@ -404,6 +426,7 @@ def toggle_product_status(product_id):
     product = Product.query.filter_by(id=product_id, user_id=current_user.id).first_or_404()
     
     product.is_active = not product.is_active
+    invalidate_menu(current_user.id)
     db.session.commit()
     
     flash(f'Status do produto "{product.name}" atualizado para {"Ativo" if product.is_active else "Inativo"}.', 'success')
@@ -4,6 +4,7 @@ from flask_login import login_required, current_user
 from models import db, Product # Assumindo que o modelo Product está no arquivo models.py
 # Removidas as importações de FileStorage e secure_filename, pois não estamos lidando com upload de arquivos.
 from forms import ProductForm 
+from services.menu_service import invalidate_menu
 
 # Criação do Blueprint para as rotas de produtos
 produtos_bp = Blueprint('produtos', __name__, url_prefix='/produtos')
@@ -54,6 +55,7 @@ def adicionar():
             
             # --- Lógica de Banco de Dados ---
             db.session.add(new_product)
+            invalidate_menu(current_user.id)
             db.session.commit()
             
             flash('Produto adicionado com sucesso!', 'success')
@@ -62,7 +64,7 @@ def adicionar():
         except Exception as e:
             # Em caso de erro, desfaz a transação no banco de dados (rollback)
             db.session.rollback()
-            print(f"ERRO CRÍTICO AO ADICIONAR PRODUTO (/produtos/adicionar): {e}")
+            current_app.logger.error(f"ERRO CRÍTICO AO ADICIONAR PRODUTO (/produtos/adicionar): {e}", exc_info=True)
             
             # Informa o usuário e redireciona
             flash(f'Erro interno ao adicionar produto. Verifique o console para detalhes.', 'danger')
@@ -89,20 +91,25 @@ def editar(product_id):
         try:
             # CRÍTICO: form.populate_obj(product) atualiza todos os campos, 
             # incluindo o photo_url (string da URL).
+            previous_photo = product.photo_url
             form.populate_obj(product) 
+            if product.photo_url != previous_photo:
+                # Variantes geradas no upload não valem para uma URL externa
+                product.photo_variants = None
 
             # A lógica de remoção de arquivo antiga ou upload de nova foto 
             # baseada em FileStorage foi REMOVIDA. 
             # A atualização do URL é feita via form.populate_obj.
 
             # Comita as alterações no banco de dados
+            invalidate_menu(current_user.id)
             db.session.commit()
             flash('Produto atualizado com sucesso!', 'success')
             return redirect(url_for('produtos.index'))
             
         except Exception as e:
             db.session.rollback()
-            print(f"ERRO CRÍTICO AO EDITAR PRODUTO: {e}")
+            current_app.logger.error(f"ERRO CRÍTICO AO EDITAR PRODUTO: {e}", exc_info=True)
             flash(f'Erro interno ao atualizar produto. Verifique o console para detalhes.', 'danger')
             return redirect(url_for('produtos.index'))
 
@@ -120,6 +127,7 @@ def toggle_delivery(product_id):
     """
     product = Product.query.filter_by(id=product_id, user_id=current_user.id).first_or_404()
     product.is_delivery = not product.is_delivery
+    invalidate_menu(current_user.id)
     db.session.commit()
     flash('Status de delivery do produto atualizado com sucesso!', 'success')
     return redirect(url_for('produtos.index'))
@@ -132,6 +140,8 @@ def toggle_balcao(product_id):
     """
     product = Product.query.filter_by(id=product_id, user_id=current_user.id).first_or_404()
     product.is_balcao = not product.is_balcao
+    # O índice de busca do PDV e o snapshot de produtos são marcados pela menu_revision
+    invalidate_menu(current_user.id)
     db.session.commit()
     flash('Status de balcão do produto atualizado com sucesso!', 'success')
     return redirect(url_for('produtos.index'))
@@ -155,6 +165,7 @@ def excluir(product_id):
 
     # Exclui o produto do banco de dados
     db.session.delete(product)
+    invalidate_menu(current_user.id)
     db.session.commit()
     flash('Produto excluído com sucesso!', 'success')
     return redirect(url_for('produtos.index'))
@@ -3,27 +3,41 @@ import csv
 import io
 from flask import Blueprint, render_template, request, jsonify, Response
 from flask_login import login_required, current_user
-from models import db, Order, OrderStatus, CashMovement, OrderItem, Product
+from models import db, Order, OrderStatus, CashMovement, CashSession, OrderItem, Product
 from datetime import datetime, timedelta
 from sqlalchemy import func, case, extract
 from sqlalchemy.orm import joinedload
 from collections import defaultdict
+from services.rollup_service import get_rollup_by_day
+from services.business_hours import restaurant_timezone, local_today, utc_day_range
+
+# Quantidade máxima de linhas listadas nos relatórios; os totais vêm do consolidado diário
+REPORT_LIST_LIMIT = 200
 
 reports_bp = Blueprint('reports', __name__, url_prefix='/relatorios', 
 template_folder=os.path.join(os.path.dirname(__file__), '../templates/reports'))
 
+def get_day_range():
+    """
+    Retorna os dias (locais do restaurante) selecionados no request.
+    Padrão: últimos 30 dias até hoje.
+    """
+    today = local_today(restaurant_timezone(current_user))
+    end_date_str = request.args.get('end_date', today.strftime('%Y-%m-%d'))
+    start_date_str = request.args.get('start_date', (today - timedelta(days=30)).strftime('%Y-%m-%d'))
+
+    start_day = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+    end_day = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+    return start_day, end_day, start_date_str, end_date_str
+
 def get_date_range():
     """
-    Retorna o intervalo de datas do request.
-    Ajusta a end_date para incluir o dia inteiro selecionado.
+    Retorna o intervalo de datas do request como timestamps UTC semiabertos
+    [início, fim): o fim é a meia-noite (no fuso do restaurante) após a end_date,
+    então filtre com `coluna >= início` e `coluna < fim`.
     """
-    end_date_str = request.args.get('end_date', datetime.now().strftime('%Y-%m-%d'))
-    start_date_str = request.args.get('start_date', (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d'))
-    
-    start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
-    # A end_date vai até 23:59:59 para incluir todos os pedidos do dia
-    end_date = datetime.strptime(end_date_str, '%Y-%m-%d') + timedelta(days=1, seconds=-1)
-    
+    start_day, end_day, start_date_str, end_date_str = get_day_range()
+    start_date, end_date = utc_day_range(start_day, end_day, restaurant_timezone(current_user))
     return start_date, end_date, start_date_str, end_date_str
 
 # Rota de índice para a seção de relatórios
@@ -41,17 +55,48 @@ def index():
 def financial():
     start_date, end_date, start_date_str, end_date_str = get_date_range()
 
-    # Consulta unificada para todas as movimentações de caixa no período
-    cash_movements = CashMovement.query.filter(
+    # Entradas: receita das vendas concluídas, lida do consolidado diário (poucas linhas por mês)
+    start_day, end_day, _, _ = get_day_range()
+    rollup = get_rollup_by_day(current_user.id, start_day, end_day)
+    sales_entries = float(sum(day['revenue'] for day in rollup.values()))
+
+    # Saídas: uma soma no banco em vez de carregar todas as movimentações
+    expenses_and_refunds = float(db.session.query(func.sum(CashMovement.amount)).filter(
         CashMovement.user_id == current_user.id,
-        CashMovement.created_at.between(start_date, end_date)
-    ).order_by(CashMovement.created_at.desc()).all()
-    
-    # Cálculos: entradas e saídas
-    sales_entries = sum(float(m.amount) for m in cash_movements if m.type == 'sale')
-    expenses_and_refunds = sum(float(m.amount) for m in cash_movements if m.type in ['refund', 'expense'])
-    
-    all_transactions = cash_movements
+        CashMovement.type.in_(['refund', 'expense']),
+        CashMovement.created_at >= start_date,
+        CashMovement.created_at < end_date
+    ).scalar() or 0)
+
+    # Lista apenas as movimentações mais recentes do período
+    all_transactions = CashMovement.query.filter(
+        CashMovement.user_id == current_user.id,
+        CashMovement.created_at >= start_date,
+        CashMovement.created_at < end_date
+    ).order_by(CashMovement.created_at.desc()).limit(REPORT_LIST_LIMIT).all()
+
+    # Fechamentos de caixa do período: somas dos resumos gravados no fechamento,
+    # sem reler as movimentações das sessões
+    sessions_count, expected_cash, counted_cash, cash_difference, session_orders = db.session.query(
+        func.count(CashSession.id),
+        func.sum(CashSession.expected_cash),
+        func.sum(CashSession.closing_amount),
+        func.sum(CashSession.cash_difference),
+        func.sum(CashSession.orders_count)
+    ).filter(
+        CashSession.user_id == current_user.id,
+        CashSession.is_active == False,
+        CashSession.close_report.isnot(None),
+        CashSession.closed_at >= start_date,
+        CashSession.closed_at < end_date
+    ).one()
+    closings = {
+        'sessions': sessions_count,
+        'expected_cash': float(expected_cash or 0),
+        'counted_cash': float(counted_cash or 0),
+        'cash_difference': float(cash_difference or 0),
+        'orders': int(session_orders or 0),
+    }
 
     # Labels e valores para o gráfico
     labels = ["Vendas", "Despesas/Reembolsos"]
@@ -70,7 +115,8 @@ def financial():
         expenses_and_refunds=expenses_and_refunds,
         saldo_final=sales_entries - expenses_and_refunds,
         chart_data=chart_data,
-        all_transactions=all_transactions
+        all_transactions=all_transactions,
+        closings=closings
     )
 
 @reports_bp.route('/vendas')
@@ -78,30 +124,30 @@ def financial():
 def sales():
     start_date, end_date, start_date_str, end_date_str = get_date_range()
 
-    # Consulta única para todos os pedidos concluídos, com joinedload para evitar N+1 queries
-    all_sales = db.session.query(Order).options(joinedload(Order.customer)).filter(
-        Order.user_id == current_user.id,
-        Order.status == OrderStatus.COMPLETED,
-        Order.completed_at.between(start_date, end_date)
-    ).order_by(Order.completed_at.desc()).all()
-    
-    # Agrupar vendas por dia para o gráfico de linha
-    sales_by_day = defaultdict(float)
-    for sale in all_sales:
-        day = sale.completed_at.strftime('%Y-%m-%d')
-        sales_by_day[day] += sale.total_price
+    # Totais e gráfico por dia a partir do consolidado diário (uma linha por dia/forma de pagamento)
+    start_day, end_day, _, _ = get_day_range()
+    rollup = get_rollup_by_day(current_user.id, start_day, end_day)
+    sales_days = sorted(day for day, totals in rollup.items() if totals['orders_count'])
 
-    chart_labels = sorted(sales_by_day.keys())
-    chart_values = [sales_by_day[day] for day in chart_labels]
-    
-    # Calcular a receita total para o template
-    total_revenue = sum(sale.total_price for sale in all_sales)
+    chart_labels = [day.strftime('%Y-%m-%d') for day in sales_days]
+    chart_values = [float(rollup[day]['revenue']) for day in sales_days]
+
+    total_revenue = sum(rollup[day]['revenue'] for day in sales_days)
+    total_orders = sum(rollup[day]['orders_count'] for day in sales_days)
 
-    if len(all_sales) > 0:
-        avg_ticket = total_revenue / len(all_sales)
+    if total_orders > 0:
+        avg_ticket = total_revenue / total_orders
     else:
         avg_ticket = 0.0
 
+    # Lista apenas as vendas mais recentes do período, com joinedload para evitar N+1 queries
+    all_sales = db.session.query(Order).options(joinedload(Order.customer)).filter(
+        Order.user_id == current_user.id,
+        Order.status == OrderStatus.COMPLETED,
+        Order.completed_at >= start_date,
+        Order.completed_at < end_date
+    ).order_by(Order.completed_at.desc()).limit(REPORT_LIST_LIMIT).all()
+
     return render_template(
         'reports/sales.html',
         start_date=start_date_str,
@@ -111,7 +157,7 @@ def sales():
         chart_values=chart_values,
         total_revenue=total_revenue,
         avg_ticket=avg_ticket,
-        total_orders=len(all_sales)
+        total_orders=total_orders
     )
 
 @reports_bp.route('/vendas/export-csv')
@@ -123,7 +169,8 @@ def export_sales_csv():
     all_sales = db.session.query(Order).options(joinedload(Order.customer)).filter(
         Order.user_id == current_user.id,
         Order.status == OrderStatus.COMPLETED,
-        Order.completed_at.between(start_date, end_date)
+        Order.completed_at >= start_date,
+        Order.completed_at < end_date
     ).order_by(Order.completed_at.desc()).all()
 
     # Cria um buffer de memória para o arquivo CSV
@@ -171,7 +218,8 @@ def products():
     ).filter(
         Order.user_id == current_user.id,
         Order.status == OrderStatus.COMPLETED,
-        Order.completed_at.between(start_date, end_date)
+        Order.completed_at >= start_date,
+        Order.completed_at < end_date
     ).group_by(
         Product.id, Product.name
     ).order_by(
@@ -206,7 +254,8 @@ def export_products_csv():
     ).filter(
         Order.user_id == current_user.id,
         Order.status == OrderStatus.COMPLETED,
-        Order.completed_at.between(start_date, end_date)
+        Order.completed_at >= start_date,
+        Order.completed_at < end_date
     ).group_by(
         Product.id, Product.name
     ).order_by(
@@ -85,6 +85,121 @@ def create_plans_command(skip_output):
             click.echo('Planos atualizados com sucesso.')
 
 
+@app.cli.command('drain_order_intake')
+@click.option('--batch-size', default=50, show_default=True, help='Entradas materializadas por transação.')
+def drain_order_intake_command(batch_size):
+    """Materializa as entradas de pedido pendentes (ex.: sobras de um worker reiniciado)."""
+    from services.intake_service import drain_intake
+    total = 0
+    while True:
+        processed = drain_intake(batch_size)
+        if not processed:
+            break
+        total += processed
+    click.echo(f'{total} entrada(s) de pedido processada(s).')
+
+
+@app.cli.command('loadtest_seed')
+@click.option('--restaurants', default=10, show_default=True, help='Quantidade de restaurantes de teste.')
+@click.option('--products', default=20, show_default=True, help='Produtos por restaurante.')
+@click.option('--neighborhoods', default=5, show_default=True, help='Bairros por restaurante.')
+def loadtest_seed_command(restaurants, products, neighborhoods):
+    """Cria restaurantes de teste de carga (e-mails @loadtest.local)."""
+    from loadtest import seed_restaurants
+    created = seed_restaurants(restaurants, products, neighborhoods)
+    click.echo(f'{created} restaurante(s) de teste criado(s).')
+
+
+@app.cli.command('loadtest')
+@click.option('--base-url', default='http://127.0.0.1:5000', show_default=True, help='Servidor local sob teste.')
+@click.option('--rate', default=10.0, show_default=True, help='Fluxos (cardápio -> pedido -> confirmação) iniciados por segundo.')
+@click.option('--duration', default=30, show_default=True, help='Duração do teste em segundos.')
+@click.option('--concurrency', default=20, show_default=True, help='Máximo de fluxos simultâneos.')
+@click.option('--restaurants', default=0, help='Limita a quantidade de restaurantes usados (0 = todos).')
+@click.option('--timeout', default=10, show_default=True, help='Timeout de cada requisição em segundos.')
+def loadtest_command(base_url, rate, duration, concurrency, restaurants, timeout):
+    """Gera carga no fluxo público de pedidos e reporta vazão, latência e erros por etapa."""
+    from loadtest import load_targets, run_load
+    targets = load_targets(restaurants or None)
+    if not targets:
+        raise click.ClickException('Nenhum restaurante de teste encontrado. Rode `flask loadtest_seed` antes.')
+    db.session.remove()
+
+    click.echo(f'{len(targets)} restaurante(s), {rate}/s por {duration}s contra {base_url} ...')
+    stats, elapsed = run_load(base_url, targets, rate, duration, concurrency, timeout)
+
+    click.echo(f'\nFluxos iniciados: {stats.flows} ({stats.flows / elapsed:.1f}/s), descartados por saturação: {stats.dropped}')
+    click.echo(f"{'etapa':<14}{'reqs':>7}{'erros':>7}{'erro%':>8}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for step, count, errors, error_pct, rps, p50, p95, p99 in stats.report(elapsed):
+        click.echo(f'{step:<14}{count:>7}{errors:>7}{error_pct:>7.1f}%{rps:>8.1f}{p50:>9.1f}{p95:>9.1f}{p99:>9.1f}')
+    for step, errors in stats.errors.items():
+        for error, count in errors.items():
+            click.echo(f'  {step}: {error} x{count}')
+
+
+@app.cli.command('rebuild_sales_rollup')
+@click.option('--user-id', type=int, default=None, help='Reconstrói apenas um restaurante.')
+def rebuild_sales_rollup_command(user_id):
+    """Reconstrói o consolidado diário de vendas (daily_sales_rollup) a partir dos pedidos."""
+    from services.rollup_service import rebuild_rollup
+    rows = rebuild_rollup(user_id)
+    click.echo(f'Consolidado reconstruído: {rows} linha(s).')
+
+
+@app.cli.command('purge_print_jobs')
+@click.option('--days', default=7, show_default=True, help='Idade mínima (em dias) dos trabalhos removidos.')
+def purge_print_jobs_command(days):
+    """Remove da fila de impressão as comandas já impressas ou com falha."""
+    from services.print_service import purge_jobs
+    removed = purge_jobs(days)
+    click.echo(f'{removed} trabalho(s) de impressão removido(s).')
+
+
+@app.cli.command('reconcile_cash_sessions')
+@click.option('--user-id', type=int, default=None, help='Confere apenas um restaurante.')
+@click.option('--fix', is_flag=True, help='Grava os totais recalculados nas sessões divergentes.')
+def reconcile_cash_sessions_command(user_id, fix):
+    """Recalcula os totais das sessões de caixa a partir dos movimentos e mostra as divergências."""
+    from services.cash_service import reconcile_sessions
+    drifts = reconcile_sessions(user_id, fix=fix)
+    for cash_session, diffs in drifts:
+        click.echo(f'Sessão #{cash_session.id} (restaurante {cash_session.user_id}):')
+        for field, stored, computed in diffs:
+            click.echo(f'    {field}: gravado {stored} / recalculado {computed}')
+    if not drifts:
+        click.echo('Nenhuma divergência nos totais das sessões de caixa.')
+    elif fix:
+        click.echo(f'{len(drifts)} sessão(ões) corrigida(s).')
+    else:
+        click.echo(f'{len(drifts)} sessão(ões) com divergência. Use --fix para corrigir.')
+
+
+@app.cli.command('snapshot_cash_sessions')
+@click.option('--user-id', type=int, default=None, help='Apenas um restaurante.')
+@click.option('--overwrite', is_flag=True, help='Regera também os resumos já gravados.')
+def snapshot_cash_sessions_command(user_id, overwrite):
+    """Gera o resumo de fechamento das sessões de caixa fechadas que ainda não têm."""
+    from services.cash_service import snapshot_closed_sessions
+    updated = snapshot_closed_sessions(user_id, overwrite=overwrite)
+    click.echo(f'{updated} sessão(ões) de caixa com resumo de fechamento gerado.')
+
+
+@app.cli.command('check_query_plans')
+@click.option('--user-id', type=int, default=1, show_default=True, help='Restaurante usado nos filtros.')
+@click.option('--verbose', is_flag=True, help='Mostra o plano completo de cada consulta.')
+def check_query_plans_command(user_id, verbose):
+    """Confere com EXPLAIN se as consultas principais usam os índices compostos."""
+    from services.query_plan_service import check_query_plans
+    failures = 0
+    for name, index, ok, plan in check_query_plans(user_id):
+        click.echo(f"{'OK  ' if ok else 'FAIL'} {name:<32} {index}")
+        if verbose or not ok:
+            click.echo('      ' + plan.replace('\n', '\n      '))
+        failures += not ok
+    if failures:
+        raise click.ClickException(f'{failures} consulta(s) sem o índice esperado.')
+
+
 # NOVA FUNÇÃO DE DEPLOY: Agora com um parâmetro opcional para o stamp
 def main_deploy(stamp_only=False):
     """Roda as tarefas de deploy de produção de forma segura: aplica migrações e cria/atualiza planos."""
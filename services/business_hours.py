@@ -0,0 +1,248 @@
+import bisect
+import json
+import threading
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+DEFAULT_TIMEZONE = 'America/Sao_Paulo'
+
+# Índice = datetime.weekday()
+WEEK_DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+# Agendas compiladas por restaurante: user_id -> (business_hours bruto, timezone, BusinessSchedule)
+_schedule_cache = {}
+_schedule_cache_lock = threading.Lock()
+
+
+def _parse_time(value):
+    """Converte 'HH:MM' em minutos desde a meia-noite. Aceita '24:00'."""
+    hour, minute = map(int, value.strip().split(':'))
+    if not (0 <= hour <= 24 and 0 <= minute < 60) or (hour == 24 and minute):
+        raise ValueError(f'Horário inválido: {value}')
+    return hour * 60 + minute
+
+
+def _day_shifts(day_config):
+    """
+    Normaliza a configuração de um dia em uma lista de turnos {'open', 'close'}.
+    Formatos aceitos:
+      {'open': '18:00', 'close': '23:00'}                      (formato salvo pelo perfil)
+      [{'open': '11:00', 'close': '14:00'}, {...}]             (vários turnos)
+      {'shifts': [{'open': '11:00', 'close': '14:00'}, ...]}
+    """
+    if not day_config:
+        return []
+    if isinstance(day_config, dict) and 'shifts' in day_config:
+        day_config = day_config['shifts']
+    if isinstance(day_config, dict):
+        day_config = [day_config]
+    return [
+        shift for shift in day_config
+        if isinstance(shift, dict) and shift.get('open') and shift.get('close')
+    ]
+
+
+def get_timezone(name):
+    try:
+        return ZoneInfo(name or DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(DEFAULT_TIMEZONE)
+
+
+def restaurant_timezone(user):
+    """Fuso (ZoneInfo) configurado para o restaurante do usuário."""
+    config = getattr(user, 'config', None)
+    return get_timezone(config.timezone if config else None)
+
+
+def local_today(tz):
+    return datetime.now(tz).date()
+
+
+def local_date(value, tz):
+    """Data local de um timestamp gravado no banco (UTC ingênuo)."""
+    return local_datetime(value, tz).date()
+
+
+def local_datetime(value, tz):
+    """Horário local de um timestamp gravado no banco (UTC ingênuo)."""
+    return value.replace(tzinfo=timezone.utc).astimezone(tz)
+
+
+def utc_day_range(start_day, end_day, tz):
+    """
+    Intervalo semiaberto [00:00 de start_day, 00:00 do dia seguinte a end_day) no fuso
+    do restaurante, convertido para UTC ingênuo (como os timestamps são gravados).
+    Use com `coluna >= início AND coluna < fim` para que o filtro aproveite os índices.
+    """
+    def to_utc(day):
+        return datetime.combine(day, time.min, tzinfo=tz).astimezone(timezone.utc).replace(tzinfo=None)
+    return to_utc(start_day), to_utc(end_day + timedelta(days=1))
+
+
+class BusinessSchedule:
+    """
+    Agenda de funcionamento compilada em intervalos [início, fim) de minuto-da-semana
+    (segunda 00:00 = 0), ordenados e sem sobreposição. Turnos que passam da
+    meia-noite (ex.: 18:00-02:00) avançam para o dia seguinte, e o domingo
+    continua na segunda-feira. As consultas são buscas binárias (O(log n)).
+    """
+
+    def __init__(self, intervals, tz, shifts_by_day=None):
+        self.intervals = intervals
+        self.tz = tz
+        self.shifts_by_day = shifts_by_day or {}
+        self._starts = [start for start, _ in intervals]
+        self._transitions = self._build_transitions(intervals)
+
+    @classmethod
+    def compile(cls, business_hours, tz_name=None):
+        """
+        Compila o JSON de RestaurantConfig.business_hours (string ou dict).
+        Lança ValueError se algum horário for inválido.
+        """
+        if isinstance(business_hours, str):
+            try:
+                business_hours = json.loads(business_hours) if business_hours.strip() else {}
+            except json.JSONDecodeError as e:
+                raise ValueError(f'JSON de horários inválido: {e}')
+        business_hours = business_hours or {}
+
+        raw = []
+        shifts_by_day = {}
+        for day_index, day_name in enumerate(WEEK_DAYS):
+            shifts = _day_shifts(business_hours.get(day_name))
+            shifts_by_day[day_name] = [(shift['open'], shift['close']) for shift in shifts]
+            for shift in shifts:
+                open_minute = _parse_time(shift['open'])
+                close_minute = _parse_time(shift['close'])
+                start = day_index * MINUTES_PER_DAY + open_minute
+                end = day_index * MINUTES_PER_DAY + close_minute
+                if close_minute <= open_minute:
+                    # Atravessa a meia-noite (ou 24h quando abre e fecha no mesmo horário)
+                    end += MINUTES_PER_DAY
+                if end > MINUTES_PER_WEEK:
+                    raw.append((start, MINUTES_PER_WEEK))
+                    raw.append((0, end - MINUTES_PER_WEEK))
+                else:
+                    raw.append((start, end))
+
+        intervals = []
+        for start, end in sorted(raw):
+            if intervals and start <= intervals[-1][1]:
+                intervals[-1] = (intervals[-1][0], max(intervals[-1][1], end))
+            else:
+                intervals.append((start, end))
+
+        return cls(intervals, get_timezone(tz_name), shifts_by_day)
+
+    @staticmethod
+    def _build_transitions(intervals):
+        """
+        Minutos da semana em que o status muda. As bordas 0/10080 criadas ao dividir
+        um turno que cruza domingo->segunda não são mudanças reais.
+        """
+        if not intervals:
+            return []
+        wraps = intervals[0][0] == 0 and intervals[-1][1] == MINUTES_PER_WEEK
+        transitions = set()
+        for start, end in intervals:
+            if not (wraps and start == 0):
+                transitions.add(start)
+            if not (wraps and end == MINUTES_PER_WEEK):
+                transitions.add(end % MINUTES_PER_WEEK)
+        return sorted(transitions)
+
+    def local_now(self, at=None):
+        """Data/hora atual (ou `at`) no fuso do restaurante."""
+        at = at or datetime.now(timezone.utc)
+        if at.tzinfo is None:
+            at = at.replace(tzinfo=timezone.utc)
+        return at.astimezone(self.tz)
+
+    @staticmethod
+    def _minute_of_week(local_dt):
+        return local_dt.weekday() * MINUTES_PER_DAY + local_dt.hour * 60 + local_dt.minute
+
+    def is_open(self, at=None):
+        minute = self._minute_of_week(self.local_now(at))
+        index = bisect.bisect_right(self._starts, minute) - 1
+        return index >= 0 and minute < self.intervals[index][1]
+
+    def next_opening(self, at=None):
+        """Próximo horário de abertura (datetime no fuso do restaurante), ou None se não houver turnos."""
+        if not self.intervals:
+            return None
+        local = self.local_now(at).replace(second=0, microsecond=0)
+        minute = self._minute_of_week(local)
+        index = bisect.bisect_right(self._starts, minute)
+        if index < len(self._starts):
+            delta = self._starts[index] - minute
+        else:
+            delta = self._starts[0] + MINUTES_PER_WEEK - minute
+        return local + timedelta(minutes=delta)
+
+    def last_transition(self, at=None):
+        """Último instante (no fuso do restaurante) em que o status abriu/fechou, ou None."""
+        if not self._transitions:
+            return None
+        local = self.local_now(at).replace(second=0, microsecond=0)
+        minute = self._minute_of_week(local)
+        index = bisect.bisect_right(self._transitions, minute) - 1
+        if index >= 0:
+            delta = minute - self._transitions[index]
+        else:
+            delta = minute + MINUTES_PER_WEEK - self._transitions[-1]
+        return local - timedelta(minutes=delta)
+
+    def shifts_for(self, day_name):
+        """Turnos configurados (open, close) para o dia informado, para exibição."""
+        return self.shifts_by_day.get(day_name, [])
+
+
+def restaurant_status(schedule, manual_status, at=None):
+    """
+    Determina o status de funcionamento do restaurante ('Aberto'/'Fechado').
+    O override manual tem prioridade; em modo automático usa a agenda compilada.
+    """
+    if manual_status == 'open':
+        return 'Aberto'
+    if manual_status == 'closed':
+        return 'Fechado'
+    if schedule is None:
+        return 'Fechado'
+    return 'Aberto' if schedule.is_open(at) else 'Fechado'
+
+
+def get_schedule(user_id, business_hours, tz_name=None):
+    """
+    Retorna a agenda compilada do restaurante, recompilando apenas quando o JSON
+    de horários ou o fuso mudarem. Horários inválidos resultam em agenda vazia (fechado).
+    """
+    with _schedule_cache_lock:
+        cached = _schedule_cache.get(user_id)
+    if cached and cached[0] == business_hours and cached[1] == tz_name:
+        return cached[2]
+
+    try:
+        schedule = BusinessSchedule.compile(business_hours, tz_name)
+    except (ValueError, TypeError, AttributeError):
+        schedule = BusinessSchedule([], get_timezone(tz_name))
+
+    with _schedule_cache_lock:
+        _schedule_cache[user_id] = (business_hours, tz_name, schedule)
+    return schedule
+
+
+def compile_schedule(user_id, business_hours, tz_name=None):
+    """
+    Compila e armazena a agenda do restaurante (usado ao salvar os horários).
+    Lança ValueError se os horários forem inválidos.
+    """
+    schedule = BusinessSchedule.compile(business_hours, tz_name)
+    with _schedule_cache_lock:
+        _schedule_cache[user_id] = (business_hours, tz_name, schedule)
+    return schedule
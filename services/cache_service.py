@@ -0,0 +1,103 @@
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+
+class LocalCache:
+    """
+    Cache LRU em memória, com TTL por entrada. Serve para um único processo
+    (um dyno com um worker); com vários workers cada um tem o seu.
+    """
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+
+class RedisCache:
+    """
+    Cache compartilhado entre os workers/dynos (CACHE_BACKEND=redis).
+    Os valores são serializados com pickle; falhas do Redis viram cache miss.
+    """
+
+    def __init__(self, url, prefix='deliveryaceito:'):
+        import redis
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.prefix = prefix
+
+    def get(self, key):
+        try:
+            raw = self.client.get(self.prefix + key)
+        except Exception as e:
+            logger.warning('cache.redis_error', extra={'op': 'get', 'error': str(e)})
+            return None
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        try:
+            self.client.set(self.prefix + key, pickle.dumps(value), ex=max(1, int(ttl)))
+        except Exception as e:
+            logger.warning('cache.redis_error', extra={'op': 'set', 'error': str(e)})
+
+    def delete(self, *keys):
+        if not keys:
+            return
+        try:
+            self.client.delete(*[self.prefix + key for key in keys])
+        except Exception as e:
+            logger.warning('cache.redis_error', extra={'op': 'delete', 'error': str(e)})
+
+
+def init_cache(app):
+    """
+    Cria o backend de cache conforme CACHE_BACKEND ('local' ou 'redis').
+    Sem o pacote redis ou sem CACHE_REDIS_URL, registra um erro e usa o cache local
+    (que não é compartilhado entre workers).
+    """
+    backend = None
+    if app.config['CACHE_BACKEND'] == 'redis':
+        url = app.config['CACHE_REDIS_URL']
+        try:
+            if not url:
+                raise ValueError('CACHE_REDIS_URL não configurada')
+            backend = RedisCache(url)
+        except (ImportError, ValueError) as e:
+            logger.error('cache.fallback_local', extra={'error': str(e)})
+    if backend is None:
+        backend = LocalCache(app.config['CACHE_MAX_ENTRIES'])
+    app.extensions['cache'] = backend
+    return backend
+
+
+def get_cache():
+    return current_app.extensions['cache']
@@ -0,0 +1,279 @@
+import json
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import case, func, update
+from sqlalchemy.dialects import postgresql, sqlite
+from extensions import db
+from models import CashSession, CashMovement, CashSessionMethodTotal, Order
+
+# Totais correntes da sessão de caixa, mantidos de forma incremental a cada movimento
+# gravado/removido (em vez de somar cash_movements a cada carregamento do caixa).
+# Coluna de CashSession somada por tipo de movimento; saídas são gravadas em módulo.
+TYPE_TOTALS = {
+    'sale': 'total_sales',
+    'expense': 'total_expenses',
+    'deposit': 'total_deposits',
+    'withdrawal': 'total_withdrawals',
+}
+SESSION_TOTALS = ['balance', *TYPE_TOTALS.values()]
+# Movimentos que não alteram o saldo corrente (o saldo já parte do valor de abertura)
+NON_BALANCE_TYPES = ('opening', 'closing')
+# Formas de pagamento que entram na gaveta (comparadas sem diferenciar maiúsculas)
+CASH_PAYMENT_METHODS = ('dinheiro',)
+
+
+def active_session_for(user_id):
+    return CashSession.query.filter(
+        CashSession.user_id == user_id,
+        CashSession.is_active == True
+    ).first()
+
+
+def _upsert_method_total(session_id, payment_method, count, amount):
+    """Soma na linha (session_id, payment_method) de forma atômica, criando-a se preciso."""
+    table = CashSessionMethodTotal.__table__
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect in ('postgresql', 'sqlite'):
+        insert = (postgresql if dialect == 'postgresql' else sqlite).insert
+        statement = insert(table).values(
+            session_id=session_id, payment_method=payment_method, sales_count=count, sales_amount=amount
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=['session_id', 'payment_method'],
+            set_={
+                'sales_count': table.c.sales_count + statement.excluded.sales_count,
+                'sales_amount': table.c.sales_amount + statement.excluded.sales_amount,
+            }
+        )
+        db.session.execute(statement)
+        return
+
+    updated = db.session.execute(
+        update(table).where(
+            table.c.session_id == session_id, table.c.payment_method == payment_method
+        ).values(sales_count=table.c.sales_count + count, sales_amount=table.c.sales_amount + amount)
+    ).rowcount
+    if not updated:
+        db.session.execute(table.insert().values(
+            session_id=session_id, payment_method=payment_method, sales_count=count, sales_amount=amount
+        ))
+
+
+def record_movement(movement, sign=1, payment_method=None):
+    """
+    Aplica (sign=1) ou desfaz (sign=-1) o movimento nos totais da sua sessão de caixa
+    com um UPDATE incremental (SET coluna = coluna + delta), seguro com vários caixas
+    gravando ao mesmo tempo. Deve rodar na mesma transação do movimento: desfaça antes
+    de alterar/remover e aplique depois. Vendas também somam em `payment_method`.
+    Movimentos sem sessão (ou de abertura/fechamento) não alteram nada.
+    """
+    if movement.session_id is None or movement.type in NON_BALANCE_TYPES:
+        return
+    amount = Decimal(str(movement.amount or 0)) * sign
+    values = {'balance': CashSession.balance + amount}
+    column = TYPE_TOTALS.get(movement.type)
+    if column:
+        values[column] = getattr(CashSession, column) + abs(amount) * (1 if sign > 0 else -1)
+
+    db.session.execute(
+        update(CashSession).where(CashSession.id == movement.session_id).values(values),
+        execution_options={'synchronize_session': False}
+    )
+    if movement.type == 'sale':
+        _upsert_method_total(movement.session_id, payment_method or '', sign, amount)
+
+
+def get_method_totals(session_id):
+    """Vendas da sessão por forma de pagamento: [(forma, quantidade, valor)], maior valor primeiro."""
+    return db.session.query(
+        CashSessionMethodTotal.payment_method,
+        CashSessionMethodTotal.sales_count,
+        CashSessionMethodTotal.sales_amount
+    ).filter(
+        CashSessionMethodTotal.session_id == session_id,
+        CashSessionMethodTotal.sales_count != 0
+    ).order_by(CashSessionMethodTotal.sales_amount.desc()).all()
+
+
+def _computed_totals(session_ids):
+    """Totais de cada sessão recalculados a partir de cash_movements (duas consultas agregadas)."""
+    columns = [
+        func.sum(case((CashMovement.type.notin_(NON_BALANCE_TYPES), CashMovement.amount), else_=0)),
+        *[
+            func.sum(case((CashMovement.type == movement_type, func.abs(CashMovement.amount)), else_=0))
+            for movement_type in TYPE_TOTALS
+        ],
+    ]
+    totals = {
+        session_id: [Decimal(str(value or 0)) for value in values]
+        for session_id, *values in db.session.query(CashMovement.session_id, *columns).filter(
+            CashMovement.session_id.in_(session_ids)
+        ).group_by(CashMovement.session_id)
+    }
+
+    methods = defaultdict(dict)
+    for session_id, method, count, amount in db.session.query(
+        CashMovement.session_id, func.coalesce(Order.payment_method, ''),
+        func.count(CashMovement.id), func.sum(CashMovement.amount)
+    ).outerjoin(Order, Order.id == CashMovement.order_id).filter(
+        CashMovement.session_id.in_(session_ids), CashMovement.type == 'sale'
+    ).group_by(CashMovement.session_id, func.coalesce(Order.payment_method, '')):
+        methods[session_id][method] = (int(count), Decimal(str(amount or 0)))
+    return totals, methods
+
+
+def reconcile_sessions(user_id=None, fix=False, batch_size=500):
+    """
+    Recalcula os totais das sessões de caixa a partir dos movimentos e compara com os
+    totais correntes gravados. Com `fix`, grava os valores recalculados (e faz commit).
+    Retorna [(sessão, [(campo, gravado, recalculado)])] só das sessões com divergência.
+    """
+    query = CashSession.query
+    if user_id is not None:
+        query = query.filter(CashSession.user_id == user_id)
+
+    drifts = []
+    last_id = 0
+    while True:
+        sessions = query.filter(CashSession.id > last_id).order_by(CashSession.id).limit(batch_size).all()
+        if not sessions:
+            break
+        last_id = sessions[-1].id
+        totals, methods = _computed_totals([s.id for s in sessions])
+        stored_methods = defaultdict(dict)
+        for row in CashSessionMethodTotal.query.filter(
+            CashSessionMethodTotal.session_id.in_([s.id for s in sessions])
+        ):
+            stored_methods[row.session_id][row.payment_method] = (row.sales_count, Decimal(str(row.sales_amount)))
+
+        for cash_session in sessions:
+            movement_sum, *type_totals = totals.get(cash_session.id, [Decimal(0)] * len(SESSION_TOTALS))
+            expected = dict(zip(SESSION_TOTALS, [
+                Decimal(str(cash_session.opening_amount or 0)) + movement_sum, *type_totals
+            ]))
+            diffs = [
+                (field, Decimal(str(getattr(cash_session, field) or 0)), value)
+                for field, value in expected.items()
+                if Decimal(str(getattr(cash_session, field) or 0)) != value
+            ]
+            computed_methods = methods.get(cash_session.id, {})
+            current_methods = {m: v for m, v in stored_methods.get(cash_session.id, {}).items() if v[0] or v[1]}
+            for method in sorted(set(computed_methods) | set(current_methods)):
+                stored = current_methods.get(method, (0, Decimal(0)))
+                computed = computed_methods.get(method, (0, Decimal(0)))
+                if stored != computed:
+                    diffs.append((f'vendas[{method or "sem forma"}]', stored, computed))
+            if not diffs:
+                continue
+            drifts.append((cash_session, diffs))
+
+            if fix:
+                for field, value in expected.items():
+                    setattr(cash_session, field, value)
+                CashSessionMethodTotal.query.filter_by(session_id=cash_session.id).delete()
+                db.session.add_all([
+                    CashSessionMethodTotal(session_id=cash_session.id, payment_method=method,
+                                           sales_count=count, sales_amount=amount)
+                    for method, (count, amount) in computed_methods.items()
+                ])
+        if fix:
+            db.session.commit()
+    return drifts
+
+
+def session_close_totals(session_id):
+    """
+    Totais da sessão para o resumo de fechamento em UMA consulta agregada:
+    [(tipo, forma de pagamento, quantidade, soma)] dos movimentos que alteram o saldo.
+    """
+    method = func.coalesce(Order.payment_method, '')
+    return db.session.query(
+        CashMovement.type, method, func.count(CashMovement.id), func.sum(CashMovement.amount)
+    ).outerjoin(Order, Order.id == CashMovement.order_id).filter(
+        CashMovement.session_id == session_id,
+        CashMovement.type.notin_(NON_BALANCE_TYPES)
+    ).group_by(CashMovement.type, method).all()
+
+
+def apply_close_snapshot(cash_session):
+    """
+    Congela o resumo de fechamento na sessão (sem commit): dinheiro esperado na gaveta
+    (abertura + vendas em dinheiro + depósitos - despesas - retiradas) x valor contado
+    (closing_amount), quantidade de pedidos, ticket médio e os totais por tipo de
+    movimento e por forma de pagamento.
+    """
+    opening = Decimal(str(cash_session.opening_amount or 0))
+    expected = balance = opening
+    sales, orders_count = Decimal(0), 0
+    types, methods = {}, {}
+    for movement_type, method, count, amount in session_close_totals(cash_session.id):
+        amount = Decimal(str(amount or 0))
+        balance += amount
+        totals = types.setdefault(movement_type, {'count': 0, 'amount': Decimal(0)})
+        totals['count'] += count
+        totals['amount'] += amount
+        if movement_type == 'sale':
+            sales += amount
+            orders_count += count
+            methods[method] = {'count': count, 'amount': amount}
+            if method.lower() not in CASH_PAYMENT_METHODS:
+                continue
+        expected += amount
+
+    counted = Decimal(str(cash_session.closing_amount or 0))
+    cash_session.expected_cash = expected
+    cash_session.cash_difference = counted - expected
+    cash_session.orders_count = orders_count
+    cash_session.average_ticket = (sales / orders_count).quantize(Decimal('0.01')) if orders_count else Decimal(0)
+    cash_session.close_report = json.dumps({
+        'opening': float(opening),
+        'balance': float(balance),
+        'sales': float(sales),
+        'types': {key: {'count': value['count'], 'amount': float(value['amount'])} for key, value in types.items()},
+        'methods': {
+            key: {'count': value['count'], 'amount': float(value['amount'])}
+            for key, value in sorted(methods.items(), key=lambda item: -item[1]['amount'])
+        },
+    })
+
+
+def close_session(cash_session, closing_amount):
+    """Fecha a sessão com o valor contado, registra o movimento de fechamento e congela o resumo (sem commit)."""
+    cash_session.closing_amount = closing_amount
+    cash_session.closed_at = datetime.utcnow()
+    cash_session.is_active = False
+    db.session.add(CashMovement(
+        user_id=cash_session.user_id,
+        session_id=cash_session.id,
+        type='closing',
+        description='Fechamento de caixa',
+        amount=closing_amount
+    ))
+    apply_close_snapshot(cash_session)
+
+
+def snapshot_closed_sessions(user_id=None, overwrite=False, batch_size=500):
+    """
+    Gera o resumo de fechamento das sessões já fechadas que ainda não têm (ou de todas,
+    com `overwrite`), em lotes com commit. Retorna quantas sessões foram atualizadas.
+    """
+    query = CashSession.query.filter(CashSession.is_active == False)
+    if user_id is not None:
+        query = query.filter(CashSession.user_id == user_id)
+    if not overwrite:
+        query = query.filter(CashSession.close_report.is_(None))
+
+    updated = 0
+    last_id = 0
+    while True:
+        sessions = query.filter(CashSession.id > last_id).order_by(CashSession.id).limit(batch_size).all()
+        if not sessions:
+            break
+        last_id = sessions[-1].id
+        for cash_session in sessions:
+            apply_close_snapshot(cash_session)
+        db.session.commit()
+        updated += len(sessions)
+    return updated
@@ -0,0 +1,143 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy import case, event, func
+from sqlalchemy.orm import Session
+from extensions import db
+from models import Order, OrderItem, OrderStatus, Product
+from services.business_hours import utc_day_range
+from services.cache_service import get_cache
+from services.rollup_service import get_rollup_by_day
+
+# Janela coberta pelas consultas: sempre inclui o mês corrente inteiro
+TREND_WINDOW_DAYS = 31
+
+
+def get_order_counts(user_id, start_of_month, today, tz):
+    """
+    Pedidos criados no mês e hoje (dias locais do restaurante) com UMA consulta:
+    filtro por intervalo em created_at (usa ix_orders_user_created) e soma condicional para hoje.
+    """
+    month_start, day_end = utc_day_range(start_of_month, today, tz)
+    today_start, _ = utc_day_range(today, today, tz)
+    month, today_count = db.session.query(
+        func.count(Order.id),
+        func.sum(case((Order.created_at >= today_start, 1), else_=0))
+    ).filter(
+        Order.user_id == user_id,
+        Order.created_at >= month_start,
+        Order.created_at < day_end
+    ).one()
+    return int(month or 0), int(today_count or 0)
+
+
+def get_dashboard_metrics(user_id, today, tz):
+    """
+    Métricas do dashboard (hoje, mês e tendência de 7 dias). A receita vem do
+    consolidado diário (daily_sales_rollup) e a contagem de pedidos de uma consulta por intervalo.
+    `today` é o dia local no fuso `tz` do restaurante.
+    """
+    start_of_month = today.replace(day=1)
+    window_start = min(start_of_month, today - timedelta(days=TREND_WINDOW_DAYS - 1))
+    total_orders_month, total_orders_today = get_order_counts(user_id, start_of_month, today, tz)
+    rollup = get_rollup_by_day(user_id, window_start, today)
+
+    def revenue(day):
+        return rollup[day]['revenue'] if day in rollup else Decimal(0)
+
+    revenue_month = sum((revenue(day) for day in rollup if day >= start_of_month), Decimal(0))
+
+    sales_trend = []
+    for i in range(7):
+        day = today - timedelta(days=6 - i)
+        sales_trend.append({'date': day.strftime('%d/%m'), 'revenue': float(revenue(day))})
+
+    return {
+        'total_orders_today': total_orders_today,
+        'revenue_today': revenue(today),
+        'total_orders_month': total_orders_month,
+        'revenue_month': revenue_month,
+        # Ticket Médio do Mês
+        'avg_ticket': revenue_month / total_orders_month if total_orders_month > 0 else 0,
+        'sales_trend': sales_trend,
+    }
+
+
+def get_top_products(user_id, limit=5):
+    """Produtos mais vendidos (pedidos concluídos), como dicts simples para poderem ir para o cache."""
+    rows = db.session.query(
+        Product.name,
+        func.sum(OrderItem.quantity).label('total_sold')
+    ).join(OrderItem, Product.id == OrderItem.product_id).filter(
+        Product.user_id == user_id
+    ).join(Order, Order.id == OrderItem.order_id).filter(
+        Order.status == OrderStatus.COMPLETED
+    ).group_by(Product.name).order_by(func.sum(OrderItem.quantity).desc()).limit(limit).all()
+    return [{'name': name, 'total_sold': total_sold} for name, total_sold in rows]
+
+
+def _cache_key(user_id, day):
+    return f'dashboard:{user_id}:{day.isoformat()}'
+
+
+def get_dashboard_context(user_id, today, tz):
+    """
+    Métricas + produtos mais vendidos do dashboard, em cache por (user_id, dia local).
+    A entrada é descartada quando um pedido do restaurante é criado ou alterado
+    (ver _invalidate_after_commit); DASHBOARD_CACHE_TTL é só uma rede de segurança.
+    """
+    cache = get_cache()
+    key = _cache_key(user_id, today)
+    context = cache.get(key)
+    if context is None:
+        context = {
+            **get_dashboard_metrics(user_id, today, tz),
+            'top_products': get_top_products(user_id),
+        }
+        cache.set(key, context, current_app.config['DASHBOARD_CACHE_TTL'])
+    return context
+
+
+def invalidate_dashboard(user_id):
+    """
+    Descarta o dashboard em cache do restaurante. Como o dia local depende do fuso,
+    remove as chaves de ontem/hoje/amanhã em UTC, que cobrem qualquer fuso.
+    """
+    today = datetime.utcnow().date()
+    get_cache().delete(*[_cache_key(user_id, today + timedelta(days=offset)) for offset in (-1, 0, 1)])
+
+
+def queue_dashboard_invalidation(user_id, session=None):
+    """
+    Marca o dashboard do restaurante para ser descartado no próximo commit. Para
+    escritas que não passam pelo flush do ORM (UPDATE direto na tabela orders).
+    """
+    session = session or db.session
+    session.info.setdefault('dashboard_invalidate', set()).add(user_id)
+
+
+# Invalidação por evento: qualquer flush que cria, altera ou remove um Order marca o
+# restaurante; depois do commit as entradas são descartadas (no rollback, esquecidas).
+# Atualizações em massa (update()/delete() direto na tabela) devem chamar queue_dashboard_invalidation.
+@event.listens_for(Session, 'before_flush')
+def _collect_changed_orders(session, flush_context, instances):
+    changed = session.info.setdefault('dashboard_invalidate', set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Order) and obj.user_id is not None:
+            changed.add(obj.user_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    changed = session.info.pop('dashboard_invalidate', None)
+    if changed:
+        for user_id in changed:
+            invalidate_dashboard(user_id)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_after_rollback(session, previous_transaction):
+    # Rollback de savepoint (begin_nested) não descarta o resto da transação
+    if session.in_transaction():
+        return
+    session.info.pop('dashboard_invalidate', None)
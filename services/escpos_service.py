@@ -0,0 +1,131 @@
+import textwrap
+from decimal import Decimal
+from services.business_hours import get_timezone, local_datetime
+
+# Comanda em ESC/POS para impressoras térmicas, gerada direto de Order/OrderItem
+# (sem renderizar HTML). Colunas da fonte A em cada largura de bobina.
+PAPER_COLUMNS = {58: 32, 80: 48}
+DEFAULT_PAPER_WIDTH = 80
+
+# Tabelas de caracteres (ESC t n) com acentuação do português
+CODEPAGES = {'cp860': 3, 'cp850': 2}
+DEFAULT_CODEPAGE = 'cp860'
+
+ESC = b'\x1b'
+GS = b'\x1d'
+INIT = ESC + b'@'
+ALIGN_LEFT = ESC + b'a\x00'
+ALIGN_CENTER = ESC + b'a\x01'
+BOLD_ON = ESC + b'E\x01'
+BOLD_OFF = ESC + b'E\x00'
+SIZE_NORMAL = GS + b'!\x00'
+SIZE_DOUBLE = GS + b'!\x11'
+SIZE_TALL = GS + b'!\x01'
+# Avança o papel e faz o corte parcial
+FEED_AND_CUT = ESC + b'd\x04' + GS + b'V\x42\x00'
+
+
+def paper_columns(width):
+    return PAPER_COLUMNS.get(width, PAPER_COLUMNS[DEFAULT_PAPER_WIDTH])
+
+
+def _money(value):
+    return f'R$ {Decimal(value or 0):.2f}'
+
+
+class _Ticket:
+    """Acumula texto e comandos; o texto é codificado na tabela de caracteres escolhida."""
+
+    def __init__(self, columns, codepage):
+        self.columns = columns
+        self.codepage = codepage
+        self.parts = [INIT, ESC + b't' + bytes([CODEPAGES[codepage]])]
+
+    def raw(self, command):
+        self.parts.append(command)
+
+    def line(self, text=''):
+        self.parts.append(text.encode(self.codepage, errors='replace') + b'\n')
+
+    def wrapped(self, text, indent='', columns=None):
+        """Texto quebrado em `columns` colunas (padrão: a largura da bobina na fonte normal)."""
+        columns = columns or self.columns
+        for line in textwrap.wrap(text, columns, initial_indent=indent, subsequent_indent=indent) or ['']:
+            self.line(line)
+
+    def columns_line(self, left, right):
+        """Texto à esquerda e valor alinhado à direita; quebra o texto se não couber."""
+        room = self.columns - len(right) - 1
+        lines = textwrap.wrap(left, room) or ['']
+        for line in lines[:-1]:
+            self.line(line)
+        self.line(lines[-1].ljust(room) + ' ' + right)
+
+    def separator(self, char='-'):
+        self.line(char * self.columns)
+
+    def to_bytes(self):
+        return b''.join(self.parts)
+
+
+def render_comanda(order, restaurant_name=None, width=DEFAULT_PAPER_WIDTH, tz=None, codepage=DEFAULT_CODEPAGE):
+    """
+    Bytes ESC/POS da comanda do pedido para bobina de 58 ou 80 mm.
+    Espera `order.items` (com `product`) já carregados para não gerar consultas por item.
+    """
+    ticket = _Ticket(paper_columns(width), codepage)
+    tz = tz or get_timezone(None)
+
+    ticket.raw(ALIGN_CENTER)
+    if restaurant_name:
+        ticket.raw(BOLD_ON + SIZE_DOUBLE)
+        # Largura dupla: cada caractere ocupa duas colunas
+        ticket.wrapped(restaurant_name, columns=ticket.columns // 2)
+        ticket.raw(SIZE_NORMAL + BOLD_OFF)
+    ticket.raw(BOLD_ON + SIZE_TALL)
+    ticket.line(f'PEDIDO #{order.id}')
+    ticket.raw(SIZE_NORMAL + BOLD_OFF)
+    if order.created_at:
+        ticket.line(local_datetime(order.created_at, tz).strftime('%d/%m/%Y %H:%M'))
+    ticket.raw(ALIGN_LEFT)
+    ticket.separator()
+
+    if order.client_name:
+        ticket.wrapped(f'Cliente: {order.client_name}')
+    if order.client_phone:
+        ticket.line(f'Telefone: {order.client_phone}')
+    if order.client_address:
+        ticket.wrapped(f'Endereço: {order.client_address}')
+    ticket.separator()
+
+    ticket.raw(BOLD_ON)
+    ticket.columns_line('Itens', 'Total')
+    ticket.raw(BOLD_OFF)
+    for item in order.items:
+        name = item.product.name if item.product else f'Produto #{item.product_id}'
+        ticket.columns_line(f'{item.quantity}x {name}', _money(item.quantity * item.price_at_order))
+        if item.notes:
+            ticket.wrapped(f'Obs: {item.notes}', indent='  ')
+    ticket.separator()
+
+    if order.delivery_fee:
+        ticket.columns_line('Taxa de entrega', _money(order.delivery_fee))
+    ticket.raw(BOLD_ON + SIZE_TALL)
+    ticket.columns_line('TOTAL', _money(order.total_price))
+    ticket.raw(SIZE_NORMAL + BOLD_OFF)
+
+    if order.payment_method:
+        ticket.line(f'Pagamento: {order.payment_method}')
+    if order.payment_method == 'Dinheiro' and order.change_for:
+        change = Decimal(order.change_for) - Decimal(order.total_price)
+        ticket.line(f'Troco para: {_money(order.change_for)}')
+        if change > 0:
+            ticket.line(f'Troco a devolver: {_money(change)}')
+
+    for label, text in (('Observação', order.notes), ('Complemento', order.complement_note)):
+        if text:
+            ticket.separator()
+            ticket.wrapped(f'{label}: {text}')
+
+    ticket.raw(FEED_AND_CUT)
+    return ticket.to_bytes()
@@ -0,0 +1,188 @@
+import json
+import logging
+import queue
+import threading
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Eventos de pedidos por restaurante, entregues ao quadro de pedidos via SSE
+# (pedidos.stream). Os eventos são enfileirados na sessão e só publicados depois
+# do commit, então um rollback nunca anuncia um pedido que não existe.
+ORDER_CREATED = 'order.created'
+ORDER_STATUS = 'order.status'
+ORDER_UPDATED = 'order.updated'
+ORDER_DELETED = 'order.deleted'
+
+
+class LocalSubscription:
+    def __init__(self, broker, user_id, max_pending):
+        self.broker = broker
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=max_pending)
+
+    def get(self, timeout):
+        """Próximo evento (dict) ou None se nada chegou dentro do timeout."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker._unsubscribe(self)
+
+
+class LocalBroker:
+    """
+    Broker em memória: entrega só para as conexões do próprio processo.
+    Serve para um único worker; com vários workers use EVENTS_BACKEND=redis.
+    """
+
+    def __init__(self, max_pending=100):
+        self.max_pending = max_pending
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def publish(self, user_id, data):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(data)
+            except queue.Full:
+                # Cliente lento/parado: descarta; ao reconectar ele recarrega a lista
+                pass
+
+    def subscribe(self, user_id):
+        subscription = LocalSubscription(self, user_id, self.max_pending)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+
+class RedisSubscription:
+    def __init__(self, pubsub):
+        self.pubsub = pubsub
+
+    def get(self, timeout):
+        message = self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if message is None or message.get('type') != 'message':
+            return None
+        return json.loads(message['data'])
+
+    def close(self):
+        try:
+            self.pubsub.close()
+        except Exception:
+            pass
+
+
+class RedisBroker:
+    """Broker via Redis pub/sub: um canal por restaurante, compartilhado entre workers e dynos."""
+
+    def __init__(self, url, prefix='deliveryaceito:orders:'):
+        import redis
+        self.client = redis.Redis.from_url(url, socket_connect_timeout=0.5)
+        self.prefix = prefix
+
+    def publish(self, user_id, data):
+        try:
+            self.client.publish(f'{self.prefix}{user_id}', json.dumps(data, default=str))
+        except Exception as e:
+            logger.warning('events.redis_error', extra={'op': 'publish', 'error': str(e)})
+
+    def subscribe(self, user_id):
+        pubsub = self.client.pubsub()
+        pubsub.subscribe(f'{self.prefix}{user_id}')
+        return RedisSubscription(pubsub)
+
+
+def init_events(app):
+    """
+    Cria o broker conforme EVENTS_BACKEND ('local' ou 'redis').
+    Sem o pacote redis ou sem EVENTS_REDIS_URL, registra um erro e usa o broker local
+    (que não é compartilhado entre workers).
+    """
+    broker = None
+    if app.config['EVENTS_BACKEND'] == 'redis':
+        url = app.config['EVENTS_REDIS_URL']
+        try:
+            if not url:
+                raise ValueError('EVENTS_REDIS_URL não configurada')
+            broker = RedisBroker(url)
+        except (ImportError, ValueError) as e:
+            logger.error('events.fallback_local', extra={'error': str(e)})
+    if broker is None:
+        broker = LocalBroker()
+    app.extensions['events'] = broker
+    app.extensions['events_stream_slots'] = threading.BoundedSemaphore(app.config['SSE_MAX_STREAMS'])
+    return broker
+
+
+def get_broker():
+    return current_app.extensions['events']
+
+
+def acquire_stream_slot():
+    """Reserva uma das SSE_MAX_STREAMS conexões SSE do processo; False se todas estão em uso."""
+    return current_app.extensions['events_stream_slots'].acquire(blocking=False)
+
+
+def stream_slot_releaser():
+    """Função que devolve a vaga reservada (uma única vez), para `call_on_close`."""
+    slots = current_app.extensions['events_stream_slots']
+    released = threading.Event()
+
+    def release():
+        if not released.is_set():
+            released.set()
+            slots.release()
+    return release
+
+
+def order_event_data(order, event_type):
+    return {
+        'type': event_type,
+        'order_id': order.id,
+        'status': order.status.name if order.status else None,
+    }
+
+
+def notify_order(order, event_type):
+    """
+    Agenda o evento do pedido para ser publicado depois do commit da sessão corrente.
+    O pedido já precisa ter id (chame depois do flush).
+    """
+    data = order_event_data(order, event_type)
+    session = Session.object_session(order)
+    if session is None:
+        get_broker().publish(order.user_id, data)
+        return
+    session.info.setdefault('order_events', []).append((order.user_id, data))
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_after_commit(session):
+    events = session.info.pop('order_events', None)
+    if not events:
+        return
+    broker = get_broker()
+    for user_id, data in events:
+        broker.publish(user_id, data)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_after_rollback(session, previous_transaction):
+    if session.in_transaction():
+        return
+    session.info.pop('order_events', None)
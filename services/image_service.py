@@ -0,0 +1,167 @@
+import hashlib
+import io
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, url_for
+from werkzeug.utils import secure_filename
+from extensions import db
+
+logger = logging.getLogger(__name__)
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Sem Pillow as fotos são salvas como enviadas, sem variantes
+    Image = None
+
+# Variantes geradas para cada foto: nome -> largura máxima em pixels
+VARIANTS = {
+    'thumb': 320,   # lista do cardápio
+    'medium': 800,  # detalhe do produto
+}
+FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 6},
+    'jpg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+# O processamento roda fora da thread da requisição para o upload responder rápido.
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='image-pipeline')
+
+
+def _upload_folder(user_id):
+    folder = os.path.join(current_app.root_path, 'static', 'uploads', str(user_id))
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+# Formatos gravados como o original (-> extensão do arquivo); os demais (ex.: MPO de câmeras) viram JPEG
+SAVE_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+
+
+def _strip_metadata(data):
+    """
+    Reencoda a imagem enviada sem EXIF/GPS e demais metadados, aplicando antes a
+    rotação do EXIF. Retorna (bytes, extensão do formato gravado).
+    Lança ValueError se o arquivo não for uma imagem válida.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image_format = image.format if image.format in SAVE_FORMATS else 'JPEG'
+            buffer = io.BytesIO()
+            if image_format == 'GIF':
+                # GIF não tem orientação EXIF; preserva a animação
+                image.save(buffer, format='GIF', save_all=getattr(image, 'is_animated', False))
+                return buffer.getvalue(), SAVE_FORMATS['GIF']
+
+            icc_profile = image.info.get('icc_profile')
+            image = ImageOps.exif_transpose(image)
+            options = {'icc_profile': icc_profile} if icc_profile else {}
+            if image_format == 'JPEG':
+                options['quality'] = 95
+                if image.mode not in ('RGB', 'L', 'CMYK'):
+                    image = image.convert('RGB')
+            image.save(buffer, format=image_format, **options)
+            return buffer.getvalue(), SAVE_FORMATS[image_format]
+    except (OSError, SyntaxError) as e:
+        raise ValueError('Arquivo de imagem inválido.') from e
+
+
+def save_upload(file, user_id):
+    """
+    Salva o arquivo enviado endereçado pelo conteúdo (sha256), em
+    static/uploads/<user_id>/<hash>.<ext>. Reenvios da mesma imagem reaproveitam o arquivo.
+    Com Pillow, o original é reencodado sem metadados (EXIF/GPS) antes de ser gravado
+    e a extensão vem do formato gravado, não do nome enviado.
+    Retorna (url_pública, digest, caminho_no_disco).
+    """
+    data = file.read()
+    if Image is not None:
+        data, ext = _strip_metadata(data)
+    else:
+        ext = secure_filename(file.filename).rsplit('.', 1)[-1].lower()
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    filename = f"{digest}.{ext}"
+    path = os.path.join(_upload_folder(user_id), filename)
+
+    if not os.path.exists(path):
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    return url_for('static', filename=f'uploads/{user_id}/{filename}'), digest, path
+
+
+def _render_variants(source_path, folder, digest):
+    """Gera as variantes redimensionadas (sem metadados EXIF) e retorna {nome: {formato: arquivo}}."""
+    with Image.open(source_path) as image:
+        # Aplica a rotação do EXIF antes de descartá-lo
+        image = ImageOps.exif_transpose(image)
+        # Mantém a transparência (logos em PNG) para o WebP; o JPEG recebe fundo branco
+        if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+            image = image.convert('RGBA')
+        elif image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+
+        variants = {}
+        for name, max_width in VARIANTS.items():
+            resized = image.copy()
+            resized.thumbnail((max_width, max_width * 4))
+            variants[name] = {'width': resized.width}
+            for ext, options in FORMATS.items():
+                filename = f"{digest}_{name}.{ext}"
+                path = os.path.join(folder, filename)
+                if not os.path.exists(path):
+                    output = resized
+                    if ext == 'jpg' and resized.mode == 'RGBA':
+                        output = Image.new('RGB', resized.size, (255, 255, 255))
+                        output.paste(resized, mask=resized.getchannel('A'))
+                    buffer = io.BytesIO()
+                    output.save(buffer, **options)
+                    with open(path, 'wb') as f:
+                        f.write(buffer.getvalue())
+                variants[name][ext] = filename
+    return variants
+
+
+def _process_upload(app, user_id, original_url, digest, source_path, target):
+    from models import Product, RestaurantConfig
+    from services.menu_service import invalidate_menu
+
+    with app.app_context():
+        try:
+            variants = _render_variants(source_path, os.path.dirname(source_path), digest)
+            # Sem contexto de requisição não há url_for; as variantes ficam na mesma pasta do original
+            base_url = original_url.rsplit('/', 1)[0]
+            data = json.dumps({
+                name: {
+                    'width': variant['width'],
+                    **{ext: f"{base_url}/{variant[ext]}" for ext in FORMATS}
+                } for name, variant in variants.items()
+            })
+
+            # Atualiza todas as linhas que usam a mesma imagem (deduplicação por conteúdo)
+            if target == 'logo':
+                RestaurantConfig.query.filter_by(user_id=user_id, logo_url=original_url).update(
+                    {'logo_variants': data}, synchronize_session=False)
+            else:
+                Product.query.filter_by(user_id=user_id, photo_url=original_url).update(
+                    {'photo_variants': data}, synchronize_session=False)
+
+            invalidate_menu(user_id)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Erro ao processar imagem {source_path}: {e}", exc_info=True)
+        finally:
+            db.session.remove()
+
+
+def process_upload_async(user_id, original_url, digest, source_path, target='product'):
+    """
+    Agenda a geração das variantes (thumb/medium em WebP e JPEG) em segundo plano.
+    Deve ser chamada após o commit da linha que referencia `original_url`.
+    """
+    if Image is None:
+        return None
+    app = current_app._get_current_object()
+    return _executor.submit(_process_upload, app, user_id, original_url, digest, source_path, target)
@@ -0,0 +1,163 @@
+import json
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from models import OrderIntake
+from services.order_service import build_menu_order
+from services.events_service import notify_order, ORDER_CREATED
+from services.print_service import enqueue_comanda
+
+logger = logging.getLogger(__name__)
+
+# Pool de workers que materializa as entradas pendentes (modo ORDER_INTAKE_ASYNC).
+# Criado sob demanda com ORDER_INTAKE_WORKERS threads; cada vaga é um "dreno" ativo.
+_executor = None
+_slots = None
+_executor_lock = threading.Lock()
+# Sinaliza que chegaram entradas novas enquanto os workers estavam ocupados
+_wakeup = threading.Event()
+
+
+def find_intake(user_id, idempotency_key):
+    if not idempotency_key:
+        return None
+    return OrderIntake.query.filter_by(user_id=user_id, idempotency_key=idempotency_key).first()
+
+
+def _materialize(intake, order_data):
+    """
+    Cria o pedido da entrada e enfileira a comanda, sem publicar o evento: quem chama
+    faz notify_order depois que o savepoint/transação do pedido deu certo (um rollback
+    de savepoint não descarta os eventos já enfileirados na sessão).
+    """
+    order = build_menu_order(intake.user_id, order_data)
+    intake.order_id = order.id
+    intake.status = 'done'
+    intake.processed_at = datetime.utcnow()
+    enqueue_comanda(order)
+    return order
+
+
+def submit_order(user_id, idempotency_key, order_data):
+    """
+    Registra o pedido do cardápio público com a chave de idempotência do cliente.
+    Chaves repetidas devolvem a entrada original em vez de criar outro pedido.
+
+    Em modo síncrono o pedido é materializado na mesma transação; com
+    ORDER_INTAKE_ASYNC a entrada é gravada como 'pending' e um worker cria o
+    Order/OrderItems em lote. Retorna (entrada, criada).
+    """
+    existing = find_intake(user_id, idempotency_key)
+    if existing:
+        return existing, False
+
+    intake = OrderIntake(
+        user_id=user_id,
+        idempotency_key=idempotency_key or uuid.uuid4().hex,
+        payload=json.dumps(order_data),
+        status='pending'
+    )
+    db.session.add(intake)
+    try:
+        if current_app.config['ORDER_INTAKE_ASYNC']:
+            db.session.commit()
+            schedule_drain()
+        else:
+            db.session.flush()
+            order = _materialize(intake, order_data)
+            notify_order(order, ORDER_CREATED)
+            db.session.commit()
+    except IntegrityError:
+        # Outra requisição com a mesma chave (toque duplo) gravou primeiro
+        db.session.rollback()
+        existing = find_intake(user_id, idempotency_key)
+        if existing is None:
+            raise
+        return existing, False
+    return intake, True
+
+
+def drain_intake(batch_size=50):
+    """
+    Materializa até `batch_size` entradas pendentes em uma única transação.
+    Cada entrada é reivindicada com um UPDATE condicional (status = 'pending'),
+    então vários workers/processos podem drenar ao mesmo tempo sem duplicar
+    pedidos. Falhas de uma entrada (savepoint) não derrubam o lote.
+    Retorna quantas entradas foram processadas.
+    """
+    pending_ids = [
+        intake_id for intake_id, in db.session.query(OrderIntake.id).filter(
+            OrderIntake.status == 'pending'
+        ).order_by(OrderIntake.id).limit(batch_size).with_for_update(skip_locked=True)
+    ]
+
+    processed = 0
+    for intake_id in pending_ids:
+        claimed = db.session.execute(
+            update(OrderIntake).where(
+                OrderIntake.id == intake_id,
+                OrderIntake.status == 'pending'
+            ).values(status='processing'),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+        if not claimed:
+            continue
+
+        intake = db.session.get(OrderIntake, intake_id)
+        try:
+            with db.session.begin_nested():
+                order = _materialize(intake, json.loads(intake.payload))
+        except Exception as e:
+            intake.status = 'failed'
+            intake.error = str(e)
+            intake.processed_at = datetime.utcnow()
+            logger.error(f"Erro ao materializar entrada de pedido #{intake_id}: {e}")
+        else:
+            notify_order(order, ORDER_CREATED)
+        processed += 1
+
+    db.session.commit()
+    return processed
+
+
+def _drain_worker(app):
+    while True:
+        with app.app_context():
+            try:
+                while True:
+                    _wakeup.clear()
+                    while drain_intake(app.config['ORDER_INTAKE_BATCH_SIZE']):
+                        pass
+                    if not _wakeup.is_set():
+                        break
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Erro no worker de entrada de pedidos: {e}", exc_info=True)
+            finally:
+                db.session.remove()
+                _slots.release()
+
+        # Uma entrada pode ter chegado entre a última verificação e a liberação da vaga
+        if not (_wakeup.is_set() and _slots.acquire(blocking=False)):
+            return
+
+
+def schedule_drain(app=None):
+    """Acorda um worker para drenar as entradas pendentes (sem bloquear a requisição)."""
+    global _executor, _slots
+    app = app or current_app._get_current_object()
+    with _executor_lock:
+        if _executor is None:
+            workers = app.config['ORDER_INTAKE_WORKERS']
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='order-intake')
+            _slots = threading.BoundedSemaphore(workers)
+
+    _wakeup.set()
+    if _slots.acquire(blocking=False):
+        _executor.submit(_drain_worker, app)
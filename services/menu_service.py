@@ -0,0 +1,258 @@
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from flask import current_app, render_template
+from sqlalchemy import update, func
+from extensions import db
+from models import User, Product, RestaurantConfig, Neighborhood
+from services.business_hours import get_schedule
+
+# Cache em memória dos cardápios públicos, indexado por user_id.
+# O cardápio só muda quando o dono edita produtos, horários, status ou bairros,
+# então guardamos os dados já preparados (e o HTML renderizado) até a próxima escrita.
+# Cada entrada é marcada com a menu_revision do banco, o que mantém os workers do
+# gunicorn consistentes: uma revisão nova no banco invalida o cache de todos eles.
+_menu_cache = OrderedDict()
+_menu_cache_lock = threading.Lock()
+
+class MenuSnapshot:
+    """
+    Visão pré-computada do cardápio de um restaurante.
+    Contém apenas tipos simples (dicts/listas), sem objetos ORM presos à sessão.
+    """
+
+    def __init__(self, user_id, revision, updated_at, user, config, products_by_category, neighborhoods, opening_hours, manual_status, schedule):
+        self.user_id = user_id
+        self.revision = revision
+        self.updated_at = updated_at
+        self.user = user
+        self.config = config
+        self.products_by_category = products_by_category
+        self.neighborhoods = neighborhoods
+        self.opening_hours = opening_hours
+        self.manual_status = manual_status
+        # Agenda compilada (services/business_hours.py), usada para o status por requisição
+        self.schedule = schedule
+        self.built_at = time.monotonic()
+        # HTML renderizado por (status calculado, dia da semana)
+        self.pages = {}
+        # Documento JSON (ver get_menu_document) por status calculado
+        self.documents = {}
+
+
+def _load_opening_hours(business_hours):
+    try:
+        return json.loads(business_hours) if business_hours else {}
+    except (json.JSONDecodeError, TypeError):
+        return {}
+
+
+def build_menu_snapshot(user_id):
+    """
+    Consulta o banco e monta o snapshot do cardápio. Retorna None se o usuário não existir.
+    """
+    user = db.session.get(User, user_id)
+    if not user:
+        return None
+
+    config = user.config
+    if not config:
+        config = RestaurantConfig(user_id=user.id)
+        db.session.add(config)
+        db.session.commit()
+
+    products = Product.query.filter_by(
+        user_id=user.id,
+        is_active=True,
+        is_delivery=True
+    ).all()
+
+    products_by_category = {}
+    for product in products:
+        products_by_category.setdefault(product.category, []).append({
+            'id': product.id,
+            'name': product.name,
+            'description': product.description,
+            'price': product.price,
+            'photo_url': product.photo_url,
+            'photo_srcset': product.photo_srcset,
+            'photo_srcset_jpg': product.photo_srcset_jpg,
+        })
+
+    neighborhoods = [
+        {'id': n.id, 'name': n.name, 'delivery_fee': n.delivery_fee}
+        for n in Neighborhood.query.filter_by(user_id=user.id).all()
+    ]
+
+    restaurant = user.restaurants
+    user_data = {
+        'id': user.id,
+        'restaurant_name': restaurant.name if restaurant else None,
+        'whatsapp': user.whatsapp,
+    }
+    config_data = {
+        'logo_url': config.logo_url,
+        'logo_srcset': config.logo_srcset,
+        'address': config.address,
+    }
+
+    return MenuSnapshot(
+        user_id=user.id,
+        revision=config.menu_revision or 0,
+        updated_at=config.menu_updated_at,
+        user=user_data,
+        config=config_data,
+        products_by_category=products_by_category,
+        neighborhoods=neighborhoods,
+        opening_hours=_load_opening_hours(config.business_hours),
+        manual_status=config.manual_status_override,
+        schedule=get_schedule(user.id, config.business_hours, config.timezone)
+    )
+
+
+def get_menu_version(user_id):
+    """
+    Consulta barata (uma linha de restaurant_configs) da versão atual do cardápio.
+    Retorna None se o restaurante ainda não tem configuração.
+    """
+    row = db.session.query(
+        RestaurantConfig.menu_revision
+    ).filter_by(user_id=user_id).first()
+    return (row.menu_revision or 0) if row else None
+
+
+def get_menu_snapshot(user_id, revision=None):
+    """
+    Retorna o snapshot do cardápio, usando o cache quando ainda válido.
+    Se `revision` for informada, o cache só é aproveitado se tiver a mesma revisão.
+    O TTL (MENU_CACHE_TTL) é apenas uma rede de segurança; a invalidação normal
+    acontece nas rotas de escrita via invalidate_menu().
+    """
+    ttl = current_app.config.get('MENU_CACHE_TTL', 300)
+    now = time.monotonic()
+
+    with _menu_cache_lock:
+        snapshot = _menu_cache.get(user_id)
+        if snapshot and now - snapshot.built_at < ttl and \
+                (revision is None or snapshot.revision == revision):
+            _menu_cache.move_to_end(user_id)
+            return snapshot
+
+    snapshot = build_menu_snapshot(user_id)
+    if snapshot is None:
+        return None
+
+    max_entries = current_app.config.get('MENU_CACHE_MAX_ENTRIES', 500)
+    with _menu_cache_lock:
+        _menu_cache[user_id] = snapshot
+        _menu_cache.move_to_end(user_id)
+        while len(_menu_cache) > max_entries:
+            _menu_cache.popitem(last=False)
+    return snapshot
+
+
+def invalidate_menu(user_id):
+    """
+    Marca o cardápio do restaurante como alterado: incrementa menu_revision na
+    transação corrente e descarta a entrada local do cache.
+    Deve ser chamada ANTES do commit da escrita, para que a nova revisão seja
+    gravada junto com a alteração.
+    """
+    db.session.execute(
+        update(RestaurantConfig)
+        .where(RestaurantConfig.user_id == user_id)
+        .values(
+            menu_revision=func.coalesce(RestaurantConfig.menu_revision, 0) + 1,
+            menu_updated_at=datetime.utcnow()
+        )
+        .execution_options(synchronize_session=False)
+    )
+    with _menu_cache_lock:
+        _menu_cache.pop(user_id, None)
+
+
+def render_menu_page(snapshot, restaurant_status, today_day_name):
+    """
+    Renderiza (ou reaproveita) o HTML do cardápio para o status e o dia informados.
+    O template só depende do snapshot, do status e do dia atual, então o resultado é reutilizável.
+    """
+    key = (restaurant_status, today_day_name)
+    html = snapshot.pages.get(key)
+    if html is None:
+        html = render_template(
+            'cardapio/menu.html',
+            user=snapshot.user,
+            products_by_category=snapshot.products_by_category,
+            config=snapshot.config,
+            neighborhoods=snapshot.neighborhoods,
+            today_hours=snapshot.schedule.shifts_for(today_day_name),
+            restaurant_status=restaurant_status
+        )
+        snapshot.pages[key] = html
+    return html
+
+
+class MenuDocument:
+    """Documento JSON compacto do cardápio, já serializado e comprimido com gzip."""
+
+    def __init__(self, body):
+        self.body = body
+        self.gzipped = gzip.compress(body, compresslevel=9)
+        # Hash do conteúdo: usado como ETag e como chave de versão (?v=) da URL
+        self.etag = hashlib.sha256(body).hexdigest()[:20]
+
+
+def _money(value):
+    return f"{value or 0:.2f}"
+
+
+def get_menu_document(snapshot, restaurant_status):
+    """
+    Gera (ou reaproveita) o documento JSON do cardápio a partir do mesmo snapshot
+    usado por cardapio.menu. Só o status varia por requisição, então o documento
+    fica em cache no snapshot por status.
+    """
+    document = snapshot.documents.get(restaurant_status)
+    if document is None:
+        schedule = snapshot.schedule
+        data = {
+            'v': 1,
+            'revision': snapshot.revision,
+            'restaurant': {
+                'id': snapshot.user['id'],
+                'name': snapshot.user['restaurant_name'],
+                'whatsapp': snapshot.user['whatsapp'],
+                'logo_url': snapshot.config['logo_url'],
+                'address': snapshot.config['address'],
+            },
+            'status': restaurant_status,
+            'timezone': str(schedule.tz),
+            'hours': {day: schedule.shifts_for(day) for day in schedule.shifts_by_day},
+            'categories': [
+                {
+                    'name': category,
+                    'products': [
+                        {
+                            'id': product['id'],
+                            'name': product['name'],
+                            'description': product['description'] or '',
+                            'price': _money(product['price']),
+                            'photo_url': product['photo_url'],
+                            'photo_srcset': product['photo_srcset'],
+                        } for product in products
+                    ],
+                } for category, products in snapshot.products_by_category.items()
+            ],
+            'neighborhoods': [
+                {'id': n['id'], 'name': n['name'], 'delivery_fee': _money(n['delivery_fee'])}
+                for n in snapshot.neighborhoods
+            ],
+        }
+        body = json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        document = MenuDocument(body)
+        snapshot.documents[restaurant_status] = document
+    return document
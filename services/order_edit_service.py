@@ -0,0 +1,106 @@
+from collections import defaultdict, namedtuple
+from decimal import Decimal
+from sqlalchemy import delete, update
+from extensions import db
+from models import CashMovement, OrderItem
+from services.cash_service import active_session_for, record_movement
+from services.events_service import notify_order, ORDER_UPDATED
+from services.order_service import resolve_order_items, insert_order_items, apply_order_summary
+from services.rollup_service import record_order, user_timezone
+
+# Resultado da edição: quantas linhas de order_items foram inseridas/alteradas/removidas
+# e se o total do pedido mudou (só então o consolidado e o caixa são tocados).
+OrderEditResult = namedtuple('OrderEditResult', ['inserted', 'updated', 'deleted', 'total_changed'])
+
+
+def diff_order_items(existing_items, items):
+    """
+    Compara os OrderItems gravados com as linhas resolvidas enviadas pelo frontend.
+    As linhas são pareadas por produto, na ordem em que aparecem; pares com
+    quantidade, observação ou preço diferentes viram UPDATE, as sobras gravadas
+    viram DELETE e as sobras enviadas viram INSERT.
+
+    Retorna (novas linhas, [{id, campos alterados}], [ids a remover]).
+    """
+    stored = defaultdict(list)
+    for order_item in sorted(existing_items, key=lambda order_item: order_item.id):
+        stored[order_item.product_id].append(order_item)
+
+    to_insert, to_update = [], []
+    for item in items:
+        candidates = stored.get(item.product.id)
+        if not candidates:
+            to_insert.append(item)
+            continue
+        order_item = candidates.pop(0)
+        changes = {}
+        if order_item.quantity != item.quantity:
+            changes['quantity'] = item.quantity
+        if (order_item.notes or '') != (item.notes or ''):
+            changes['notes'] = item.notes
+        if Decimal(str(order_item.price_at_order)) != Decimal(str(item.product.price)):
+            changes['price_at_order'] = item.product.price
+        if changes:
+            to_update.append({'id': order_item.id, **changes})
+
+    to_delete = [order_item.id for leftovers in stored.values() for order_item in leftovers]
+    return to_insert, to_update, to_delete
+
+
+def edit_counter_order(order, items_data, notes):
+    """
+    Aplica a edição de um pedido de balcão na sessão atual, sem commit: grava só a
+    diferença dos itens (INSERT/UPDATE/DELETE em lote), recalcula o resumo e o total
+    uma vez e, se o total mudou, atualiza o consolidado diário e o movimento de caixa
+    da venda. `order.items` deve estar carregado.
+    """
+    items, new_total = resolve_order_items(order.user_id, items_data, id_key='product_id', notes_key='notes')
+    to_insert, to_update, to_delete = diff_order_items(order.items, items)
+    total_changed = Decimal(str(order.total_price or 0)) != new_total
+
+    tz = None
+    if total_changed:
+        tz = user_timezone(order.user_id)
+        # Desfaz o total antigo no consolidado diário (reaplicado abaixo)
+        record_order(order, -1, tz=tz)
+
+    if to_delete:
+        db.session.execute(
+            delete(OrderItem).where(OrderItem.id.in_(to_delete)),
+            execution_options={'synchronize_session': False}
+        )
+    if to_update:
+        db.session.execute(update(OrderItem), to_update)
+    insert_order_items(order.id, to_insert)
+    if to_insert or to_update or to_delete:
+        # As linhas mudaram por SQL direto; recarrega a coleção quando for acessada
+        db.session.expire(order, ['items'])
+    apply_order_summary(order, items)
+
+    order.notes = notes
+    order.total_price = new_total
+
+    cash_movement = CashMovement.query.filter_by(order_id=order.id).first()
+    if total_changed:
+        record_order(order, tz=tz)
+        if cash_movement:
+            record_movement(cash_movement, -1, order.payment_method)
+            cash_movement.amount = new_total
+            record_movement(cash_movement, payment_method=order.payment_method)
+
+    if not cash_movement:
+        active_session = active_session_for(order.user_id)
+        if active_session:
+            new_movement = CashMovement(
+                user_id=order.user_id,
+                session_id=active_session.id,
+                type='sale',
+                description=f'Venda de Balcão (Editado) - Pedido #{order.id}',
+                amount=new_total,
+                order_id=order.id
+            )
+            db.session.add(new_movement)
+            record_movement(new_movement, payment_method=order.payment_method)
+
+    notify_order(order, ORDER_UPDATED)
+    return OrderEditResult(len(to_insert), len(to_update), len(to_delete), total_changed)
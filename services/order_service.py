@@ -0,0 +1,164 @@
+import logging
+from collections import namedtuple
+from decimal import Decimal
+from sqlalchemy import insert
+from extensions import db
+from models import Product, Order, OrderItem, OrderStatus, Neighborhood, RestaurantConfig
+
+# Linha de pedido já validada: produto do próprio restaurante, quantidade positiva.
+ResolvedItem = namedtuple('ResolvedItem', ['product', 'quantity', 'notes', 'total'])
+
+
+def parse_order_items(items_data, id_key='id', notes_key='note'):
+    """
+    Lê os itens recebidos do frontend como (product_id, quantidade, observação),
+    ignorando itens com ID/quantidade inválidos ou quantidade <= 0.
+    """
+    parsed = []
+    for item_data in items_data or []:
+        try:
+            product_id = int(item_data.get(id_key))
+            quantity = int(item_data.get('quantity'))
+        except (AttributeError, TypeError, ValueError):
+            continue
+        if quantity <= 0:
+            continue
+        parsed.append((product_id, quantity, item_data.get(notes_key) or ''))
+    return parsed
+
+
+def load_products(user_id, product_ids):
+    """Produtos do restaurante por ID em UMA consulta `IN` restrita ao user_id."""
+    if not product_ids:
+        return {}
+    return {
+        product.id: product
+        for product in Product.query.filter(
+            Product.user_id == user_id,
+            Product.id.in_(set(product_ids))
+        ).all()
+    }
+
+
+def resolve_order_items(user_id, items_data, id_key='id', notes_key='note', products=None):
+    """
+    Converte os itens recebidos do frontend em linhas de pedido usando UMA única
+    consulta `IN` restrita ao user_id do restaurante (produtos de outros restaurantes
+    são rejeitados). Itens com ID/quantidade inválidos ou quantidade <= 0 são ignorados.
+    `products` ({id: Product}, de load_products) evita a consulta quando vários
+    pedidos são resolvidos de uma vez.
+
+    Retorna (itens, subtotal), onde subtotal é um Decimal.
+    """
+    parsed = parse_order_items(items_data, id_key, notes_key)
+    if not parsed:
+        return [], Decimal(0)
+
+    if products is None:
+        products = load_products(user_id, [product_id for product_id, _, _ in parsed])
+
+    items = []
+    subtotal = Decimal(0)
+    for product_id, quantity, notes in parsed:
+        product = products.get(product_id)
+        if not product:
+            continue
+        total = Decimal(product.price) * quantity
+        subtotal += total
+        items.append(ResolvedItem(product, quantity, notes, total))
+
+    return items, subtotal
+
+
+def summary_line(quantity, name, notes=None):
+    """Linha do resumo de itens do pedido (ex.: '2x X Burguer (sem cebola)')."""
+    line = f'{quantity}x {name}'
+    return f'{line} ({notes})' if notes else line
+
+
+def apply_order_summary(order, items):
+    """
+    Preenche as colunas de resumo do pedido (item_count, items_summary, subtotal) a
+    partir das linhas resolvidas, para que as listagens não precisem carregar os
+    OrderItems. Chame sempre que os itens do pedido forem gravados ou substituídos.
+    """
+    order.item_count = sum(item.quantity for item in items)
+    order.items_summary = '\n'.join(summary_line(item.quantity, item.product.name, item.notes) for item in items)
+    order.subtotal = sum((item.total for item in items), Decimal(0))
+
+
+def order_item_rows(order_id, items):
+    """Linhas de order_items (dicts para INSERT em lote) a partir dos itens resolvidos."""
+    return [
+        {
+            'order_id': order_id,
+            'product_id': item.product.id,
+            'quantity': item.quantity,
+            'price_at_order': item.product.price,
+            'notes': item.notes,
+        }
+        for item in items
+    ]
+
+
+def insert_order_items(order_id, items):
+    """Grava as linhas do pedido em um único INSERT em lote."""
+    if not items:
+        return
+    db.session.execute(insert(OrderItem), order_item_rows(order_id, items))
+
+
+def build_menu_order(user_id, order_data):
+    """
+    Materializa um pedido do cardápio público (Order + OrderItems) na sessão atual,
+    sem commit. Usado tanto no recebimento síncrono quanto pelo worker de
+    services/intake_service.py. Lança ValueError se nenhum item for válido.
+    """
+    payment_method = order_data.get('payment_method')
+    change_for_str = order_data.get('change_for') # Receber como string
+    neighborhood_id_str = order_data.get('neighborhood_id')
+
+    # CONVERSÃO DE TIPOS CRÍTICAS PARA DECIMAL/FLOAT
+    delivery_fee = Decimal(0)
+    change_for = Decimal(change_for_str) if change_for_str and change_for_str.isdigit() else None
+
+    # 1. Busca e calcula Taxa de Entrega
+    if neighborhood_id_str:
+        try:
+            neighborhood = Neighborhood.query.get(int(neighborhood_id_str))
+            if neighborhood:
+                delivery_fee = Decimal(neighborhood.delivery_fee)
+        except (ValueError, TypeError):
+            # Se neighborhood_id for inválido, tenta pegar a taxa padrão do config
+            config = RestaurantConfig.query.filter_by(user_id=user_id).first()
+            if config and config.default_delivery_fee:
+                 delivery_fee = Decimal(config.default_delivery_fee)
+            else:
+                logging.warning("neighborhood_id inválido e sem default_delivery_fee.")
+
+    # 2. Resolve todos os itens em uma única consulta (restrita ao restaurante)
+    items, total_price = resolve_order_items(user_id, order_data.get('order_items', []))
+    if not items:
+        raise ValueError('Nenhum item válido no pedido.')
+
+    # 3. Cálculo Final e Troco
+    final_total = total_price + delivery_fee
+    order = Order(
+        user_id=user_id,
+        client_name=order_data.get('client_name'),
+        client_phone=order_data.get('client_phone'),
+        client_address=order_data.get('client_address'),
+        notes=order_data.get('complement_note'),
+        total_price=float(final_total), # Salva como float no DB
+        delivery_fee=float(delivery_fee),
+        status=OrderStatus.PENDING,
+        payment_method=payment_method,
+        change_for=change_for if change_for and payment_method == 'Dinheiro' else None
+    )
+    db.session.add(order)
+    db.session.flush()
+
+    # 4. Grava os OrderItems em um único INSERT em lote
+    insert_order_items(order.id, items)
+    apply_order_summary(order, items)
+    return order
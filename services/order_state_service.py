@@ -0,0 +1,192 @@
+import logging
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.attributes import set_committed_value
+from extensions import db
+from models import Order, OrderStatus, CashMovement
+from services.cash_service import active_session_for, record_movement
+from services.dashboard_service import queue_dashboard_invalidation
+from services.events_service import notify_order, ORDER_STATUS
+from services.rollup_service import record_order, user_timezone
+
+logger = logging.getLogger(__name__)
+
+# Máquina de estados dos pedidos. Cada transição é um UPDATE condicional
+# (WHERE status = :atual), então dois cliques simultâneos ou um duplo envio avançam
+# o pedido só uma vez, sem precisar de SELECT ... FOR UPDATE. A coluna `version`
+# é incrementada a cada transição e permite exigir também a versão que o cliente viu.
+NEXT_STATUS = {
+    OrderStatus.PENDING: OrderStatus.PREPARING,
+    OrderStatus.PREPARING: OrderStatus.SENT,
+    OrderStatus.SENT: OrderStatus.COMPLETED,
+}
+
+ALLOWED_TRANSITIONS = {
+    OrderStatus.PENDING: {OrderStatus.PREPARING, OrderStatus.CANCELLED},
+    OrderStatus.PREPARING: {OrderStatus.SENT, OrderStatus.CANCELLED},
+    OrderStatus.SENT: {OrderStatus.COMPLETED, OrderStatus.CANCELLED},
+    # Cancelar um pedido concluído continua permitido (estorno manual)
+    OrderStatus.COMPLETED: {OrderStatus.CANCELLED},
+}
+
+# Resultados da transição em lote
+APPLIED = 'applied'
+CONFLICT = 'conflict'
+INVALID = 'invalid'
+NOT_FOUND = 'not_found'
+
+
+class OrderTransitionError(ValueError):
+    """Transição não permitida a partir do status atual do pedido."""
+
+
+class OrderConflictError(OrderTransitionError):
+    """O pedido mudou (outro usuário/clique) entre a leitura e a transição."""
+
+
+def _target_status(status, to_status):
+    target = NEXT_STATUS.get(status) if to_status is None else to_status
+    if target is None or target not in ALLOWED_TRANSITIONS.get(status, ()):
+        return None
+    return target
+
+
+def _transition_values(to_status, now):
+    values = {'status': to_status, 'version': Order.version + 1}
+    if to_status == OrderStatus.COMPLETED:
+        values['completed_at'] = now
+    elif to_status == OrderStatus.CANCELLED:
+        values['canceled_at'] = now
+    return values
+
+
+def _add_sale_movement(order):
+    """
+    Grava o movimento de venda do pedido na sessão de caixa aberta (se houver) e soma
+    nos totais da sessão. O índice único ux_cash_movements_sale_order garante no máximo
+    uma venda por pedido: se ela já existe (ex.: dados antigos), o savepoint é desfeito
+    e a transição segue sem duplicar o movimento.
+    """
+    active_session = active_session_for(order.user_id)
+    try:
+        with db.session.begin_nested():
+            movement = CashMovement(
+                user_id=order.user_id,
+                session_id=active_session.id if active_session else None,
+                type='sale',
+                description=f'Venda - Pedido #{order.id}',
+                amount=order.total_price,
+                order_id=order.id
+            )
+            db.session.add(movement)
+            db.session.flush()
+            record_movement(movement, payment_method=order.payment_method)
+    except IntegrityError:
+        logger.warning('order.sale_exists', extra={'order_id': order.id})
+
+
+def _apply_side_effects(order, to_status, now, tz=None):
+    """
+    Efeitos de uma transição já gravada: consolidado diário, movimento de venda,
+    evento do quadro e invalidação do dashboard. O objeto em memória é atualizado
+    sem marcar alterações (o UPDATE condicional já foi executado).
+    """
+    tz = tz or user_timezone(order.user_id)
+    record_order(order, -1, tz=tz)
+    set_committed_value(order, 'status', to_status)
+    set_committed_value(order, 'version', (order.version or 0) + 1)
+    if to_status == OrderStatus.COMPLETED:
+        set_committed_value(order, 'completed_at', now)
+    elif to_status == OrderStatus.CANCELLED:
+        set_committed_value(order, 'canceled_at', now)
+    record_order(order, tz=tz)
+
+    if to_status == OrderStatus.COMPLETED:
+        _add_sale_movement(order)
+
+    notify_order(order, ORDER_STATUS)
+    queue_dashboard_invalidation(order.user_id)
+
+
+def transition_order(order, to_status=None, expected_version=None):
+    """
+    Move o pedido para `to_status` (ou para o próximo status da sequência, se None).
+    O UPDATE só acontece se o status (e a versão, se informada) ainda forem os lidos;
+    caso contrário levanta OrderConflictError. Não faz commit.
+    """
+    from_status = order.status
+    target = _target_status(from_status, to_status)
+    if target is None:
+        raise OrderTransitionError(f'O status do Pedido #{order.id} não pode ser alterado para {to_status.value if to_status else "o próximo"}.')
+
+    conditions = [Order.id == order.id, Order.user_id == order.user_id, Order.status == from_status]
+    if expected_version is not None:
+        conditions.append(Order.version == expected_version)
+
+    now = datetime.utcnow()
+    claimed = db.session.execute(
+        update(Order).where(*conditions).values(_transition_values(target, now)),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+    if not claimed:
+        raise OrderConflictError(f'O Pedido #{order.id} foi alterado por outra pessoa. Atualize a tela.')
+
+    _apply_side_effects(order, target, now)
+    return order
+
+
+def bulk_transition(user_id, order_ids, to_status=None):
+    """
+    Aplica a mesma transição (ou "próximo status", se to_status for None) a vários
+    pedidos do restaurante. Um UPDATE condicional por status de origem; no Postgres e
+    no SQLite com RETURNING os pedidos efetivamente alterados vêm do próprio UPDATE.
+    Não faz commit. Retorna {order_id: APPLIED | CONFLICT | INVALID | NOT_FOUND}.
+    """
+    order_ids = {int(order_id) for order_id in order_ids}
+    orders = {
+        order.id: order for order in Order.query.filter(
+            Order.user_id == user_id, Order.id.in_(order_ids)
+        )
+    } if order_ids else {}
+    results = {order_id: NOT_FOUND for order_id in order_ids if order_id not in orders}
+
+    # Agrupa por (status atual -> destino): cada grupo vira um único UPDATE
+    groups = defaultdict(list)
+    for order in orders.values():
+        target = _target_status(order.status, to_status)
+        if target is None:
+            results[order.id] = INVALID
+        else:
+            groups[(order.status, target)].append(order.id)
+
+    now = datetime.utcnow()
+    tz = user_timezone(user_id)
+    supports_returning = db.session.get_bind().dialect.update_returning
+    for (from_status, target), ids in groups.items():
+        statement = update(Order).where(
+            Order.user_id == user_id, Order.id.in_(ids), Order.status == from_status
+        ).values(_transition_values(target, now))
+
+        if supports_returning:
+            claimed = set(db.session.execute(
+                statement.returning(Order.id), execution_options={'synchronize_session': False}
+            ).scalars())
+        else:
+            claimed = set()
+            for order_id in ids:
+                if db.session.execute(
+                    update(Order).where(Order.id == order_id, Order.status == from_status)
+                    .values(_transition_values(target, now)),
+                    execution_options={'synchronize_session': False}
+                ).rowcount:
+                    claimed.add(order_id)
+
+        for order_id in ids:
+            if order_id not in claimed:
+                results[order_id] = CONFLICT
+                continue
+            _apply_side_effects(orders[order_id], target, now, tz=tz)
+            results[order_id] = APPLIED
+    return results
@@ -0,0 +1,74 @@
+import base64
+from datetime import datetime
+from sqlalchemy import and_, or_
+from sqlalchemy.engine import Row
+
+# Paginação por cursor (keyset) para listagens ordenadas por (timestamp, id) decrescentes.
+# Em vez de OFFSET, cada página continua a partir do último registro exibido, então o
+# custo não cresce com o histórico e usa os índices (user_id, status, <timestamp>).
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor, page_size):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.page_size = page_size
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def page_size_from(value, default=DEFAULT_PAGE_SIZE):
+    """Tamanho de página do request (?per_page=), limitado a MAX_PAGE_SIZE."""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(timestamp, row_id):
+    raw = f'{timestamp.isoformat()}|{row_id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(timestamp, id) do cursor, ou None se ausente/inválido (volta para a primeira página)."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, row_id = raw.split('|', 1)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def keyset_paginate(query, timestamp_column, id_column, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Uma página de `query` em ordem (timestamp desc, id desc), a partir do cursor.
+    As linhas podem ser entidades, tuplas (Entidade, colunas extras) ou tuplas só de
+    colunas (que incluam as do cursor); o cursor da próxima página vem da última linha.
+    Busca page_size + 1 linhas para saber se há mais.
+    """
+    position = decode_cursor(cursor)
+    if position is not None:
+        timestamp, row_id = position
+        query = query.filter(or_(
+            timestamp_column < timestamp,
+            and_(timestamp_column == timestamp, id_column < row_id)
+        ))
+
+    rows = query.order_by(timestamp_column.desc(), id_column.desc()).limit(page_size + 1).all()
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        entity = last[0] if isinstance(last, Row) and not hasattr(last, timestamp_column.key) else last
+        next_cursor = encode_cursor(
+            getattr(entity, timestamp_column.key), getattr(entity, id_column.key)
+        )
+    return KeysetPage(rows, next_cursor, page_size)
@@ -0,0 +1,268 @@
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from flask import current_app
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from models import Order, OrderItem, OrderStatus, CashMovement
+from services.cash_service import active_session_for, record_movement
+from services.events_service import notify_order, ORDER_CREATED
+from services.order_service import (
+    parse_order_items, load_products, resolve_order_items, order_item_rows, apply_order_summary
+)
+from services.product_search_service import get_search_index
+from services.rollup_service import record_order, user_timezone
+
+# Sincronização do PDV offline: sem internet, static/js/caixa.js guarda as vendas de
+# balcão e os movimentos de caixa localmente, cada um com um UUID gerado no navegador,
+# e os envia em lote quando a conexão volta. O UUID (client_uuid, único por restaurante)
+# torna o reenvio idempotente: itens já gravados voltam como 'duplicate'.
+STATUS_CREATED = 'created'
+STATUS_DUPLICATE = 'duplicate'
+STATUS_REJECTED = 'rejected'
+
+MOVEMENT_TYPES = ('expense', 'deposit', 'withdrawal')
+# Maior valor aceito em um pedido/movimento (colunas Numeric(10, 2))
+MAX_AMOUNT = Decimal('99999999.99')
+
+
+class SyncError(Exception):
+    """Lote inteiro recusado (sem caixa aberto, lote grande demais ou malformado)."""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def product_snapshot(user_id):
+    """
+    Produtos ativos e preços para o PDV guardar localmente, marcados com a
+    menu_revision do restaurante (vem do índice de busca, sem nova consulta).
+    """
+    index = get_search_index(user_id)
+    return {
+        'revision': index.revision,
+        'products': [
+            {'id': entry['id'], 'name': entry['name'], 'price': entry['price'], 'is_balcao': entry['is_balcao']}
+            for entry in index.entries
+        ],
+    }
+
+
+def _client_uuid(data):
+    try:
+        return str(uuid.UUID(str(data.get('client_uuid'))))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def _decimal(value, default=None):
+    """Valor monetário enviado pelo PDV; `default` se inválido, não finito (NaN/Infinity) ou fora de MAX_AMOUNT."""
+    if value in (None, ''):
+        return default
+    try:
+        amount = Decimal(str(value).replace(',', '.'))
+    except InvalidOperation:
+        return default
+    if not amount.is_finite() or abs(amount) > MAX_AMOUNT:
+        return default
+    return amount
+
+
+def _recorded_at(value, session, now):
+    """Horário informado pelo PDV (ISO 8601) em UTC, limitado ao intervalo da sessão de caixa."""
+    try:
+        moment = datetime.fromisoformat(str(value))
+    except (TypeError, ValueError):
+        return now
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    if session.opened_at and moment < session.opened_at:
+        return session.opened_at
+    return min(moment, now)
+
+
+def _existing_uuids(model, user_id, client_uuids):
+    if not client_uuids:
+        return {}
+    return dict(db.session.query(model.client_uuid, model.id).filter(
+        model.user_id == user_id, model.client_uuid.in_(client_uuids)
+    ))
+
+
+def _price_warnings(order_data, items, total):
+    """Diferenças entre os preços do snapshot usado offline e os preços atuais."""
+    warnings = []
+    client_prices = {}
+    for item_data in order_data.get('items') or []:
+        if isinstance(item_data, dict):
+            price = _decimal(item_data.get('price'))
+            if price is not None:
+                client_prices[str(item_data.get('product_id'))] = price
+    for item in items:
+        price = client_prices.get(str(item.product.id))
+        if price is not None and price != Decimal(item.product.price):
+            warnings.append(f'Preço de {item.product.name} mudou para R$ {item.product.price:.2f}.')
+    client_total = _decimal(order_data.get('total'))
+    if client_total is not None and client_total != total:
+        warnings.append(f'Total recalculado: R$ {total:.2f} (PDV: R$ {client_total:.2f}).')
+    return warnings
+
+
+def _apply_batch(user_id, orders_data, movements_data):
+    session = active_session_for(user_id)
+    if not session:
+        raise SyncError('Caixa não está aberto. Abra o caixa para sincronizar as vendas.', 409)
+    now = datetime.utcnow()
+
+    order_uuids = [_client_uuid(data) for data in orders_data]
+    movement_uuids = [_client_uuid(data) for data in movements_data]
+    existing_orders = _existing_uuids(Order, user_id, [u for u in order_uuids if u])
+    existing_movements = _existing_uuids(CashMovement, user_id, [u for u in movement_uuids if u])
+
+    # Todos os produtos do lote em uma única consulta
+    products = load_products(user_id, [
+        product_id
+        for data in orders_data
+        for product_id, _, _ in parse_order_items(data.get('items'), id_key='product_id', notes_key='notes')
+    ])
+
+    results = {'orders': [], 'movements': []}
+    seen = set()
+    new_orders = []
+    for data, client_uuid in zip(orders_data, order_uuids):
+        result = {'client_uuid': data.get('client_uuid')}
+        results['orders'].append(result)
+        if not client_uuid:
+            result.update(status=STATUS_REJECTED, message='client_uuid inválido.')
+            continue
+        if client_uuid in existing_orders or client_uuid in seen:
+            result.update(status=STATUS_DUPLICATE, order_id=existing_orders.get(client_uuid))
+            continue
+        seen.add(client_uuid)
+
+        items, total = resolve_order_items(user_id, data.get('items'), id_key='product_id',
+                                           notes_key='notes', products=products)
+        if not items:
+            result.update(status=STATUS_REJECTED, message='Nenhum item válido no pedido.')
+            continue
+        if total > MAX_AMOUNT:
+            result.update(status=STATUS_REJECTED, message='Total do pedido acima do limite.')
+            continue
+        warnings = _price_warnings(data, items, total)
+        paid = _decimal(data.get('change_for'))
+        if paid is not None and paid < total:
+            warnings.append(f'Valor pago (R$ {paid:.2f}) menor que o total (R$ {total:.2f}).')
+
+        recorded_at = _recorded_at(data.get('created_at'), session, now)
+        order = Order(
+            user_id=user_id,
+            payment_method=data.get('payment_method'),
+            change_for=paid,
+            total_price=total,
+            status=OrderStatus.COMPLETED,
+            created_at=recorded_at,
+            completed_at=recorded_at,
+            notes=data.get('notes', ''),
+            client_uuid=client_uuid
+        )
+        apply_order_summary(order, items)
+        db.session.add(order)
+        new_orders.append((order, items, result))
+        result.update(status=STATUS_CREATED, warnings=warnings)
+
+    new_movements = []
+    seen_movements = set()
+    if new_orders:
+        db.session.flush()
+        db.session.execute(insert(OrderItem), [
+            row for order, items, _ in new_orders for row in order_item_rows(order.id, items)
+        ])
+        for order, _, result in new_orders:
+            result['order_id'] = order.id
+            movement = CashMovement(
+                user_id=user_id,
+                session_id=session.id,
+                type='sale',
+                description=f'Venda de Balcão (offline) - Pedido #{order.id}',
+                amount=order.total_price,
+                order_id=order.id,
+                created_at=order.created_at
+            )
+            db.session.add(movement)
+            new_movements.append((movement, order.payment_method))
+
+    for data, client_uuid in zip(movements_data, movement_uuids):
+        result = {'client_uuid': data.get('client_uuid')}
+        results['movements'].append(result)
+        if not client_uuid:
+            result.update(status=STATUS_REJECTED, message='client_uuid inválido.')
+            continue
+        if client_uuid in existing_movements or client_uuid in seen_movements:
+            result.update(status=STATUS_DUPLICATE, movement_id=existing_movements.get(client_uuid))
+            continue
+        seen_movements.add(client_uuid)
+
+        movement_type = data.get('type')
+        description = (data.get('description') or '').strip()[:200]
+        amount = _decimal(data.get('amount'))
+        if movement_type not in MOVEMENT_TYPES or not description or amount is None or amount == 0:
+            result.update(status=STATUS_REJECTED, message='Movimentação inválida.')
+            continue
+        if movement_type in ('expense', 'withdrawal'):
+            amount = -abs(amount)
+        movement = CashMovement(
+            user_id=user_id,
+            session_id=session.id,
+            type=movement_type,
+            description=description,
+            amount=amount,
+            created_at=_recorded_at(data.get('created_at'), session, now),
+            client_uuid=client_uuid
+        )
+        db.session.add(movement)
+        new_movements.append((movement, None))
+        result.update(status=STATUS_CREATED, movement=movement)
+
+    if new_movements:
+        db.session.flush()
+    for movement, payment_method in new_movements:
+        record_movement(movement, payment_method=payment_method)
+    tz = user_timezone(user_id) if new_orders else None
+    for order, _, _ in new_orders:
+        record_order(order, tz=tz)
+        notify_order(order, ORDER_CREATED)
+
+    for result in results['movements']:
+        movement = result.pop('movement', None)
+        if movement is not None:
+            result['movement_id'] = movement.id
+    return results
+
+
+def sync_pos_batch(user_id, payload):
+    """
+    Grava um lote do PDV ({'orders': [...], 'movements': [...]}) em UMA transação e
+    faz commit. Cada entrada volta com status 'created', 'duplicate' ou 'rejected'
+    (entradas recusadas não impedem as demais); vendas criadas podem trazer avisos
+    de preço recalculado. Lança SyncError quando o lote inteiro é recusado.
+    """
+    if not isinstance(payload, dict):
+        raise SyncError('Dados de sincronização ausentes.')
+    orders_data = [data for data in payload.get('orders') or [] if isinstance(data, dict)]
+    movements_data = [data for data in payload.get('movements') or [] if isinstance(data, dict)]
+    max_batch = current_app.config['POS_SYNC_MAX_BATCH']
+    if len(orders_data) + len(movements_data) > max_batch:
+        raise SyncError(f'Lote grande demais: envie no máximo {max_batch} itens por vez.')
+
+    try:
+        results = _apply_batch(user_id, orders_data, movements_data)
+        db.session.commit()
+    except IntegrityError:
+        # Outro envio do mesmo lote gravou algum UUID ao mesmo tempo: refaz uma vez,
+        # agora com esses itens reconhecidos como duplicados
+        db.session.rollback()
+        results = _apply_batch(user_id, orders_data, movements_data)
+        db.session.commit()
+    return results
@@ -0,0 +1,181 @@
+import base64
+import hashlib
+import logging
+import secrets
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import update, or_, and_
+from sqlalchemy.orm import selectinload
+from extensions import db
+from models import PrintJob, Order, OrderItem, RestaurantConfig, Restaurant
+from services.business_hours import get_timezone
+from services.escpos_service import render_comanda, PAPER_COLUMNS, DEFAULT_PAPER_WIDTH
+
+logger = logging.getLogger(__name__)
+
+# Fila de impressão de comandas. O agente local do restaurante (autenticado pelo
+# token gerado no perfil) reivindica até PRINT_JOB_BATCH_SIZE trabalhos por vez e
+# recebe os bytes ESC/POS prontos. Trabalhos reivindicados e não confirmados em
+# PRINT_JOB_LEASE_SECONDS voltam para a fila (agente reiniciado, rede caiu).
+PENDING = 'pending'
+PRINTING = 'printing'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def _token_hash(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def rotate_agent_token(config):
+    """Gera um novo token para o agente de impressão; o anterior deixa de valer. Não faz commit."""
+    token = secrets.token_urlsafe(32)
+    config.print_agent_token_hash = _token_hash(token)
+    return token
+
+
+def config_for_token(token):
+    """RestaurantConfig dono do token do agente, ou None."""
+    if not token:
+        return None
+    return RestaurantConfig.query.filter_by(print_agent_token_hash=_token_hash(token)).first()
+
+
+def enqueue_comanda(order):
+    """
+    Coloca a comanda do pedido na fila, se o restaurante tiver um agente de impressão
+    configurado (sem agente a fila só cresceria). Não faz commit. Retorna o PrintJob ou None.
+    """
+    has_agent = db.session.query(RestaurantConfig.id).filter(
+        RestaurantConfig.user_id == order.user_id,
+        RestaurantConfig.print_agent_token_hash.isnot(None)
+    ).first()
+    if not has_agent:
+        return None
+    job = PrintJob(user_id=order.user_id, order_id=order.id, status=PENDING)
+    db.session.add(job)
+    return job
+
+
+def claim_jobs(user_id, limit=None):
+    """
+    Reivindica até `limit` trabalhos do restaurante (pendentes ou com o prazo vencido)
+    com um UPDATE condicional, como em services/order_state_service.bulk_transition:
+    dois agentes (ou duas consultas do mesmo agente) nunca recebem o mesmo trabalho.
+    Faz commit. Retorna os PrintJob reivindicados em ordem de criação.
+    """
+    config = current_app.config
+    limit = limit or config['PRINT_JOB_BATCH_SIZE']
+    now = datetime.utcnow()
+    expired = and_(
+        PrintJob.status == PRINTING,
+        PrintJob.claimed_at < now - timedelta(seconds=config['PRINT_JOB_LEASE_SECONDS'])
+    )
+    # Prazo vencido e sem tentativas restantes: desiste do trabalho
+    db.session.execute(
+        update(PrintJob).where(
+            PrintJob.user_id == user_id, expired, PrintJob.attempts >= config['PRINT_JOB_MAX_ATTEMPTS']
+        ).values(status=FAILED, error='Prazo de impressão esgotado'),
+        execution_options={'synchronize_session': False}
+    )
+
+    claimable = and_(
+        PrintJob.user_id == user_id,
+        PrintJob.attempts < config['PRINT_JOB_MAX_ATTEMPTS'],
+        or_(PrintJob.status == PENDING, expired)
+    )
+
+    candidate_ids = [
+        job_id for job_id, in db.session.query(PrintJob.id).filter(claimable)
+        .order_by(PrintJob.id).limit(limit).with_for_update(skip_locked=True)
+    ]
+    if not candidate_ids:
+        db.session.commit()
+        return []
+
+    values = {'status': PRINTING, 'claimed_at': now, 'attempts': PrintJob.attempts + 1}
+    if db.session.get_bind().dialect.update_returning:
+        claimed = set(db.session.execute(
+            update(PrintJob).where(claimable, PrintJob.id.in_(candidate_ids)).values(values)
+            .returning(PrintJob.id),
+            execution_options={'synchronize_session': False}
+        ).scalars())
+    else:
+        claimed = {
+            job_id for job_id in candidate_ids
+            if db.session.execute(
+                update(PrintJob).where(claimable, PrintJob.id == job_id).values(values),
+                execution_options={'synchronize_session': False}
+            ).rowcount
+        }
+    db.session.commit()
+    if not claimed:
+        return []
+    return PrintJob.query.filter(PrintJob.id.in_(claimed)).order_by(PrintJob.id).all()
+
+
+def render_jobs(user_id, jobs, config=None):
+    """
+    Payload do agente: os trabalhos com a comanda em ESC/POS (base64). Os pedidos do
+    lote são carregados com os itens e produtos em poucas consultas.
+    """
+    config = config or RestaurantConfig.query.filter_by(user_id=user_id).first()
+    width = config.printer_paper_width if config and config.printer_paper_width in PAPER_COLUMNS else DEFAULT_PAPER_WIDTH
+    tz = get_timezone(config.timezone if config else None)
+    codepage = current_app.config['ESCPOS_CODEPAGE']
+    restaurant = Restaurant.query.filter_by(user_id=user_id).first()
+    restaurant_name = restaurant.name if restaurant else None
+
+    orders = {
+        order.id: order for order in Order.query.options(
+            selectinload(Order.items).selectinload(OrderItem.product)
+        ).filter(Order.user_id == user_id, Order.id.in_({job.order_id for job in jobs}))
+    }
+
+    payload = []
+    for job in jobs:
+        order = orders.get(job.order_id)
+        if order is None:
+            continue
+        data = render_comanda(order, restaurant_name, width=width, tz=tz, codepage=codepage)
+        payload.append({
+            'id': job.id,
+            'order_id': job.order_id,
+            'attempt': job.attempts,
+            'created_at': job.created_at.isoformat() if job.created_at else None,
+            'data': base64.b64encode(data).decode(),
+        })
+    return {'paper_width': width, 'jobs': payload}
+
+
+def finish_job(user_id, job_id, printed, error=None):
+    """
+    Confirmação do agente. Falhas voltam para a fila até PRINT_JOB_MAX_ATTEMPTS;
+    depois o trabalho fica como 'failed'. Não faz commit. Retorna False se o trabalho
+    não estava reivindicado (já confirmado, ou devolvido à fila por prazo vencido).
+    """
+    if printed:
+        values = {'status': DONE, 'printed_at': datetime.utcnow(), 'error': None}
+    else:
+        job = db.session.get(PrintJob, job_id)
+        exhausted = job is not None and job.attempts >= current_app.config['PRINT_JOB_MAX_ATTEMPTS']
+        values = {'status': FAILED if exhausted else PENDING, 'error': (error or '')[:1000] or None}
+        if exhausted:
+            logger.warning('print_job.failed', extra={'job_id': job_id, 'user_id': user_id})
+
+    return bool(db.session.execute(
+        update(PrintJob).where(
+            PrintJob.id == job_id, PrintJob.user_id == user_id, PrintJob.status == PRINTING
+        ).values(values),
+        execution_options={'synchronize_session': False}
+    ).rowcount)
+
+
+def purge_jobs(older_than_days=7):
+    """Remove trabalhos impressos ou com falha mais antigos que `older_than_days`. Faz commit."""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    removed = PrintJob.query.filter(
+        PrintJob.status.in_((DONE, FAILED)), PrintJob.created_at < cutoff
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return removed
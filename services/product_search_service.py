@@ -0,0 +1,160 @@
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from flask import current_app
+from models import Product
+from services.menu_service import get_menu_version
+
+# Índice de busca de produtos em memória, por restaurante, para o PDV (caixa) e os
+# seletores de produto. Os nomes são normalizados (minúsculas, sem acento), então
+# "acai" encontra "Açaí". Cada palavra é indexada por todos os seus prefixos e por
+# trigramas (para trechos no meio da palavra), e a consulta só toca os candidatos.
+#
+# Como o cache do cardápio (services/menu_service.py), cada índice é marcado com a
+# menu_revision do restaurante: toda escrita em produtos chama invalidate_menu(),
+# que incrementa a revisão, e o índice é reconstruído na próxima busca.
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+SCOPE_BALCAO = 'balcao'
+SCOPE_ALL = 'todos'
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+# Limite de consultas curtas guardadas por índice
+MAX_CACHED_RESULTS = 2000
+
+
+def fold(text):
+    """Texto normalizado para busca: sem acentos, minúsculo, só letras/números e espaços."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return _NON_ALNUM.sub(' ', stripped.lower()).strip()
+
+
+def _trigrams(word):
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+class ProductSearchIndex:
+    """Produtos ativos de um restaurante com índices de prefixo e trigrama."""
+
+    def __init__(self, user_id, revision, products):
+        self.user_id = user_id
+        self.revision = revision
+        self.built_at = time.monotonic()
+        self.entries = []
+        self.prefixes = {}
+        self.trigrams = {}
+        # Resultados das consultas curtas (as mais repetidas enquanto se digita)
+        self.results = {}
+        self._results_lock = threading.Lock()
+
+        for product in sorted(products, key=lambda p: fold(p.name)):
+            position = len(self.entries)
+            folded = fold(product.name)
+            self.entries.append({
+                'id': product.id,
+                'name': product.name,
+                'price': float(product.price),
+                'folded': folded,
+                'is_balcao': bool(product.is_balcao),
+            })
+            for word in set(folded.split()):
+                for end in range(1, len(word) + 1):
+                    self.prefixes.setdefault(word[:end], set()).add(position)
+                for trigram in _trigrams(word):
+                    self.trigrams.setdefault(trigram, set()).add(position)
+
+    def _word_matches(self, word):
+        """(posições com alguma palavra começando por `word`, posições que contêm `word`)."""
+        prefixed = self.prefixes.get(word, set())
+        if len(word) < 3:
+            return prefixed, prefixed
+        candidates = None
+        for trigram in _trigrams(word):
+            found = self.trigrams.get(trigram)
+            if not found:
+                return prefixed, prefixed
+            candidates = found if candidates is None else candidates & found
+        contained = {position for position in candidates if word in self.entries[position]['folded']}
+        return prefixed, prefixed | contained
+
+    def _search(self, folded_query, scope, limit):
+        words = folded_query.split()
+        matched, prefix_only = None, None
+        for word in words:
+            prefixed, contained = self._word_matches(word)
+            matched = contained if matched is None else matched & contained
+            prefix_only = prefixed if prefix_only is None else prefix_only & prefixed
+            if not matched:
+                return []
+
+        def rank(position):
+            entry = self.entries[position]
+            if entry['folded'].startswith(folded_query):
+                return 0, position
+            return (1 if position in prefix_only else 2), position
+
+        if scope == SCOPE_BALCAO:
+            matched = [position for position in matched if self.entries[position]['is_balcao']]
+        return [
+            {'id': self.entries[position]['id'], 'name': self.entries[position]['name'],
+             'price': self.entries[position]['price']}
+            for position in heapq.nsmallest(limit, matched, key=rank)
+        ]
+
+    def search(self, query, scope=SCOPE_BALCAO, limit=10):
+        """
+        Produtos cujo nome contém todas as palavras da consulta (início de palavra ou
+        trecho), nesta ordem: nome começando pela consulta, todas as palavras por
+        prefixo, demais; empates em ordem alfabética.
+        """
+        folded_query = fold(query)
+        if not folded_query:
+            return []
+        cacheable = len(folded_query) <= current_app.config['PRODUCT_SEARCH_CACHE_PREFIX_LEN']
+        key = (folded_query, scope, limit)
+        if cacheable:
+            cached = self.results.get(key)
+            if cached is not None:
+                return cached
+
+        results = self._search(folded_query, scope, limit)
+        if cacheable and len(self.results) < MAX_CACHED_RESULTS:
+            with self._results_lock:
+                self.results[key] = results
+        return results
+
+
+def get_search_index(user_id):
+    """
+    Índice do restaurante, reconstruído quando a menu_revision muda (ou após
+    PRODUCT_SEARCH_TTL segundos, como rede de segurança).
+    """
+    revision = get_menu_version(user_id)
+    ttl = current_app.config['PRODUCT_SEARCH_TTL']
+    now = time.monotonic()
+    with _indexes_lock:
+        index = _indexes.get(user_id)
+        if index and index.revision == revision and now - index.built_at < ttl:
+            _indexes.move_to_end(user_id)
+            return index
+
+    products = Product.query.with_entities(
+        Product.id, Product.name, Product.price, Product.is_balcao
+    ).filter(Product.user_id == user_id, Product.is_active == True).all()
+    index = ProductSearchIndex(user_id, revision, products)
+
+    with _indexes_lock:
+        _indexes[user_id] = index
+        _indexes.move_to_end(user_id)
+        while len(_indexes) > current_app.config['PRODUCT_SEARCH_MAX_INDEXES']:
+            _indexes.popitem(last=False)
+    return index
+
+
+def search_products(user_id, query, scope=SCOPE_BALCAO, limit=10):
+    return get_search_index(user_id).search(query, scope, limit)
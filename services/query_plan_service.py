@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from extensions import db
+from models import Order, OrderItem, OrderStatus, CashMovement, Product
+
+
+def _hot_queries(user_id, start, end):
+    """(nome, consulta, índice esperado) das consultas mais frequentes por restaurante."""
+    return [
+        ('pedidos.concluidos', Order.query.filter(
+            Order.user_id == user_id, Order.status == OrderStatus.COMPLETED,
+            Order.completed_at >= start, Order.completed_at < end
+        ), 'ix_orders_user_status_completed'),
+        ('pedidos.cancelados', Order.query.filter(
+            Order.user_id == user_id, Order.status == OrderStatus.CANCELLED,
+            Order.canceled_at >= start, Order.canceled_at < end
+        ), 'ix_orders_user_status_canceled'),
+        ('dashboard.pedidos_periodo', Order.query.filter(
+            Order.user_id == user_id, Order.created_at >= start, Order.created_at < end
+        ), 'ix_orders_user_created'),
+        ('pedidos.itens', OrderItem.query.filter(OrderItem.order_id == 1), 'ix_order_items_order_id'),
+        ('caixa.movimentos_sessao', CashMovement.query.filter(
+            CashMovement.user_id == user_id, CashMovement.session_id == 1
+        ), 'ix_cash_movements_user_session'),
+        ('relatorios.movimentos_periodo', CashMovement.query.filter(
+            CashMovement.user_id == user_id, CashMovement.created_at >= start, CashMovement.created_at < end
+        ), 'ix_cash_movements_user_created'),
+        ('caixa.movimentos_pedido', CashMovement.query.filter(CashMovement.order_id == 1), 'ix_cash_movements_order'),
+        ('cardapio.produtos', Product.query.filter(
+            Product.user_id == user_id, Product.is_active == True
+        ), 'ix_products_user_active'),
+    ]
+
+
+def _explain(query):
+    """Plano de execução da consulta como texto (SQLite ou Postgres)."""
+    bind = db.session.get_bind()
+    sql = str(query.statement.compile(dialect=bind.dialect, compile_kwargs={'literal_binds': True}))
+
+    if bind.dialect.name == 'postgresql':
+        # Com tabelas pequenas o Postgres prefere seq scan; desliga só nesta transação
+        # para verificar se existe um índice utilizável.
+        db.session.execute(text('SET LOCAL enable_seqscan = off'))
+        rows = db.session.execute(text(f'EXPLAIN {sql}')).all()
+        db.session.rollback()
+        return '\n'.join(row[0] for row in rows)
+
+    rows = db.session.execute(text(f'EXPLAIN QUERY PLAN {sql}')).all()
+    return '\n'.join(str(row[-1]) for row in rows)
+
+
+def check_query_plans(user_id=1):
+    """
+    Roda EXPLAIN nas consultas quentes e confere se cada uma usa o índice esperado.
+    Retorna uma lista de (nome, índice esperado, ok, plano).
+    """
+    end = datetime.utcnow()
+    start = end - timedelta(days=30)
+    results = []
+    for name, query, index in _hot_queries(user_id, start, end):
+        plan = _explain(query)
+        results.append((name, index, index in plan, plan))
+    return results
@@ -0,0 +1,167 @@
+from collections import defaultdict
+from datetime import datetime, date
+from decimal import Decimal
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from extensions import db
+from models import Order, OrderStatus, DailySalesRollup, RestaurantConfig
+from services.business_hours import get_timezone, local_date
+
+ROLLUP_FIELDS = ['orders_count', 'revenue', 'delivery_fees', 'cancelled_count', 'cancelled_amount']
+
+
+def as_date(value):
+    # SQLite devolve func.date() como string 'YYYY-MM-DD'; Postgres devolve date
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def user_timezone(user_id):
+    """Fuso do restaurante (uma consulta); resolva uma vez e passe como `tz=` em lotes."""
+    return get_timezone(db.session.query(RestaurantConfig.timezone).filter_by(user_id=user_id).scalar())
+
+
+def _order_bucket(order, tz):
+    """(dia local, deltas) que o pedido soma ao consolidado no status atual, ou None."""
+    total = Decimal(str(order.total_price or 0))
+    if order.status == OrderStatus.COMPLETED:
+        # Pedidos antigos de balcão não tinham completed_at
+        day = order.completed_at or order.created_at or datetime.utcnow()
+        return local_date(day, tz), {
+            'orders_count': 1,
+            'revenue': total,
+            'delivery_fees': Decimal(str(order.delivery_fee or 0)),
+        }
+    if order.status == OrderStatus.CANCELLED:
+        day = order.canceled_at or datetime.utcnow()
+        return local_date(day, tz), {
+            'cancelled_count': 1,
+            'cancelled_amount': total,
+        }
+    return None
+
+
+def _upsert(user_id, day, payment_method, deltas):
+    """Soma os deltas na linha (user_id, day, payment_method), criando-a se preciso, de forma atômica."""
+    values = {field: 0 for field in ROLLUP_FIELDS}
+    values.update(deltas)
+    table = DailySalesRollup.__table__
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect in ('postgresql', 'sqlite'):
+        insert = (postgresql if dialect == 'postgresql' else sqlite).insert
+        statement = insert(table).values(user_id=user_id, day=day, payment_method=payment_method, **values)
+        statement = statement.on_conflict_do_update(
+            index_elements=['user_id', 'day', 'payment_method'],
+            set_={field: table.c[field] + statement.excluded[field] for field in deltas}
+        )
+        db.session.execute(statement)
+        return
+
+    updated = db.session.execute(
+        update(table).where(
+            table.c.user_id == user_id, table.c.day == day, table.c.payment_method == payment_method
+        ).values({field: table.c[field] + delta for field, delta in deltas.items()})
+    ).rowcount
+    if not updated:
+        db.session.execute(table.insert().values(user_id=user_id, day=day, payment_method=payment_method, **values))
+
+
+def record_order(order, sign=1, tz=None):
+    """
+    Aplica (sign=1) ou desfaz (sign=-1) a contribuição do pedido no consolidado diário,
+    de acordo com o status atual. Deve rodar na mesma transação da mudança do pedido:
+    desfaça antes de alterar status/total e aplique depois.
+    Os dias do consolidado são dias locais no fuso do restaurante (`tz`, de
+    user_timezone; consultado aqui se omitido).
+    """
+    bucket = _order_bucket(order, tz or user_timezone(order.user_id))
+    if bucket is None:
+        return
+    day, deltas = bucket
+    _upsert(order.user_id, day, order.payment_method or '', {
+        field: value * sign for field, value in deltas.items()
+    })
+
+
+def get_rollup_by_day(user_id, start_day, end_day):
+    """Consolidado por dia em [start_day, end_day], somando as formas de pagamento."""
+    rows = db.session.query(
+        DailySalesRollup.day,
+        func.sum(DailySalesRollup.orders_count),
+        func.sum(DailySalesRollup.revenue),
+        func.sum(DailySalesRollup.delivery_fees),
+        func.sum(DailySalesRollup.cancelled_count),
+        func.sum(DailySalesRollup.cancelled_amount),
+    ).filter(
+        DailySalesRollup.user_id == user_id,
+        DailySalesRollup.day >= start_day,
+        DailySalesRollup.day <= end_day
+    ).group_by(DailySalesRollup.day).all()
+
+    return {
+        as_date(row[0]): {
+            field: (Decimal(value or 0) if field not in ('orders_count', 'cancelled_count') else int(value or 0))
+            for field, value in zip(ROLLUP_FIELDS, row[1:])
+        }
+        for row in rows
+    }
+
+
+def get_rollup_totals(user_id, start_day, end_day):
+    """Totais do período em [start_day, end_day]."""
+    totals = {field: 0 for field in ROLLUP_FIELDS}
+    for day_totals in get_rollup_by_day(user_id, start_day, end_day).values():
+        for field in ROLLUP_FIELDS:
+            totals[field] += day_totals[field]
+    return totals
+
+
+def rebuild_rollup(user_id=None):
+    """
+    Reconstrói o consolidado a partir do histórico de pedidos (todos os restaurantes ou um).
+    Lê só as colunas necessárias dos pedidos concluídos/cancelados em streaming, agrupa
+    por dia local (fuso de cada restaurante) e grava com um INSERT em lote.
+    Retorna quantas linhas foram gravadas.
+    """
+    timezones = {
+        owner: get_timezone(name)
+        for owner, name in db.session.query(RestaurantConfig.user_id, RestaurantConfig.timezone)
+    }
+    default_tz = get_timezone(None)
+
+    rows = db.session.query(
+        Order.user_id, Order.status, Order.payment_method, Order.total_price, Order.delivery_fee,
+        Order.created_at, Order.completed_at, Order.canceled_at
+    ).filter(or_(
+        Order.status == OrderStatus.COMPLETED,
+        and_(Order.status == OrderStatus.CANCELLED, Order.canceled_at.isnot(None))
+    ))
+    if user_id is not None:
+        rows = rows.filter(Order.user_id == user_id)
+
+    buckets = defaultdict(lambda: {field: 0 for field in ROLLUP_FIELDS})
+    for row in rows.yield_per(1000):
+        bucket = _order_bucket(row, timezones.get(row.user_id, default_tz))
+        if bucket is None:
+            continue
+        day, deltas = bucket
+        values = buckets[(row.user_id, day, row.payment_method or '')]
+        for field, delta in deltas.items():
+            values[field] += delta
+
+    delete = DailySalesRollup.query
+    if user_id is not None:
+        delete = delete.filter(DailySalesRollup.user_id == user_id)
+    delete.delete(synchronize_session=False)
+
+    if buckets:
+        db.session.execute(DailySalesRollup.__table__.insert(), [
+            {'user_id': owner, 'day': day, 'payment_method': payment_method, **values}
+            for (owner, day, payment_method), values in buckets.items()
+        ])
+    db.session.commit()
+    return len(buckets)
@@ -19,6 +19,145 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     };
 
+    // PDV OFFLINE: produtos e preços ficam guardados no navegador (atualizados pelo
+    // /caixa/produtos_snapshot) e, sem internet, vendas e movimentações entram em uma
+    // fila local com um UUID cada, enviada em lotes para /caixa/sincronizar.
+    const SNAPSHOT_KEY = 'caixa.productSnapshot';
+    const OFFLINE_QUEUE_KEY = 'caixa.offlineQueue';
+    const SYNC_BATCH_SIZE = 50;
+    const SYNC_INTERVAL_MS = 30000;
+
+    const readStorage = (key, fallback) => {
+        try {
+            return JSON.parse(localStorage.getItem(key)) || fallback;
+        } catch (error) {
+            return fallback;
+        }
+    };
+
+    const foldText = (text) => (text || '').normalize('NFD').replace(/[\u0300-\u036f]/g, '').toLowerCase();
+
+    const newClientUuid = () => {
+        if (window.crypto && crypto.randomUUID) {
+            return crypto.randomUUID();
+        }
+        const bytes = crypto.getRandomValues(new Uint8Array(16));
+        bytes[6] = (bytes[6] & 0x0f) | 0x40;
+        bytes[8] = (bytes[8] & 0x3f) | 0x80;
+        const hex = Array.from(bytes, (byte) => byte.toString(16).padStart(2, '0')).join('');
+        return `${hex.slice(0, 8)}-${hex.slice(8, 12)}-${hex.slice(12, 16)}-${hex.slice(16, 20)}-${hex.slice(20)}`;
+    };
+
+    const refreshProductSnapshot = async () => {
+        try {
+            const response = await fetch('/caixa/produtos_snapshot');
+            if (response.ok) {
+                localStorage.setItem(SNAPSHOT_KEY, JSON.stringify(await response.json()));
+            }
+        } catch (error) {
+            // Sem conexão: continua com o snapshot já guardado
+        }
+    };
+
+    const searchSnapshot = (query) => {
+        const words = foldText(query).split(/\s+/).filter(Boolean);
+        const snapshot = readStorage(SNAPSHOT_KEY, { products: [] });
+        return snapshot.products
+            .filter(product => product.is_balcao && words.every(word => foldText(product.name).includes(word)))
+            .slice(0, 10);
+    };
+
+    const offlineQueue = {
+        load: () => readStorage(OFFLINE_QUEUE_KEY, { orders: [], movements: [] }),
+        save: (queue) => {
+            localStorage.setItem(OFFLINE_QUEUE_KEY, JSON.stringify(queue));
+            updateOfflineStatus(queue);
+        },
+        add: (kind, entry) => {
+            const queue = offlineQueue.load();
+            queue[kind].push({ client_uuid: newClientUuid(), created_at: new Date().toISOString(), ...entry });
+            offlineQueue.save(queue);
+        },
+    };
+
+    const updateOfflineStatus = (queue = offlineQueue.load()) => {
+        const status = document.getElementById('offline-queue-status');
+        if (!status) return;
+        const pending = queue.orders.length + queue.movements.length;
+        status.textContent = `${pending} registro(s) aguardando sincronização`;
+        status.classList.toggle('hidden', pending === 0);
+    };
+
+    // Falha de rede (não resposta de erro do servidor): a venda vai para a fila local
+    const isNetworkError = (error) => !navigator.onLine || error instanceof TypeError;
+
+    let syncing = false;
+    const syncOfflineQueue = async () => {
+        let queue = offlineQueue.load();
+        if (syncing || !navigator.onLine || (queue.orders.length + queue.movements.length) === 0) {
+            return;
+        }
+        syncing = true;
+        const problems = [];
+        let synced = 0;
+        try {
+            while (queue.orders.length + queue.movements.length > 0) {
+                const orders = queue.orders.slice(0, SYNC_BATCH_SIZE);
+                const movements = queue.movements.slice(0, SYNC_BATCH_SIZE - orders.length);
+                const response = await fetch('/caixa/sincronizar', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ orders, movements })
+                });
+                const result = await response.json();
+                if (!result.success) {
+                    // Caixa fechado ou lote recusado: mantém a fila para a próxima tentativa
+                    console.warn('Sincronização recusada:', result.message);
+                    break;
+                }
+                // Criados, duplicados (já gravados) e recusados saem da fila
+                const done = new Set();
+                [...result.orders, ...result.movements].forEach(entry => {
+                    done.add(entry.client_uuid);
+                    if (entry.status === 'rejected') problems.push(entry.message);
+                    (entry.warnings || []).forEach(warning => problems.push(warning));
+                });
+                if (done.size === 0) break;
+                queue = offlineQueue.load();
+                queue.orders = queue.orders.filter(entry => !done.has(entry.client_uuid));
+                queue.movements = queue.movements.filter(entry => !done.has(entry.client_uuid));
+                offlineQueue.save(queue);
+                synced += done.size;
+            }
+        } catch (error) {
+            console.warn('Sincronização adiada:', error);
+        } finally {
+            syncing = false;
+        }
+        if (problems.length > 0) {
+            alert('Vendas offline sincronizadas com avisos:\n' + problems.join('\n'));
+        } else if (synced > 0) {
+            console.info(`${synced} registro(s) offline sincronizado(s).`);
+        }
+    };
+
+    // Busca de produtos (índice do servidor, sem diferenciar acentos). Cada campo guarda
+    // o número da última busca para descartar respostas que chegam fora de ordem.
+    // Sem conexão, busca no snapshot local.
+    const searchSequence = {};
+    const fetchProducts = async (key, query) => {
+        const sequence = (searchSequence[key] || 0) + 1;
+        searchSequence[key] = sequence;
+        let products;
+        try {
+            const response = await fetch(`/caixa/buscar_produtos?q=${encodeURIComponent(query)}`);
+            products = await response.json();
+        } catch (error) {
+            products = searchSnapshot(query);
+        }
+        return searchSequence[key] === sequence ? products : null;
+    };
+
     // 2. LÓGICA DO FORMULÁRIO "NOVO PEDIDO DE BALCÃO"
     const productSearchInput = document.getElementById('product-search');
     const searchResultsList = document.getElementById('product-search-results');
@@ -109,10 +248,10 @@ document.addEventListener('DOMContentLoaded', () => {
     // Event Listeners para o formulário de Novo Pedido
     if (productSearchInput) {
         productSearchInput.addEventListener('input', async () => {
-            const query = productSearchInput.value;
-            if (query.length > 2) {
-                const response = await fetch(`/caixa/buscar_produtos?q=${query}`);
-                const products = await response.json();
+            const query = productSearchInput.value.trim();
+            if (query.length > 0) {
+                const products = await fetchProducts('new', query);
+                if (products === null) return;
                 searchResultsList.innerHTML = '';
                 if (products.length > 0) {
                     products.forEach(product => {
@@ -193,7 +332,8 @@ document.addEventListener('DOMContentLoaded', () => {
             const items = Array.from(cart).map(([productId, item]) => ({
                 product_id: productId,
                 quantity: item.quantity,
-                notes: item.notes
+                notes: item.notes,
+                price: item.price
             }));
 
             const data = {
@@ -218,12 +358,47 @@ document.addEventListener('DOMContentLoaded', () => {
                     alert('Erro: ' + result.message);
                 }
             } catch (error) {
+                if (isNetworkError(error)) {
+                    const total = items.reduce((sum, item) => sum + item.quantity * item.price, 0);
+                    offlineQueue.add('orders', { ...data, total: total.toFixed(2) });
+                    alert('Sem conexão: venda guardada neste computador e será sincronizada automaticamente.');
+                    cart.clear();
+                    updateCartDisplay();
+                    counterOrderForm.reset();
+                    hideModal('new-order-modal');
+                    return;
+                }
                 console.error('Erro ao finalizar pedido:', error);
                 alert('Ocorreu um erro ao finalizar o pedido.');
             }
         });
     }
 
+    // Movimentação: enviada via fetch; em falha de rede (mesmo com navigator.onLine
+    // verdadeiro, ex.: roteador ligado sem internet) vai para a fila local
+    const addMovementForm = document.getElementById('add-movement-form');
+    if (addMovementForm) {
+        addMovementForm.addEventListener('submit', async (e) => {
+            e.preventDefault();
+            const formData = new FormData(addMovementForm);
+            try {
+                // A rota responde com redirect + flash; sem seguir o redirect a mensagem
+                // continua na sessão e aparece ao recarregar o caixa
+                await fetch(addMovementForm.action, { method: 'POST', body: formData, redirect: 'manual' });
+                window.location.reload();
+            } catch (error) {
+                if (!isNetworkError(error)) throw error;
+                offlineQueue.add('movements', {
+                    type: formData.get('type'),
+                    description: formData.get('description'),
+                    amount: formData.get('amount')
+                });
+                addMovementForm.reset();
+                alert('Sem conexão: movimentação guardada neste computador e será sincronizada automaticamente.');
+            }
+        });
+    }
+
     // 3. ATALHOS DE TECLADO
     document.addEventListener('keydown', (e) => {
         if (e.key === 'F2') {
@@ -376,10 +551,10 @@ document.addEventListener('DOMContentLoaded', () => {
 
     if (editProductSearchInput) {
         editProductSearchInput.addEventListener('input', async () => {
-            const query = editProductSearchInput.value;
-            if (query.length > 2) {
-                const response = await fetch(`/caixa/buscar_produtos?q=${query}`);
-                const products = await response.json();
+            const query = editProductSearchInput.value.trim();
+            if (query.length > 0) {
+                const products = await fetchProducts('edit', query);
+                if (products === null) return;
                 editSearchResultsList.innerHTML = '';
                 if (products.length > 0) {
                     products.forEach(product => {
@@ -502,4 +677,11 @@ document.addEventListener('DOMContentLoaded', () => {
     // 7. INICIALIZAÇÃO
     lucide.createIcons();
     toggleChangeInput();
+    updateOfflineStatus();
+    if (document.getElementById('offline-queue-status')) {
+        refreshProductSnapshot();
+        syncOfflineQueue();
+        window.addEventListener('online', syncOfflineQueue);
+        setInterval(syncOfflineQueue, SYNC_INTERVAL_MS);
+    }
 });
\ No newline at end of file
@@ -0,0 +1,69 @@
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+# Banco SQLite descartável e sem .env local; precisa estar definido antes de importar o app
+_db_dir = tempfile.mkdtemp(prefix='deliveryaceito-tests-')
+os.environ['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ['RENDER'] = '1'
+os.environ.setdefault('LOG_FORMAT', 'text')
+os.environ.setdefault('EVENTS_BACKEND', 'local')
+os.environ.setdefault('CACHE_BACKEND', 'local')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as flask_app  # noqa: E402
+from extensions import db as _db  # noqa: E402
+from models import User, RestaurantConfig, Product, CashSession  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    flask_app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    return flask_app
+
+
+@pytest.fixture
+def db(app):
+    """Banco recriado a cada teste, com contexto de aplicação ativo."""
+    with app.app_context():
+        _db.drop_all()
+        _db.create_all()
+        yield _db
+        _db.session.remove()
+
+
+@pytest.fixture
+def user(db):
+    """Restaurante no fuso de São Paulo (UTC-3, sem horário de verão)."""
+    user = User(name='Restaurante', email='dono@example.com', phone='11999999999')
+    user.set_password('senha')
+    db.session.add(user)
+    db.session.flush()
+    db.session.add(RestaurantConfig(user_id=user.id, timezone='America/Sao_Paulo'))
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def products(db, user):
+    products = [
+        Product(user_id=user.id, name='X Burguer', price=20, category='Lanches'),
+        Product(user_id=user.id, name='Coca', price=6, category='Bebidas'),
+    ]
+    db.session.add_all(products)
+    db.session.commit()
+    return products
+
+
+@pytest.fixture
+def cash_session(db, user):
+    session = CashSession(
+        user_id=user.id, opening_amount=100, balance=100, is_active=True,
+        opened_at=datetime.utcnow() - timedelta(hours=1)
+    )
+    db.session.add(session)
+    db.session.commit()
+    return session
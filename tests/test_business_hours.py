@@ -0,0 +1,124 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from services.business_hours import (
+    BusinessSchedule, MINUTES_PER_WEEK, get_schedule, restaurant_status, get_timezone
+)
+
+SAO_PAULO = get_timezone('America/Sao_Paulo')
+
+
+def at(day, hour, minute=0):
+    """Horário local de São Paulo na semana de segunda-feira 19/10/2026 (day 0 = segunda)."""
+    return datetime(2026, 10, 19 + day, hour, minute, tzinfo=SAO_PAULO)
+
+
+def compile_week(**days):
+    return BusinessSchedule.compile(days, 'America/Sao_Paulo')
+
+
+def test_simple_shift_is_half_open():
+    schedule = compile_week(monday={'open': '11:00', 'close': '14:00'})
+
+    assert not schedule.is_open(at(0, 10, 59))
+    assert schedule.is_open(at(0, 11, 0))
+    assert schedule.is_open(at(0, 13, 59))
+    assert not schedule.is_open(at(0, 14, 0))
+    assert not schedule.is_open(at(1, 12, 0))
+
+
+def test_naive_datetimes_are_utc():
+    schedule = compile_week(monday={'open': '11:00', 'close': '14:00'})
+
+    # 14:30 UTC = 11:30 em São Paulo
+    assert schedule.is_open(datetime(2026, 10, 19, 14, 30))
+    assert not schedule.is_open(datetime(2026, 10, 19, 11, 30))
+    assert schedule.is_open(datetime(2026, 10, 19, 14, 30, tzinfo=timezone.utc))
+
+
+def test_shift_past_midnight_continues_next_day():
+    schedule = compile_week(friday={'open': '18:00', 'close': '02:00'})
+
+    assert schedule.is_open(at(4, 23, 30))
+    assert schedule.is_open(at(5, 1, 59))
+    assert not schedule.is_open(at(5, 2, 0))
+    assert not schedule.is_open(at(4, 17, 59))
+
+
+def test_sunday_shift_wraps_into_monday():
+    schedule = compile_week(sunday={'open': '22:00', 'close': '02:00'})
+
+    assert schedule.intervals == [(0, 120), (6 * 1440 + 22 * 60, MINUTES_PER_WEEK)]
+    assert schedule.is_open(at(6, 23, 0))
+    assert schedule.is_open(at(0, 1, 0))
+    assert not schedule.is_open(at(0, 2, 0))
+    # A divisão em domingo 24:00 / segunda 00:00 não é uma mudança real de status
+    assert schedule.last_transition(at(0, 1, 0)) == at(-1, 22, 0)
+
+
+def test_same_open_and_close_means_24_hours():
+    schedule = compile_week(tuesday={'open': '08:00', 'close': '08:00'})
+
+    assert schedule.is_open(at(1, 8, 0))
+    assert schedule.is_open(at(2, 7, 59))
+    assert not schedule.is_open(at(2, 8, 0))
+
+
+def test_overlapping_and_multiple_shifts_are_merged():
+    schedule = compile_week(
+        monday=[{'open': '11:00', 'close': '15:00'}, {'open': '14:00', 'close': '16:00'},
+                {'open': '18:00', 'close': '23:00'}],
+        wednesday={'shifts': [{'open': '10:00', 'close': '12:00'}]},
+    )
+
+    assert schedule.intervals == [(660, 960), (1080, 1380), (2 * 1440 + 600, 2 * 1440 + 720)]
+    assert not schedule.is_open(at(0, 17, 0))
+    assert schedule.is_open(at(2, 11, 0))
+    assert schedule.shifts_for('monday') == [('11:00', '15:00'), ('14:00', '16:00'), ('18:00', '23:00')]
+
+
+def test_next_opening_wraps_to_next_week():
+    schedule = compile_week(monday={'open': '11:00', 'close': '14:00'})
+
+    assert schedule.next_opening(at(0, 9, 30)) == at(0, 11, 0)
+    assert schedule.next_opening(at(3, 12, 0)) == at(7, 11, 0)
+    assert schedule.last_transition(at(3, 12, 0)) == at(0, 14, 0)
+
+
+def test_empty_schedule_is_always_closed():
+    schedule = compile_week()
+
+    assert not schedule.is_open(at(0, 12, 0))
+    assert schedule.next_opening(at(0, 12, 0)) is None
+    assert schedule.last_transition(at(0, 12, 0)) is None
+
+
+@pytest.mark.parametrize('business_hours', [
+    {'monday': {'open': '25:00', 'close': '26:00'}},
+    {'monday': {'open': '10:61', 'close': '11:00'}},
+    '{not json',
+])
+def test_invalid_hours_raise_on_compile(business_hours):
+    with pytest.raises(ValueError):
+        BusinessSchedule.compile(business_hours)
+
+
+def test_get_schedule_falls_back_to_closed_and_recompiles_on_change():
+    broken = get_schedule(-1, '{"monday": {"open": "xx", "close": "yy"}}', 'America/Sao_Paulo')
+    assert broken.intervals == []
+    assert restaurant_status(broken, 'auto', at(0, 12, 0)) == 'Fechado'
+
+    hours = '{"monday": {"open": "11:00", "close": "14:00"}}'
+    schedule = get_schedule(-1, hours, 'America/Sao_Paulo')
+    assert schedule is not broken
+    assert get_schedule(-1, hours, 'America/Sao_Paulo') is schedule
+    assert restaurant_status(schedule, 'auto', at(0, 12, 0)) == 'Aberto'
+
+
+def test_manual_override_wins():
+    schedule = compile_week(monday={'open': '11:00', 'close': '14:00'})
+
+    assert restaurant_status(schedule, 'closed', at(0, 12, 0)) == 'Fechado'
+    assert restaurant_status(schedule, 'open', at(1, 3, 0)) == 'Aberto'
+    assert restaurant_status(None, 'auto') == 'Fechado'
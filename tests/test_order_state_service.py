@@ -0,0 +1,150 @@
+import pytest
+from sqlalchemy import update
+
+from models import CashMovement, Order, OrderStatus, User
+from services import order_state_service
+from services.order_state_service import (
+    APPLIED, CONFLICT, INVALID, NOT_FOUND, OrderConflictError, OrderTransitionError,
+    bulk_transition, transition_order,
+)
+
+
+def add_order(db, user, total=30, status=OrderStatus.PENDING):
+    order = Order(user_id=user.id, client_name='Cliente', total_price=total, payment_method='Pix', status=status)
+    db.session.add(order)
+    db.session.commit()
+    return order
+
+
+def force_status(db, order_id, status):
+    """Simula outro usuário alterando o pedido direto no banco."""
+    db.session.execute(
+        update(Order).where(Order.id == order_id).values(status=status, version=Order.version + 1),
+        execution_options={'synchronize_session': False}
+    )
+
+
+def test_transition_follows_the_sequence(db, user):
+    order = add_order(db, user)
+
+    for expected in (OrderStatus.PREPARING, OrderStatus.SENT, OrderStatus.COMPLETED):
+        transition_order(order)
+        assert order.status == expected
+    db.session.commit()
+
+    db.session.expire_all()
+    stored = db.session.get(Order, order.id)
+    assert stored.status == OrderStatus.COMPLETED
+    assert stored.version == 3
+    assert stored.completed_at is not None
+
+
+def test_cancel_sets_canceled_at(db, user):
+    order = add_order(db, user)
+    transition_order(order, OrderStatus.CANCELLED)
+    db.session.commit()
+
+    db.session.expire_all()
+    assert db.session.get(Order, order.id).canceled_at is not None
+
+
+@pytest.mark.parametrize('status, to_status', [
+    (OrderStatus.PENDING, OrderStatus.COMPLETED),
+    (OrderStatus.CANCELLED, None),
+    (OrderStatus.CANCELLED, OrderStatus.PENDING),
+    (OrderStatus.COMPLETED, None),
+])
+def test_disallowed_transitions_raise(db, user, status, to_status):
+    order = add_order(db, user, status=status)
+
+    with pytest.raises(OrderTransitionError):
+        transition_order(order, to_status)
+
+
+def test_stale_status_is_a_conflict(db, user):
+    order = add_order(db, user)
+    force_status(db, order.id, OrderStatus.PREPARING)
+
+    # O objeto em memória ainda está PENDING: o UPDATE condicional não encontra a linha
+    with pytest.raises(OrderConflictError):
+        transition_order(order)
+
+
+def test_expected_version_must_match(db, user):
+    order = add_order(db, user)
+
+    with pytest.raises(OrderConflictError):
+        transition_order(order, expected_version=order.version + 1)
+    transition_order(order, expected_version=order.version)
+    assert order.status == OrderStatus.PREPARING
+
+
+def test_completion_records_one_sale_in_the_open_session(db, user, cash_session):
+    order = add_order(db, user, total=42, status=OrderStatus.SENT)
+    transition_order(order)
+    db.session.commit()
+
+    sales = CashMovement.query.filter_by(order_id=order.id, type='sale').all()
+    assert [(sale.session_id, float(sale.amount)) for sale in sales] == [(cash_session.id, 42.0)]
+    db.session.refresh(cash_session)
+    assert float(cash_session.total_sales) == 42.0
+
+    # Estorno e nova conclusão de um pedido já vendido não duplicam a venda
+    transition_order(order, OrderStatus.CANCELLED)
+    db.session.commit()
+    assert CashMovement.query.filter_by(order_id=order.id, type='sale').count() == 1
+
+
+@pytest.fixture(params=[True, False], ids=['returning', 'row-by-row'])
+def update_returning(request, db, monkeypatch):
+    """Roda os testes em lote com e sem UPDATE ... RETURNING."""
+    monkeypatch.setattr(db.session.get_bind().dialect, 'update_returning', request.param)
+    return request.param
+
+
+def test_bulk_transition_reports_each_order(db, user, update_returning):
+    pending = [add_order(db, user) for _ in range(2)]
+    preparing = add_order(db, user, status=OrderStatus.PREPARING)
+    cancelled = add_order(db, user, status=OrderStatus.CANCELLED)
+
+    results = bulk_transition(user.id, [o.id for o in pending] + [preparing.id, cancelled.id, 999999])
+    db.session.commit()
+
+    assert results == {
+        pending[0].id: APPLIED, pending[1].id: APPLIED, preparing.id: APPLIED,
+        cancelled.id: INVALID, 999999: NOT_FOUND,
+    }
+    db.session.expire_all()
+    assert [db.session.get(Order, o.id).status for o in pending] == [OrderStatus.PREPARING] * 2
+    assert db.session.get(Order, preparing.id).status == OrderStatus.SENT
+
+
+def test_bulk_transition_ignores_other_restaurants(db, user):
+    other = User(name='Outro', email='outro@example.com', phone='1')
+    other.set_password('senha')
+    db.session.add(other)
+    db.session.commit()
+    theirs = add_order(db, other)
+
+    assert bulk_transition(user.id, [theirs.id], OrderStatus.CANCELLED) == {theirs.id: NOT_FOUND}
+    db.session.expire_all()
+    assert db.session.get(Order, theirs.id).status == OrderStatus.PENDING
+
+
+def test_bulk_transition_detects_concurrent_changes(db, user, monkeypatch, update_returning):
+    changed, untouched = add_order(db, user), add_order(db, user)
+    target_status = order_state_service._target_status
+
+    def target_then_race(status, to_status):
+        # Outro clique muda um dos pedidos entre a leitura e o UPDATE
+        force_status(db, changed.id, OrderStatus.CANCELLED)
+        return target_status(status, to_status)
+    monkeypatch.setattr(order_state_service, '_target_status', target_then_race)
+
+    results = bulk_transition(user.id, [changed.id, untouched.id])
+    db.session.commit()
+
+    assert results == {changed.id: CONFLICT, untouched.id: APPLIED}
+    db.session.expire_all()
+    assert db.session.get(Order, changed.id).status == OrderStatus.CANCELLED
+    assert db.session.get(Order, untouched.id).status == OrderStatus.PREPARING
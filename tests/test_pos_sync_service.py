@@ -0,0 +1,144 @@
+import uuid
+
+import pytest
+
+from models import CashMovement, DailySalesRollup, Order, OrderItem, Product, User
+from services import pos_sync_service
+from services.pos_sync_service import (
+    STATUS_CREATED, STATUS_DUPLICATE, STATUS_REJECTED, SyncError, sync_pos_batch,
+)
+
+
+def sale(products, **fields):
+    data = {
+        'client_uuid': str(uuid.uuid4()),
+        'payment_method': 'Dinheiro',
+        'items': [{'product_id': products[0].id, 'quantity': 2, 'price': 20},
+                  {'product_id': products[1].id, 'quantity': 1, 'price': 6}],
+    }
+    data.update(fields)
+    return data
+
+
+def movement(**fields):
+    data = {'client_uuid': str(uuid.uuid4()), 'type': 'expense', 'description': 'Gelo', 'amount': '12,50'}
+    data.update(fields)
+    return data
+
+
+def test_requires_an_open_cash_session(db, user, products):
+    with pytest.raises(SyncError) as error:
+        sync_pos_batch(user.id, {'orders': [sale(products)]})
+    assert error.value.status_code == 409
+
+
+def test_rejects_oversized_batches(app, db, user, products, cash_session, monkeypatch):
+    monkeypatch.setitem(app.config, 'POS_SYNC_MAX_BATCH', 2)
+
+    with pytest.raises(SyncError) as error:
+        sync_pos_batch(user.id, {'orders': [sale(products)] * 2, 'movements': [movement()]})
+    assert error.value.status_code == 400
+
+
+def test_creates_orders_and_movements(db, user, products, cash_session):
+    results = sync_pos_batch(user.id, {'orders': [sale(products)], 'movements': [movement()]})
+
+    [order_result], [movement_result] = results['orders'], results['movements']
+    assert order_result['status'] == STATUS_CREATED and order_result['warnings'] == []
+    assert movement_result['status'] == STATUS_CREATED
+
+    order = db.session.get(Order, order_result['order_id'])
+    assert float(order.total_price) == 46.0
+    assert order.items_summary == '2x X Burguer\n1x Coca'
+    assert OrderItem.query.filter_by(order_id=order.id).count() == 2
+    assert CashMovement.query.filter_by(order_id=order.id, type='sale', session_id=cash_session.id).count() == 1
+    expense = db.session.get(CashMovement, movement_result['movement_id'])
+    assert float(expense.amount) == -12.5
+    assert DailySalesRollup.query.filter_by(user_id=user.id).one().orders_count == 1
+
+    db.session.refresh(cash_session)
+    assert float(cash_session.balance) == 100 + 46 - 12.5
+
+
+def test_resending_a_batch_returns_duplicates(db, user, products, cash_session):
+    payload = {'orders': [sale(products)], 'movements': [movement()]}
+    first = sync_pos_batch(user.id, payload)
+    second = sync_pos_batch(user.id, payload)
+
+    assert second['orders'][0]['status'] == STATUS_DUPLICATE
+    assert second['orders'][0]['order_id'] == first['orders'][0]['order_id']
+    assert second['movements'][0]['status'] == STATUS_DUPLICATE
+    assert second['movements'][0]['movement_id'] == first['movements'][0]['movement_id']
+    assert Order.query.count() == 1
+    assert CashMovement.query.filter_by(type='expense').count() == 1
+
+
+def test_repeated_uuid_inside_one_batch_is_a_duplicate(db, user, products, cash_session):
+    order = sale(products)
+    results = sync_pos_batch(user.id, {'orders': [order, dict(order)]})
+
+    assert [result['status'] for result in results['orders']] == [STATUS_CREATED, STATUS_DUPLICATE]
+    assert Order.query.count() == 1
+
+
+def test_invalid_entries_are_rejected_without_failing_the_batch(db, user, products, cash_session):
+    other = User(name='Outro', email='outro@example.com', phone='1')
+    other.set_password('senha')
+    db.session.add(other)
+    db.session.flush()
+    foreign = Product(user_id=other.id, name='Alheio', price=99)
+    db.session.add(foreign)
+    db.session.commit()
+
+    results = sync_pos_batch(user.id, {
+        'orders': [
+            sale(products, client_uuid='not-a-uuid'),
+            sale(products, items=[{'product_id': foreign.id, 'quantity': 1}]),
+            sale(products, items=[{'product_id': products[0].id, 'quantity': 10 ** 8}]),
+            sale(products),
+        ],
+        'movements': [
+            movement(amount='NaN'),
+            movement(amount='Infinity'),
+            movement(amount='1e12'),
+            movement(type='sale'),
+            movement(description='  '),
+            movement(type='deposit', amount='30'),
+        ],
+    })
+
+    assert [result['status'] for result in results['orders']] == [STATUS_REJECTED] * 3 + [STATUS_CREATED]
+    assert [result['status'] for result in results['movements']] == [STATUS_REJECTED] * 5 + [STATUS_CREATED]
+    assert Order.query.count() == 1
+    assert CashMovement.query.filter(CashMovement.type.in_(['expense', 'deposit'])).count() == 1
+
+
+def test_changed_prices_are_recalculated_with_warnings(db, user, products, cash_session):
+    order = sale(products, total=36, items=[{'product_id': products[0].id, 'quantity': 2, 'price': 18}])
+
+    [result] = sync_pos_batch(user.id, {'orders': [order]})['orders']
+
+    assert result['status'] == STATUS_CREATED
+    assert len(result['warnings']) == 2
+    assert float(db.session.get(Order, result['order_id']).total_price) == 2 * 20
+
+
+def test_concurrent_resend_is_retried_as_duplicate(db, user, products, cash_session, monkeypatch):
+    order = sale(products)
+    first = sync_pos_batch(user.id, {'orders': [order]})
+
+    # Simula o outro envio gravando o mesmo UUID entre a checagem e o INSERT
+    existing_uuids = pos_sync_service._existing_uuids
+    calls = []
+
+    def miss_once(model, user_id, client_uuids):
+        calls.append(model)
+        return {} if len(calls) <= 2 else existing_uuids(model, user_id, client_uuids)
+    monkeypatch.setattr(pos_sync_service, '_existing_uuids', miss_once)
+
+    second = sync_pos_batch(user.id, {'orders': [order]})
+
+    assert len(calls) == 4
+    assert second['orders'][0]['status'] == STATUS_DUPLICATE
+    assert second['orders'][0]['order_id'] == first['orders'][0]['order_id']
+    assert Order.query.count() == 1
@@ -0,0 +1,102 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from models import DailySalesRollup, Order, OrderStatus, User, RestaurantConfig
+from services.order_state_service import transition_order
+from services.rollup_service import get_rollup_totals, rebuild_rollup, record_order
+
+
+def add_order(db, user, total, payment_method='Pix', status=OrderStatus.PENDING, **fields):
+    order = Order(user_id=user.id, client_name='Cliente', total_price=total, delivery_fee=fields.pop('delivery_fee', 0),
+                  payment_method=payment_method, status=status, **fields)
+    db.session.add(order)
+    db.session.flush()
+    return order
+
+
+def rollup_rows(user_id=None):
+    query = DailySalesRollup.query
+    if user_id is not None:
+        query = query.filter_by(user_id=user_id)
+    return sorted(
+        (row.user_id, row.day, row.payment_method, row.orders_count, Decimal(row.revenue),
+         Decimal(row.delivery_fees), row.cancelled_count, Decimal(row.cancelled_amount))
+        for row in query
+        # Linhas zeradas (pedido desfeito) não mudam os totais; o rebuild não as recria
+        if row.orders_count or row.cancelled_count
+    )
+
+
+def test_record_order_buckets_by_local_completion_day(db, user):
+    # 02:30 UTC do dia 11 = 23:30 do dia 10 em São Paulo
+    order = add_order(db, user, 30, status=OrderStatus.COMPLETED, delivery_fee=5,
+                      created_at=datetime(2026, 10, 9, 20, 0), completed_at=datetime(2026, 10, 11, 2, 30))
+    record_order(order)
+    db.session.commit()
+
+    assert rollup_rows(user.id) == [
+        (user.id, date(2026, 10, 10), 'Pix', 1, Decimal('30.00'), Decimal('5.00'), 0, Decimal('0.00'))
+    ]
+
+
+def test_record_order_undo_cancels_contribution(db, user):
+    order = add_order(db, user, 30, status=OrderStatus.COMPLETED, completed_at=datetime(2026, 10, 10, 15, 0))
+    record_order(order)
+    record_order(order, -1)
+    db.session.commit()
+
+    assert rollup_rows(user.id) == []
+    assert get_rollup_totals(user.id, date(2026, 10, 1), date(2026, 10, 31))['revenue'] == 0
+
+
+def test_pending_orders_are_not_counted(db, user):
+    record_order(add_order(db, user, 30))
+    db.session.commit()
+
+    assert DailySalesRollup.query.count() == 0
+
+
+def test_incremental_rollup_matches_rebuild(db, user):
+    completed = add_order(db, user, 42, delivery_fee=7, payment_method='Dinheiro')
+    for _ in range(3):
+        transition_order(completed)
+    refunded = add_order(db, user, 18)
+    for _ in range(3):
+        transition_order(refunded)
+    transition_order(refunded, OrderStatus.CANCELLED)
+    cancelled = add_order(db, user, 25, payment_method=None)
+    transition_order(cancelled, OrderStatus.CANCELLED)
+    transition_order(add_order(db, user, 11))
+    db.session.commit()
+
+    incremental = rollup_rows(user.id)
+    assert sum(row[3] for row in incremental) == 1
+    assert sum(row[6] for row in incremental) == 2
+
+    assert rebuild_rollup(user.id) == len(incremental)
+    assert rollup_rows(user.id) == incremental
+
+
+def test_rebuild_for_one_restaurant_keeps_the_others(db, user):
+    other = User(name='Outro', email='outro@example.com', phone='1')
+    other.set_password('senha')
+    db.session.add(other)
+    db.session.flush()
+    db.session.add(RestaurantConfig(user_id=other.id, timezone='Asia/Tokyo'))
+    mine = add_order(db, user, 10, status=OrderStatus.COMPLETED, completed_at=datetime(2026, 10, 10, 15, 0))
+    theirs = add_order(db, other, 20, status=OrderStatus.COMPLETED, completed_at=datetime(2026, 10, 10, 20, 0))
+    record_order(mine)
+    record_order(theirs)
+    db.session.commit()
+    before = rollup_rows(other.id)
+
+    # Linha corrompida do restaurante reconstruído é descartada
+    db.session.add(DailySalesRollup(user_id=user.id, day=date(2026, 1, 1), payment_method='Pix', orders_count=9,
+                                    revenue=999, delivery_fees=0, cancelled_count=0, cancelled_amount=0))
+    db.session.commit()
+    rebuild_rollup(user.id)
+
+    assert rollup_rows(other.id) == before == [
+        (other.id, date(2026, 10, 11), 'Pix', 1, Decimal('20.00'), Decimal('0.00'), 0, Decimal('0.00'))
+    ]
+    assert [row[1] for row in rollup_rows(user.id)] == [date(2026, 10, 10)]